@@ -24,4 +24,4 @@
 
 __version__ = '0.9.15'
 
-MODEL_VERSION = 5
+MODEL_VERSION = 6
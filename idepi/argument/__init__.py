@@ -40,6 +40,7 @@ from idepi.constants import AminoAlphabet, DNAAlphabet
 from idepi.encoder import (
     AminoEncoder,
     DNAEncoder,
+    ReducedEncoder,
     StanfelEncoder
     )
 from idepi.datasource import DataSource
@@ -165,8 +166,22 @@ def feature_args(parser):
     parser.add_argument('--no-pngs',       action='store_false',           dest='PNGS')
     parser.add_argument('--no-pngs-pairs', action='store_false',           dest='PNGS_PAIRS')
     parser.add_argument('--radius',                              type=int, dest='RADIUS')
+    parser.add_argument('--sparse',        action='store_true',            dest='SPARSE')
+    parser.add_argument('--dedup',         action='store_true',            dest='DEDUP')
+    parser.add_argument('--hashpairs',                           type=int, dest='HASH_PAIRS')
+    parser.add_argument('--interactions',                        type=int, dest='MAX_ORDER')
+    parser.add_argument('--minsupport',                          type=float, dest='MIN_SUPPORT')
+    parser.add_argument('--interactionsupport',                  type=float, dest='INTERACTION_SUPPORT')
+    # pairs are kept if seen at all, but interactions only if frequent,
+    # as every co-occurring set of sites is otherwise one
     parser.set_defaults(
-        RADIUS=0
+        RADIUS=0,
+        SPARSE=False,
+        DEDUP=False,
+        HASH_PAIRS=0,
+        MAX_ORDER=0,
+        MIN_SUPPORT=1,
+        INTERACTION_SUPPORT=0.05
         )
     return parser
 
@@ -362,6 +377,22 @@ def SeedType(string):
         raise ArgumentTypeError("invalid seed '{0:s}'".format(string))
 
 
+def EncoderType(string):
+    encoders = dict((str(enc), enc) for enc in (AminoEncoder, DNAEncoder, StanfelEncoder))
+    if string in encoders:
+        return encoders[string]
+    # reduced alphabets are named <matrix>-<ngroup>, e.g. blosum62-8
+    matrix, _, ngroup = string.rpartition('-')
+    try:
+        return ReducedEncoder(int(ngroup), matrix)
+    except ValueError:
+        msg = "invalid encoding '{0:s}', expected one of {1:s} or <matrix>-<ngroup>".format(
+            string,
+            ', '.join(sorted(encoders))
+            )
+        raise ArgumentTypeError(msg)
+
+
 def init_args(description, args):
     from idepi import __path__ as idepi_path
 
@@ -376,11 +407,9 @@ def init_args(description, args):
         )
 
     # handle the encoder early as well
-    encoders = dict((str(enc), enc) for enc in (AminoEncoder, DNAEncoder, StanfelEncoder))
     parser.add_argument(
         '--encoding',
-        type=lambda s: encoders.get(s, s),
-        choices=sorted(encoders.values(), key=str),
+        type=EncoderType,
         dest='ENCODER',
         default=AminoEncoder
         )
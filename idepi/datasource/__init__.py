@@ -2,13 +2,20 @@
 from __future__ import division, print_function
 
 from csv import reader as csv_reader, Sniffer as csv_sniffer
+from hashlib import sha1
+from itertools import groupby
 from json import dumps as json_dumps
-from os.path import basename, splitext
+from logging import getLogger
+from operator import itemgetter
+from os import makedirs
+from os.path import abspath, basename, dirname, isdir, splitext
 from re import compile as re_compile
-from sqlite3 import connect
+from sqlite3 import DatabaseError, OperationalError, connect
 from textwrap import dedent
 from warnings import warn
 
+from six.moves.urllib.request import pathname2url
+
 from Bio import SeqIO
 from Bio.Seq import Seq
 from Bio.SeqRecord import SeqRecord
@@ -16,10 +23,133 @@ from Bio.SeqRecord import SeqRecord
 from BioExt.orflist import OrfList
 
 from idepi.constants import AminoAlphabet, DNAAlphabet
-from idepi.verifier import VerifyError, Verifier
+from idepi.labeledmsa import MetadataTable, ValueMatrix
+from idepi.logging import IDEPI_LOGGER
+from idepi.util import user_cache
+from idepi.verifier import VerifyError, Verifier, rejects
+
+
+__all__ = ['DataSource', 'OrfCache']
+
+
+# `idepi db optimize' records the state of the tables LABELED_SEQUENCE is
+# built from, so that it is only ever read while it is current; triggers
+# on those tables clear the record on any insert, update or delete, which
+# the counts and largest keys alone would miss for an update in place
+_SOURCE_TABLE = 'LABELED_SEQUENCE_SOURCE'
+_SOURCE_TABLES = ('NEUT', 'SEQUENCE', 'GENO_REPORT')
+_SOURCE_EVENTS = ('INSERT', 'UPDATE', 'DELETE')
+_SOURCE_STATE = dedent('''\
+    select
+        (select count(*) from NEUT), (select max(NEUT_NO) from NEUT),
+        (select count(*) from SEQUENCE), (select max(SEQUENCE_NO) from SEQUENCE),
+        (select count(*) from GENO_REPORT), (select max(GENO_REPORT_NO) from GENO_REPORT)
+    ''')
+
+
+def _numeric(value):
+    # censored values such as '>50' count as their bound,
+    # and thousands are sometimes separated, as in '>2,500'
+    try:
+        return float(value.strip().lstrip('<>').replace(',', ''))
+    except ValueError:
+        return None
+
+
+class OrfCache(object):
+    """
+    the ORF that OrfList finds in each raw sequence, and whether a Verifier
+    accepts it as DNA and as amino acids, stored in a sqlite file under a
+    hash of the sequence and of the OrfList parameters, so that no known
+    sequence has its ORF found twice; without a file, or if it cannot be
+    opened, the cache lasts only as long as the object, and a lookup or
+    store that fails is treated as a cache miss
+    """
+
+    # bump whenever what is stored for a sequence changes
+    __VERSION = 1
+    # the most keys looked up by a single statement
+    __CHUNK = 500
+
+    def __init__(self, filename=None, **params):
+        self.__filename = filename
+        self.__params = params
+        self.__conn = None
+        self.__rejects_dna = rejects(DNAAlphabet)
+        self.__rejects_amino = rejects(AminoAlphabet)
+
+    def __connection(self):
+        if self.__conn is None:
+            filenames = [':memory:'] if self.__filename is None else [self.__filename, ':memory:']
+            for filename in filenames:
+                conn = None
+                try:
+                    if filename != ':memory:' and not isdir(dirname(abspath(filename))):
+                        makedirs(dirname(abspath(filename)))
+                    conn = connect(filename)
+                    conn.execute(
+                        'create table if not exists ORF '
+                        '(KEY text primary key, ORF text, IS_DNA integer, IS_AMINO integer)'
+                        )
+                    conn.commit()
+                    self.__conn = conn
+                    break
+                except (DatabaseError, OSError) as e:
+                    if conn is not None:
+                        conn.close()
+                    getLogger(IDEPI_LOGGER).debug("unable to open ORF cache '%s': %s", filename, e)
+        return self.__conn
+
+    @property
+    def filename(self):
+        return self.__filename
 
+    def close(self):
+        if self.__conn is not None:
+            self.__conn.close()
+            self.__conn = None
+
+    def key(self, seq):
+        params = sorted(self.__params.items())
+        return sha1(json_dumps([OrfCache.__VERSION, params, str(seq)]).encode('utf-8')).hexdigest()
+
+    def orfs(self, seqs):
+        """
+        the ORF of each of seqs, and whether it verifies as DNA and as amino acids
+        """
+        conn = self.__connection()
+        keys = [self.key(seq) for seq in seqs]
+
+        known = {}
+        unique_ = sorted(set(keys))
+        for i in range(0, len(unique_), OrfCache.__CHUNK):
+            chunk = unique_[i:i + OrfCache.__CHUNK]
+            stmt = 'select KEY, ORF, IS_DNA, IS_AMINO from ORF where KEY in ({0:s})'.format(
+                ', '.join('?' * len(chunk))
+                )
+            try:
+                for key, orf, is_dna, is_amino in conn.execute(stmt, chunk):
+                    known[key] = (orf, bool(is_dna), bool(is_amino))
+            except DatabaseError as e:
+                getLogger(IDEPI_LOGGER).debug("unable to read ORF cache '%s': %s", self.__filename, e)
+
+        found = []
+        for key, seq in zip(keys, seqs):
+            if key in known:
+                continue
+            orf = str(OrfList(seq, **self.__params)[0])
+            known[key] = (orf, not self.__rejects_dna(orf), not self.__rejects_amino(orf))
+            found.append((key, orf, int(known[key][1]), int(known[key][2])))
+
+        if found:
+            try:
+                conn.executemany('insert or ignore into ORF values (?, ?, ?, ?)', found)
+                conn.commit()
+            except DatabaseError as e:
+                conn.rollback()
+                getLogger(IDEPI_LOGGER).debug("unable to update ORF cache '%s': %s", self.__filename, e)
 
-__all__ = ['DataSource']
+        return [known[key] for key in keys]
 
 
 def DataSource(*args):
@@ -33,8 +163,48 @@ def DataSource(*args):
 
 class Sqlite3Db:
 
-    def __init__(self, filename):
+    def __init__(self, filename, orfcache=True):
         self.__filename = filename
+        self.__conn = None
+        self.__cache = {}
+        # by default, ORFs are cached for every database in the user's cache
+        # directory, which they can share as entries are keyed by sequence
+        if orfcache is True:
+            orfcache = user_cache('orfs.sqlite3')
+        self.__orfs = OrfCache(orfcache or None, include_stops=False)
+
+    def __connection(self):
+        # open the database once, and read-only where sqlite allows it
+        if self.__conn is None:
+            uri = 'file:{0:s}?mode=ro'.format(pathname2url(abspath(self.__filename)))
+            conn = None
+            try:
+                conn = connect(uri, uri=True)
+                # connecting is lazy, so make sure the database opens
+                conn.execute('select 1 from sqlite_master limit 1')
+            except TypeError:
+                # uri connections are unavailable, so open it plainly
+                pass
+            except OperationalError:
+                if conn is not None:
+                    conn.close()
+                conn = None
+            self.__conn = conn or connect(self.__filename)
+        return self.__conn
+
+    def __query(self, stmt, params=()):
+        # metadata queries are memoized for the life of the object
+        key = (stmt, tuple(params))
+        if key not in self.__cache:
+            self.__cache[key] = self.__connection().execute(stmt, params).fetchall()
+        return list(self.__cache[key])
+
+    def close(self):
+        if self.__conn is not None:
+            self.__conn.close()
+            self.__conn = None
+        self.__cache = {}
+        self.__orfs.close()
 
     @property
     def basename_root(self):
@@ -46,35 +216,97 @@ class Sqlite3Db:
 
     @property
     def antibodies(self):
-        conn = connect(self.__filename)
-        cur = conn.cursor()
-        cur.execute('select distinct ANTIBODY from ANTIBODY')
-        valid_antibodies = [r[0] for r in cur]
-        conn.close()
-        return valid_antibodies
+        return [r[0] for r in self.__query('select distinct ANTIBODY from ANTIBODY')]
 
     @property
     def labels(self):
-        conn = connect(self.__filename)
-        cur = conn.cursor()
-        cur.execute('select distinct TYPE from NEUT_TYPE')
-        valid_labels = [r[0] for r in cur]
-        conn.close()
-        return valid_labels
-
-    def seqrecords(self, antibodies, clonal=False):
-        conn = connect(self.__filename)
-        cur = conn.cursor()
+        return [r[0] for r in self.__query('select distinct TYPE from NEUT_TYPE')]
 
+    @property
+    def optimized(self):
+        """
+        whether `idepi db optimize' has built a LABELED_SEQUENCE table
+        that is current with NEUT, which seqrecords() then reads instead
+        """
+        if not self.__query(
+                "select name from sqlite_master where type = 'table' and name = ?",
+                (_SOURCE_TABLE,)):
+            return False
+        return self.__query(_SOURCE_STATE) == self.__query('select * from %s' % _SOURCE_TABLE)
+
+    @staticmethod
+    def optimize(filename):
+        """
+        index NEUT by antibody and by sequence, and materialize every
+        measurement, its sequence and subtype, and its value parsed as a
+        number into LABELED_SEQUENCE; rerun this whenever the data change,
+        as LABELED_SEQUENCE is ignored from the first change until then
+        """
+        conn = connect(filename)
+        try:
+            with conn:
+                conn.execute('create index if not exists NEUT_ANTIBODY_IDX on NEUT (ANTIBODY, SEQUENCE_ID)')
+                conn.execute('create index if not exists NEUT_SEQUENCE_IDX on NEUT (SEQUENCE_ID)')
+                conn.execute('drop table if exists LABELED_SEQUENCE')
+                conn.execute('drop table if exists %s' % _SOURCE_TABLE)
+                conn.execute(dedent('''\
+                    create table LABELED_SEQUENCE (
+                      ANTIBODY TEXT NOT NULL,
+                      SEQUENCE_ID TEXT NOT NULL,
+                      SEQUENCE_NO INTEGER NOT NULL,
+                      IS_CLONAL INTEGER NOT NULL,
+                      SUBTYPE TEXT,
+                      NEUT_NO INTEGER NOT NULL,
+                      TYPE TEXT NOT NULL,
+                      VALUE REAL
+                    )'''))
+                rows = conn.execute(dedent('''\
+                    select N.ANTIBODY, S.SEQUENCE_ID, S.SEQUENCE_NO, S.IS_CLONAL, G.SUBTYPE, N.NEUT_NO, N.TYPE, N.VALUE from
+                    NEUT as N join SEQUENCE as S on S.SEQUENCE_ID = N.SEQUENCE_ID
+                    left join GENO_REPORT as G on G.SEQUENCE_ID = N.SEQUENCE_ID
+                    ''')).fetchall()
+                conn.executemany(
+                    'insert into LABELED_SEQUENCE values (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (row[:7] + (_numeric(row[7]),) for row in rows)
+                    )
+                conn.execute(
+                    'create index LABELED_SEQUENCE_IDX on LABELED_SEQUENCE (ANTIBODY, SEQUENCE_ID, NEUT_NO)'
+                    )
+                conn.execute(dedent('''\
+                    create table {0:s} (
+                      NEUT_COUNT INTEGER, NEUT_MAX INTEGER,
+                      SEQUENCE_COUNT INTEGER, SEQUENCE_MAX INTEGER,
+                      GENO_REPORT_COUNT INTEGER, GENO_REPORT_MAX INTEGER
+                    )'''.format(_SOURCE_TABLE)))
+                conn.execute('insert into {0:s} {1:s}'.format(_SOURCE_TABLE, _SOURCE_STATE))
+                for table in _SOURCE_TABLES:
+                    for event in _SOURCE_EVENTS:
+                        trigger = '{0:s}_{1:s}_STALE'.format(table, event)
+                        conn.execute('drop trigger if exists %s' % trigger)
+                        conn.execute(
+                            'create trigger {0:s} after {1:s} on {2:s} begin delete from {3:s}; end'.format(
+                                trigger, event, table, _SOURCE_TABLE
+                                )
+                            )
+            conn.execute('analyze')
+        finally:
+            conn.close()
+
+    def query(self, antibodies, clonal=False):
+        """
+        the statement and parameters with which seqrecords() selects the
+        sequences neutralized by antibodies or any of their equivalents,
+        and those antibodies
+        """
         antibodies_ = set(antibodies)
 
         ab_clause = ' or '.join(['ANTIBODY = ?'] * len(antibodies_))
 
         equivalencies = set((
-            next(cur.execute(
+            self.__query(
                 'select distinct ALT_IDS from ANTIBODY where %s' % ab_clause,
-                tuple(antibodies_)
-                ))[0]
+                tuple(sorted(antibodies_))
+                )[0][0]
             or ''
             ).split(',')) - set([''])
 
@@ -84,73 +316,205 @@ class Sqlite3Db:
 
         antibodies__ = tuple(sorted(antibodies_))
 
-        stmt = dedent('''\
-            select distinct SG.NO as NO, SG.ID as ID, SG.SEQ as SEQ, SG.SUBTYPE as SUBTYPE, ? as AB, N.VALUE as VALUE from
-            (select NO, S.ID as ID, SUBTYPE, SEQ from
-                (select SEQUENCE_NO as NO, SEQUENCE_ID as ID, RAW_SEQ as SEQ from SEQUENCE {0:s} group by ID) as S left join
-                (select SEQUENCE_ID as ID, SUBTYPE from GENO_REPORT group by ID) as G
-                on S.ID = G.ID
-            ) as SG join
-            (select SEQUENCE_ID as ID, ANTIBODY as AB, group_concat(TYPE || ':' || VALUE, ',') as VALUE from NEUT where ({1:s}) group by ID) as N
-            on SG.ID = N.ID order by SG.ID;
-            '''.format('where IS_CLONAL = 1' if clonal else '', ab_clause))
+        if self.optimized:
+            stmt = dedent('''\
+                select L.SEQUENCE_NO as NO, L.SEQUENCE_ID as ID, S.RAW_SEQ as SEQ, L.SUBTYPE as SUBTYPE, ? as AB, L.TYPE as TYPE, L.VALUE as VALUE from
+                LABELED_SEQUENCE as L join SEQUENCE as S on S.SEQUENCE_NO = L.SEQUENCE_NO
+                where ({0:s}){1:s} order by L.SEQUENCE_ID, L.NEUT_NO;
+                '''.format(ab_clause.replace('ANTIBODY', 'L.ANTIBODY'), ' and L.IS_CLONAL = 1' if clonal else ''))
+        else:
+            stmt = dedent('''\
+                select distinct SG.NO as NO, SG.ID as ID, SG.SEQ as SEQ, SG.SUBTYPE as SUBTYPE, ? as AB, N.VALUE as VALUE from
+                (select NO, S.ID as ID, SUBTYPE, SEQ from
+                    (select SEQUENCE_NO as NO, SEQUENCE_ID as ID, RAW_SEQ as SEQ from SEQUENCE {0:s} group by ID) as S left join
+                    (select SEQUENCE_ID as ID, SUBTYPE from GENO_REPORT group by ID) as G
+                    on S.ID = G.ID
+                ) as SG join
+                (select SEQUENCE_ID as ID, ANTIBODY as AB, group_concat(TYPE || ':' || VALUE, ';') as VALUE from NEUT where ({1:s}) group by ID) as N
+                on SG.ID = N.ID order by SG.ID;
+                '''.format('where IS_CLONAL = 1' if clonal else '', ab_clause))
         params = ('+'.join(antibodies__),) + antibodies__
 
-        cur.execute(stmt, params)
-
-        def records():
-            ids = {}
+        return stmt, params, antibodies__
+
+    def __rows(self, stmt, params):
+        # every sequence, its subtype and its (type, value) pairs, with
+        # values that do not parse as numbers left as None
+        cur = self.__connection().execute(stmt, params)
+        if self.optimized:
+            for _, rows in groupby(cur, key=itemgetter(1)):
+                rows = list(rows)
+                nno, sid, seq, subtype, ab = rows[0][:5]
+                yield nno, sid, seq, subtype, ab, [(row[5], row[6]) for row in rows]
+        else:
             for row in cur:
                 nno, sid, seq, subtype, ab, values = row[:6]
-                values_ = {}
-                for kv in values.split(','):
+                pairs = []
+                for kv in values.split(';'):
                     k, v = kv.split(':')
-                    try:
-                        v_ = float(v.strip().lstrip('<>'))
-                    except ValueError:
-                        continue
-                    if k not in values_:
-                        values_[k] = []
-                    values_[k].append(v_)
-                if len(values_) == 0:
-                    warn("skipping sequence '%s', invalid values '%s'" % (sid, values))
-                    continue
-                record = SeqRecord(
-                    Seq(OrfList(seq, include_stops=False)[0], DNAAlphabet),
-                    id=sid,
-                    description=json_dumps({
-                        'subtype': '' if subtype is None else subtype,
-                        'ab': ab,
-                        'values': values_
-                        }),
-                    annotations={'antibody': values_, 'subtype': subtype}
-                    )
-                if sid in ids:
-                    record.id += str(-ids[sid])
-                    ids[sid] += 1
-                else:
-                    ids[sid] = 1
-                yield record
+                    pairs.append((k, _numeric(v)))
+                yield nno, sid, seq, subtype, ab, pairs
+
+    def __verified_orfs(self, seqs):
+        # only sequences new to the cache have their ORFs found, and all
+        # take the alphabet a Verifier gives them: DNA if every one is
+        orfs = self.__orfs.orfs(seqs)
+        if all(is_dna for _, is_dna, _ in orfs):
+            alphabet = DNAAlphabet
+        else:
+            alphabet = AminoAlphabet
+            for i, (_, _, is_amino) in enumerate(orfs):
+                if not is_amino:
+                    raise VerifyError("invalid alphabet for sequence {0:d}".format(i))
+        return [orf for orf, _, _ in orfs], alphabet
 
-        source = Verifier(records(), DNAAlphabet)
-        try:
-            seqrecords = list(source)
-        except VerifyError:
-            source.set_alphabet(AminoAlphabet)
-            seqrecords = list(source)
+    def seqrecords(self, antibodies, clonal=False):
+        stmt, params, antibodies__ = self.query(antibodies, clonal)
 
-        conn.close()
+        rows = []
+        for nno, sid, seq, subtype, ab, pairs in self.__rows(stmt, params):
+            values_ = {}
+            for k, v_ in pairs:
+                if v_ is None:
+                    continue
+                if k not in values_:
+                    values_[k] = []
+                values_[k].append(v_)
+            if len(values_) == 0:
+                warn("skipping sequence '%s', invalid values for '%s'" % (sid, ','.join(k for k, _ in pairs)))
+                continue
+            rows.append((sid, seq, '' if subtype is None else subtype, ab, values_))
 
-        return seqrecords, clonal, antibodies__
+        orfs, alphabet = self.__verified_orfs([row[1] for row in rows])
+
+        ids = {}
+        seqrecords = []
+        for (sid, _, subtype, ab, values_), orf in zip(rows, orfs):
+            record = SeqRecord(
+                Seq(orf, alphabet),
+                id=sid,
+                description=json_dumps({
+                    'subtype': subtype,
+                    'ab': ab,
+                    'values': values_
+                    }),
+                annotations={'antibody': values_, 'subtype': subtype}
+                )
+            if sid in ids:
+                record.id += str(-ids[sid])
+                ids[sid] += 1
+            else:
+                ids[sid] = 1
+            seqrecords.append(record)
+
+        # the values and subtypes are already parsed, so fill the table directly
+        metadata = MetadataTable.from_rows(
+            [r.id for r in seqrecords],
+            [r.annotations['subtype'] for r in seqrecords],
+            [r.annotations['antibody'] for r in seqrecords]
+            )
+
+        return seqrecords, clonal, antibodies__, metadata
+
+    def panel_query(self, antibodies, clonal=False):
+        """
+        the statement and parameters with which panel() selects every
+        measurement of antibodies and their equivalents, one per row, and
+        the antibodies of the panel whose column each antibody fills
+        """
+        columns = {}
+        for antibody in antibodies:
+            alts = self.__query('select distinct ALT_IDS from ANTIBODY where ANTIBODY = ?', (antibody,))
+            equivalencies = set(((alts[0][0] if alts else None) or '').split(',')) - set([''])
+            for ab in set([antibody]) | equivalencies:
+                columns.setdefault(ab, [])
+                if antibody not in columns[ab]:
+                    columns[ab].append(antibody)
+
+        antibodies__ = tuple(sorted(columns))
+        ab_clause = ' or '.join(['ANTIBODY = ?'] * len(antibodies__))
+
+        if self.optimized:
+            stmt = dedent('''\
+                select L.SEQUENCE_NO as NO, L.SEQUENCE_ID as ID, S.RAW_SEQ as SEQ, L.SUBTYPE as SUBTYPE, L.ANTIBODY as AB, L.TYPE as TYPE, L.VALUE as VALUE from
+                LABELED_SEQUENCE as L join SEQUENCE as S on S.SEQUENCE_NO = L.SEQUENCE_NO
+                where ({0:s}){1:s} order by L.SEQUENCE_ID, L.NEUT_NO;
+                '''.format(ab_clause.replace('ANTIBODY', 'L.ANTIBODY'), ' and L.IS_CLONAL = 1' if clonal else ''))
+        else:
+            stmt = dedent('''\
+                select SG.NO as NO, SG.ID as ID, SG.SEQ as SEQ, SG.SUBTYPE as SUBTYPE, N.AB as AB, N.TYPE as TYPE, N.VALUE as VALUE from
+                (select NO, S.ID as ID, SUBTYPE, SEQ from
+                    (select SEQUENCE_NO as NO, SEQUENCE_ID as ID, RAW_SEQ as SEQ from SEQUENCE {0:s} group by ID) as S left join
+                    (select SEQUENCE_ID as ID, SUBTYPE from GENO_REPORT group by ID) as G
+                    on S.ID = G.ID
+                ) as SG join
+                (select NEUT_NO, SEQUENCE_ID as ID, ANTIBODY as AB, TYPE, VALUE from NEUT where ({1:s})) as N
+                on SG.ID = N.ID order by SG.ID, N.NEUT_NO;
+                '''.format('where IS_CLONAL = 1' if clonal else '', ab_clause))
+
+        return stmt, antibodies__, columns
+
+    def panel(self, antibodies, clonal=False):
+        """
+        every sequence measured against any of antibodies or their
+        equivalents, once each, and a ValueMatrix of its values for each
+        antibody, all read in a single query; align the sequences once,
+        then label the alignment for each antibody with the MetadataTable
+        that ValueMatrix.metadata() gives for it
+        """
+        antibodies_ = []
+        for antibody in antibodies:
+            if antibody not in antibodies_:
+                antibodies_.append(antibody)
+
+        stmt, params, columns = self.panel_query(antibodies_, clonal)
+        cur = self.__connection().execute(stmt, params)
+
+        rows = []
+        for sid, measurements in groupby(cur, key=itemgetter(1)):
+            measurements = list(measurements)
+            seq, subtype = measurements[0][2:4]
+            values_ = {}
+            for ab, k, v_ in (row[4:7] for row in measurements):
+                # LABELED_SEQUENCE values are already numbers
+                if not isinstance(v_, float):
+                    v_ = None if v_ is None else _numeric(str(v_))
+                if v_ is None:
+                    continue
+                for antibody in columns[ab]:
+                    values_.setdefault(antibody, {}).setdefault(k, []).append(v_)
+            if len(values_) == 0:
+                warn("skipping sequence '%s', invalid values for '%s'" % (
+                    sid, ','.join(sorted(set(row[5] for row in measurements)))
+                    ))
+                continue
+            rows.append((sid, seq, '' if subtype is None else subtype, values_))
+
+        orfs, alphabet = self.__verified_orfs([row[1] for row in rows])
+
+        seqrecords = [
+            SeqRecord(
+                Seq(orf, alphabet),
+                id=sid,
+                description=json_dumps({'subtype': subtype}),
+                annotations={'subtype': subtype}
+                )
+            for (sid, _, subtype, _), orf in zip(rows, orfs)
+            ]
+
+        values = ValueMatrix.from_rows(
+            [r.id for r in seqrecords],
+            [r.annotations['subtype'] for r in seqrecords],
+            antibodies_,
+            [row[3] for row in rows]
+            )
+
+        return seqrecords, clonal, tuple(antibodies_), values
 
     @property
     def subtypes(self):
-        conn = connect(self.__filename)
-        cur = conn.cursor()
-        cur.execute('''select distinct SUBTYPE from GENO_REPORT''')
-        valid_subtypes = [r[0] for r in cur if r[0].strip() != '']
-        conn.close()
-        return valid_subtypes
+        cur = self.__query('''select distinct SUBTYPE from GENO_REPORT''')
+        return [r[0] for r in cur if r[0].strip() != '']
 
 
 class MonogramData:
@@ -257,7 +621,16 @@ class MonogramData:
         for i in sorted(drop, reverse=True):
             del seqrecords[i]
 
-        return seqrecords, clonal, antibodies
+        metadata = MetadataTable.from_rows(
+            [r.id for r in seqrecords],
+            [None] * len(seqrecords),
+            [r.annotations['antibody'] for r in seqrecords]
+            )
+
+        return seqrecords, clonal, antibodies, metadata
+
+    def panel(self, antibodies, clonal=False):
+        raise ValueError('panels are not available with Monogram datasets')
 
     @property
     def subtypes(self):
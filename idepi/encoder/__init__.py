@@ -6,14 +6,20 @@ This module provides encoders for transforming character alphabets into integer
 ['A', 'C', 'G', 'I', 'L', 'M', 'P', 'S', 'T', 'V', 'D', 'E', 'N', 'Q', 'F', 'W', 'Y', 'H', 'K', 'R', 'X', '[]']
 >>> [e(c) for c in 'ACGILMPSTVDENQFWYHKRX-']
 [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21]
+>>> e.encode_array('acgX.-').tolist()
+[20, 20, 20, 20, 21, 21]
+>>> r = ReducedEncoder(4)
+>>> str(r), [r[i] for i in range(len(r))]
+('blosum62-4', ['[ACILMSTV]', '[G]', '[DEHKNPQR]', '[FWY]', '[X]', '[]'])
 """
 
 from __future__ import division, print_function
 
 from collections import defaultdict
 from copy import deepcopy
+from os.path import exists, join
 
-from numpy import dtype
+from numpy import array, dtype, frombuffer, ix_, ndarray, uint8
 
 from idepi.constants import GAPS
 
@@ -22,10 +28,46 @@ __all__ = [
     'Encoder',
     'AminoEncoder',
     'DNAEncoder',
-    'StanfelEncoder'
+    'ReducedEncoder',
+    'StanfelEncoder',
+    'substitution_matrix'
     ]
 
 
+def substitution_matrix(name):
+    """
+    the letters and integer scores of a substitution matrix shipped in
+    idepi/data as <name>.txt, in the NCBI format
+    """
+    from idepi import __path__ as idepi_path
+    path = join(idepi_path[0], 'data', name.lower() + '.txt')
+    if not exists(path):
+        raise ValueError("unknown substitution matrix '{0:s}'".format(name))
+    with open(path) as fh:
+        rows = [line.split() for line in fh if line.strip() and not line.startswith('#')]
+    letters = rows[0]
+    scores = array([[int(v) for v in row[1:]] for row in rows[1:]], dtype=int)
+    if scores.shape != (len(letters), len(letters)):
+        raise ValueError("malformed substitution matrix '{0:s}'".format(name))
+    return letters, scores
+
+
+def _average_linkage(scores, ngroup):
+    # agglomerate the most similar pair of clusters, by average score,
+    # until ngroup remain, breaking ties towards the earliest letters
+    clusters = [[i] for i in range(len(scores))]
+    while len(clusters) > ngroup:
+        best = None
+        for i in range(len(clusters)):
+            for j in range(i + 1, len(clusters)):
+                score = scores[ix_(clusters[i], clusters[j])].mean()
+                if best is None or score > best[0]:
+                    best = (score, i, j)
+        _, i, j = best
+        clusters[i] = sorted(clusters[i] + clusters.pop(j))
+    return clusters
+
+
 class ConstantFactory:
     __slots__ = ('__value',)
 
@@ -37,13 +79,13 @@ class ConstantFactory:
 
 
 class Encoder:
-    AMINO, DNA, STANFEL, CUSTOM = 'amino', 'dna', 'stanfel', 'custom'
+    AMINO, DNA, STANFEL, CUSTOM, GROUPED = 'amino', 'dna', 'stanfel', 'custom', 'grouped'
 
     # underscore must go first or re.compile blows up
     GAP_REPR = '[]'
 
-    __DNA_ALPH = 'ACGTUN-'
-    __AMINO_ALPH = 'ACGILMPSTVDENQFWYHKRX-'
+    DNA_ALPH = 'ACGTUN-'
+    AMINO_ALPH = 'ACGILMPSTVDENQFWYHKRX-'
     __STANFEL_ALPH = {
         'A': 0, 'C': 0, 'G': 0, 'I': 0, 'L': 0, 'M': 0, 'P': 0, 'S': 0, 'T': 0, 'V': 0,
         'D': 1, 'E': 1, 'N': 1, 'Q': 1,
@@ -53,13 +95,18 @@ class Encoder:
         '-': 5  # this is a space, but we cant have 'keyword be an expression'
     }
 
-    def __init__(self, mode=None, chars=None):
+    def __init__(self, mode=None, chars=None, groups=None, name=None):
 
         if mode is None:
             mode = self.AMINO
 
-        if mode == Encoder.STANFEL:
-            d = Encoder.__STANFEL_ALPH
+        if mode in (Encoder.STANFEL, Encoder.GROUPED):
+            if mode == Encoder.STANFEL:
+                d = Encoder.__STANFEL_ALPH
+            elif groups is None:
+                raise ValueError('A grouped Encoder requires a `groups\' parameter')
+            else:
+                d = dict(groups)
             l = []
             # don't forget to +1 here, otherwise we miss the '-' character
             for i in range(max(d.values()) + 1):
@@ -76,7 +123,7 @@ class Encoder:
                     )
 
         elif mode in (Encoder.AMINO, Encoder.DNA):
-            alph = Encoder.__AMINO_ALPH if mode == self.AMINO else Encoder.__DNA_ALPH
+            alph = Encoder.AMINO_ALPH if mode == self.AMINO else Encoder.DNA_ALPH
             d, l = Encoder.__dict_and_list(alph)
 
         elif mode == Encoder.CUSTOM:
@@ -85,7 +132,7 @@ class Encoder:
             d, l = Encoder.__dict_and_list(chars)
 
         else:
-            msg = "mode must be one of 'amino', 'dna', 'stanfel', 'custom'"
+            msg = "mode must be one of 'amino', 'dna', 'stanfel', 'custom', 'grouped'"
             raise ValueError(msg)
 
         default = 'N' if mode == Encoder.DNA else 'X'
@@ -94,16 +141,45 @@ class Encoder:
         self.__dict.update(d)
         self.__list = l
         self.__mode = mode
+        self.__name = mode if name is None else name
+        # the code of every byte, both as a list for single characters
+        # and as an array with which whole alignments encode at once
+        self.__codes = [self.__lookup(chr(b)) for b in range(256)]
+        self.__table = array(self.__codes, dtype=uint8)
 
     def __len__(self):
         return len(self.__list)
 
+    def __lookup(self, char):
+        if char in GAPS:
+            char = '-'
+        # get() rather than [], so that misses do not grow the dict
+        return self.__dict.get(char, self.__dict.default_factory())
+
     def __call__(self, char):
         if not isinstance(char, str):
             raise ValueError('alphabet() converts chars to alphabet indices')
-        if char in GAPS:
-            char = '-'
-        return self.__dict[char]
+        if len(char) == 1 and ord(char) < 256:
+            return self.__codes[ord(char)]
+        return self.__lookup(char)
+
+    def encode_array(self, data):
+        """
+        the codes of every character of a str or bytes, or of every byte of
+        an array of bytes (uint8 or S1) of any shape, as a uint8 array,
+        exactly as calling the encoder on each would give
+        """
+        if isinstance(data, ndarray):
+            if data.dtype.kind == 'S' and data.dtype.itemsize == 1:
+                data = data.view(uint8)
+            elif data.dtype != uint8:
+                raise ValueError('encode_array() expects an array of bytes')
+        else:
+            if not isinstance(data, bytes):
+                # characters beyond latin-1 encode as '?', as good as unknown
+                data = data.encode('latin-1', 'replace')
+            data = frombuffer(data, dtype=uint8)
+        return self.__table[data]
 
     def __getitem__(self, idx):
         if not isinstance(idx, int):
@@ -111,10 +187,10 @@ class Encoder:
         return self.__list[idx]
 
     def __repr__(self):
-        return self.mode
+        return self.__name
 
     def __str__(self):
-        return self.mode
+        return self.__name
 
     @staticmethod
     def __dict_and_list(alphabet):
@@ -127,6 +203,10 @@ class Encoder:
     def mode(self):
         return self.__mode
 
+    @property
+    def table(self):
+        return self.__table
+
     def todict(self):
         # return a manual deepcopy, as deepcopy is currently barfing
         d = defaultdict(ConstantFactory(self.__dict['X']))
@@ -146,6 +226,35 @@ class IdentityEncoder(Encoder):
         super(IdentityEncoder, self).__init__(Encoder.CUSTOM, chars)
 
 
+class ReducedEncoder(Encoder):
+    """
+    the 20 amino acids clustered into ngroup groups by the average linkage
+    of their substitution matrix scores, plus X and gap groups as Stanfel has
+    """
+
+    def __init__(self, ngroup, matrix='blosum62'):
+        letters, scores = substitution_matrix(matrix)
+        aminos = [i for i, ltr in enumerate(letters) if ltr in 'ACDEFGHIKLMNPQRSTVWY']
+        if not isinstance(ngroup, int) or not 1 <= ngroup <= len(aminos):
+            raise ValueError('ngroup expects an integer from 1 to {0:d}'.format(len(aminos)))
+        clusters = _average_linkage(scores[ix_(aminos, aminos)], ngroup)
+        # order the groups by their members' order in the amino alphabet
+        alph = Encoder.AMINO_ALPH
+        clusters.sort(key=lambda c: min(alph.index(letters[aminos[i]]) for i in c))
+        groups = dict(
+            (letters[aminos[i]], g)
+            for g, cluster in enumerate(clusters)
+            for i in cluster
+            )
+        groups['X'] = ngroup
+        groups['-'] = ngroup + 1
+        super(ReducedEncoder, self).__init__(
+            Encoder.GROUPED,
+            groups=groups,
+            name='{0:s}-{1:d}'.format(matrix.lower(), ngroup)
+            )
+
+
 AminoEncoder = Encoder(mode=Encoder.AMINO)
 DNAEncoder = Encoder(mode=Encoder.DNA)
 StanfelEncoder = Encoder(mode=Encoder.STANFEL)
@@ -22,23 +22,285 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 #
 
+from multiprocessing import Pool, RawArray, cpu_count
+
+from numpy import asarray, concatenate, frombuffer, hstack, uint8, vstack
+
+from scipy.sparse import csr_matrix, hstack as sparse_hstack, issparse, vstack as sparse_vstack
+
 from sklearn.pipeline import FeatureUnion as FeatureUnion_
 
+from idepi.feature_extraction._bitmatrix import *
+from idepi.feature_extraction._common import TransformIterMixin, duplicate_features
+from idepi.feature_extraction._encodedmsa import *
+from idepi.feature_extraction._featurenames import *
 from idepi.feature_extraction._sitevectorizer import *
 from idepi.feature_extraction._pairwisesitevectorizer import *
+from idepi.feature_extraction._siteinteractionvectorizer import *
 from idepi.feature_extraction._motifvectorizer import *
 from idepi.feature_extraction._pairwisemotifvectorizer import *
+from idepi.feature_extraction._multimotifvectorizer import *
 
 __all__ = ['FeatureUnion']
+__all__ += _bitmatrix.__all__
+__all__ += _encodedmsa.__all__
+__all__ += _featurenames.__all__
 __all__ += _sitevectorizer.__all__
 __all__ += _pairwisesitevectorizer.__all__
+__all__ += _siteinteractionvectorizer.__all__
 __all__ += _motifvectorizer.__all__
 __all__ += _pairwisemotifvectorizer.__all__
+__all__ += _multimotifvectorizer.__all__
 
 
-class FeatureUnion(FeatureUnion_):
-    def get_feature_names(self):
-        feature_names = []
+# each worker maps the shared alignment bytes exactly once, when it starts
+_WORKER_BYTES = None
+
+
+def _init_worker(shared):
+    global _WORKER_BYTES
+    _WORKER_BYTES = frombuffer(shared, dtype=uint8)
+
+
+# these return the fitted transformer (if any) and its block of features
+
+def _fit_one(trans, msa):
+    return trans.fit(msa), None
+
+
+def _fit_transform_one(trans, msa):
+    return trans, trans.fit_transform(msa)
+
+
+def _transform_one(trans, msa):
+    return None, trans.transform(msa)
+
+
+def _partial_fit_one(trans, msa):
+    return trans.partial_fit(msa), None
+
+
+def _apply(args):
+    # only the transformer and the shape of the alignment are pickled; the
+    # worker reads the bytes from shared memory and derives the encoder
+    # codes and column filter masks there, keyed by the transformer's own
+    # encoder and filter
+    func, trans, shape, labels, positions = args
+    data = _WORKER_BYTES[:shape[0] * shape[1]].reshape(shape)
+    return func(trans, EncodedMSA(data, labels, positions))
+
+
+def _append(blocks, axis):
+    # stack the blocks of one transformer, whichever matrix type it returns
+    if isinstance(blocks[0], BitMatrix):
+        return BitMatrix.hstack(blocks) if axis else BitMatrix.vstack(blocks)
+    if issparse(blocks[0]):
+        return (sparse_hstack(blocks) if axis else sparse_vstack(blocks)).tocsr()
+    return hstack(blocks) if axis else vstack(blocks)
+
+
+class FeatureUnion(FeatureUnion_, TransformIterMixin):
+
+    def __init__(
+            self,
+            transformer_list,
+            n_jobs=1,
+            transformer_weights=None,
+            sparse=False,
+            packed=False,
+            deduplicate=False):
+        super(FeatureUnion, self).__init__(
+            transformer_list,
+            n_jobs=n_jobs,
+            transformer_weights=transformer_weights
+            )
+        self.sparse = sparse
+        self.packed = packed
+        self.deduplicate = deduplicate
+        # when deduplicating, the first of each group of identical
+        # features is kept, and groups_ records every member by index
+        self.support_ = None
+        self.groups_ = None
+        # the row chunks and per-transformer feature blocks of partial_fit_transform
+        self.__cache = None
+        # the worker processes, started once and kept for every later call,
+        # and the shared memory they read each alignment from
+        self.__pool = None
+        self.__pool_size = 0
+        self.__shared = None
+
+    def __getstate__(self):
+        # worker processes do not survive pickling
+        getstate = getattr(super(FeatureUnion, self), '__getstate__', None)
+        state = dict(self.__dict__ if getstate is None else getstate())
+        state['_FeatureUnion__pool'] = None
+        state['_FeatureUnion__pool_size'] = 0
+        state['_FeatureUnion__shared'] = None
+        return state
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        """
+        stop the worker processes, if any were started
+        """
+        pool = getattr(self, '_FeatureUnion__pool', None)
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        self.__pool = None
+        self.__pool_size = 0
+        self.__shared = None
+
+    def __workers(self, n_jobs, data):
+        # the pool is restarted only if it has too few bytes of shared
+        # memory for data, or a different number of workers
+        if self.__pool is None or self.__pool_size != n_jobs or len(self.__shared) < data.size:
+            self.close()
+            self.__shared = RawArray('B', data.size)
+            self.__pool = Pool(n_jobs, initializer=_init_worker, initargs=(self.__shared,))
+            self.__pool_size = n_jobs
+        # the pool is idle between calls, so its bytes can be overwritten
+        frombuffer(self.__shared, dtype=uint8)[:data.size].reshape(data.shape)[...] = data
+        return self.__pool
+
+    def __stack(self, Xs):
+        weights = self.transformer_weights or {}
+        if self.packed or any(isinstance(X, BitMatrix) for _, X in Xs):
+            if weights:
+                raise ValueError('transformer_weights are unsupported for bit-packed features')
+            return BitMatrix.hstack(BitMatrix.from_array(X) for _, X in Xs)
+        Xs = [X * weights[name] if name in weights else X for name, X in Xs]
+        if any(issparse(X) for X in Xs):
+            return sparse_hstack(Xs).tocsr()
+        elif self.sparse:
+            return csr_matrix(hstack(Xs))
+        return hstack(Xs)
+
+    def __n_jobs(self):
+        n_jobs = self.n_jobs or 1
+        if n_jobs < 0:
+            n_jobs = max(cpu_count() + 1 + n_jobs, 1)
+        return min(n_jobs, len(self.transformer_list))
+
+    def __map(self, func, msa):
+        # the alignment is parsed and encoded only once, and every
+        # transformer in the union shares the resulting EncodedMSA
+        msa = EncodedMSA.of(msa)
+        names = [name for name, _ in self.transformer_list]
+        transformers = [trans for _, trans in self.transformer_list]
+        n_jobs = self.__n_jobs()
+
+        if n_jobs <= 1 or msa.data.size == 0:
+            results = [func(trans, msa) for trans in transformers]
+        else:
+            # place the alignment bytes in shared memory once, so that
+            # the workers are sent only their transformers, never a copy
+            labels, positions = list(msa.labels), list(msa.positions)
+            results = self.__workers(n_jobs, msa.data).map(
+                _apply,
+                [(func, trans, msa.data.shape, labels, positions) for trans in transformers],
+                chunksize=1
+                )
+
+        # pool.map preserves order, so feature names stay deterministic
+        if func is not _transform_one:
+            self.transformer_list = [(name, trans) for name, (trans, _) in zip(names, results)]
+        return [(name, X) for name, (_, X) in zip(names, results)]
+
+    def __select(self, X):
+        if self.support_ is None:
+            return X
+        idxs = self.support_.nonzero()[0]
+        return X[:, idxs]
+
+    def fit(self, X, y=None):
+        self.__cache = None
+        if self.deduplicate:
+            # deduplication needs the features themselves
+            self.fit_transform(X, y)
+        else:
+            self.__map(_fit_one, X)
+            self.support_, self.groups_ = None, None
+        return self
+
+    def fit_transform(self, X, y=None):
+        self.__cache = None
+        X = self.__stack(self.__map(_fit_transform_one, X))
+        if self.deduplicate:
+            self.support_, self.groups_ = duplicate_features(X)
+        else:
+            self.support_, self.groups_ = None, None
+        return self.__select(X)
+
+    def transform(self, X):
+        return self.__select(self.__stack(self.__map(_transform_one, X)))
+
+    def partial_fit(self, X, y=None):
+        if self.deduplicate:
+            raise ValueError('partial_fit is unsupported when deduplicating features')
+        self.__map(_partial_fit_one, X)
+        return self
+
+    def partial_fit_transform(self, X, y=None):
+        """
+        extend every transformer's vocabulary with the rows of X, and return
+        the features of all the rows given to partial_fit_transform so far,
+        encoding only the rows of X and, for earlier rows, only new features
+        """
+        msa = EncodedMSA.of(X)
+        starts = [len(trans.get_feature_names()) for _, trans in self.transformer_list]
+        self.partial_fit(msa)
+        blocks = [X_ for _, X_ in self.__map(_transform_one, msa)]
+
+        if self.__cache is not None:
+            chunks, cached = self.__cache
+            for i, (_, trans) in enumerate(self.transformer_list):
+                # earlier rows need only the features learned just now
+                extra = _append([trans.transform(chunk, starts[i]) for chunk in chunks], 0)
+                blocks[i] = _append([_append([cached[i], extra], 1), blocks[i]], 0)
+            msa = chunks + [msa]
+        else:
+            msa = [msa]
+
+        self.__cache = (msa, blocks)
+        return self.__stack([(name, X_) for (name, _), X_ in zip(self.transformer_list, blocks)])
+
+    def resolve(self, X, idxs):
+        """
+        let every hashing transformer record the features of X behind
+        the output features idxs, so that their names can be rendered
+        """
+        idxs = asarray(idxs, dtype=int).reshape((-1,))
+        if self.support_ is not None:
+            # resolve every member of each feature's group of duplicates
+            idxs = concatenate([self.groups_[i] for i in idxs.tolist()] + [idxs[:0]])
+        msa = EncodedMSA.of(X)
+        lwr = 0
         for _, trans in self.transformer_list:
-            feature_names.extend(trans.get_feature_names())
-        return feature_names
+            upr = lwr + len(trans.get_feature_names())
+            local = idxs[(idxs >= lwr) & (idxs < upr)] - lwr
+            if len(local) and hasattr(trans, 'resolve'):
+                trans.resolve(msa, local)
+            lwr = upr
+        return self
+
+    def __all_feature_names(self):
+        return FeatureNames.concatenate(trans.get_feature_names() for _, trans in self.transformer_list)
+
+    def get_feature_names(self):
+        feature_names = self.__all_feature_names()
+        if self.support_ is None:
+            return feature_names
+        return feature_names.take(self.support_.nonzero()[0])
+
+    def get_feature_groups(self):
+        """
+        for every output feature, the names of all the features identical to
+        it, or None unless features are deduplicated
+        """
+        if self.support_ is None:
+            return None
+        feature_names = self.__all_feature_names()
+        return [feature_names.take(group) for group in self.groups_]
@@ -0,0 +1,303 @@
+"""
+This module provides a bit-packed binary feature matrix
+
+>>> X = BitMatrix.from_array([[1, 0], [1, 1], [0, 1]])
+>>> X.shape
+(3, 2)
+>>> X.counts().tolist()
+[2, 2]
+>>> X.toarray().tolist()
+[[1, 0], [1, 1], [0, 1]]
+>>> X[[2, 0]].toarray().tolist()
+[[0, 1], [1, 0]]
+"""
+
+from __future__ import division, print_function
+
+from numpy import (
+    arange,
+    array,
+    asarray,
+    ascontiguousarray,
+    bitwise_or,
+    concatenate,
+    diff,
+    arange,
+    left_shift,
+    log,
+    ones,
+    packbits,
+    right_shift,
+    uint8,
+    uint64,
+    unique,
+    unpackbits,
+    where,
+    zeros
+    )
+
+from scipy.sparse import csr_matrix, issparse
+
+
+__all__ = ['BitMatrix']
+
+
+try:
+    from numpy import bitwise_count
+
+    def _popcount(words):
+        return bitwise_count(words).sum(axis=-1, dtype=int)
+
+except ImportError:
+    _POPCOUNT8 = array([bin(i).count('1') for i in range(256)], dtype=uint8)
+
+    def _popcount(words):
+        words = ascontiguousarray(words)
+        return _POPCOUNT8[words.view(uint8)].sum(axis=-1, dtype=int)
+
+
+def _nwords(nsample):
+    return (nsample + 63) // 64
+
+
+def _pack(rows, cols, nsample, nfeat):
+    # OR each (row, col) bit into its word, one reduceat over the sorted keys
+    nword = _nwords(nsample)
+    words = zeros((nfeat * nword,), dtype=uint64)
+    rows = asarray(rows, dtype=int)
+    cols = asarray(cols, dtype=int)
+    if len(rows):
+        keys = cols * nword + rows // 64
+        bits = left_shift(uint64(1), (rows % 64).astype(uint64))
+        order = keys.argsort(kind='mergesort')
+        keys, bits = keys[order], bits[order]
+        starts = concatenate(([0], (diff(keys) != 0).nonzero()[0] + 1))
+        words[keys[starts]] = bitwise_or.reduceat(bits, starts)
+    return words.reshape((nfeat, nword))
+
+
+def _pack_bits(bits):
+    # pack an F x N matrix of 0/1 bytes, bit n of a feature's words being sample n
+    nfeat, nsample = bits.shape
+    bytes_ = zeros((nfeat, 8 * _nwords(nsample)), dtype=uint8)
+    bytes_[:, :(nsample + 7) // 8] = packbits(bits, axis=1, bitorder='little')
+    return bytes_.view('<u8').astype(uint64)
+
+
+def _take_rows(words, rows):
+    # gather the bits of samples rows, a block of features at a time, so
+    # that the unpacked bits never take more than a few megabytes
+    out = zeros((words.shape[0], _nwords(len(rows))), dtype=uint64)
+    shifts = (rows % 64).astype(uint64)
+    block = max(1, (1 << 20) // max(len(rows), 1))
+    for lwr in range(0, words.shape[0], block):
+        bits = right_shift(words[lwr:lwr + block][:, rows // 64], shifts) & uint64(1)
+        out[lwr:lwr + block] = _pack_bits(bits.astype(uint8))
+    return out
+
+
+def _slice_rows(words, lwr, upr):
+    # the bits of samples lwr to upr, shifted down from the words they span
+    nword = _nwords(upr - lwr)
+    word, shift = divmod(lwr, 64)
+    out = right_shift(words[:, word:word + nword], uint64(shift))
+    if shift:
+        carry = left_shift(words[:, word + 1:word + nword + 1], uint64(64 - shift))
+        out[:, :carry.shape[1]] |= carry
+    if (upr - lwr) % 64:
+        out[:, -1] &= uint64((1 << ((upr - lwr) % 64)) - 1)
+    return out
+
+
+def _mi(nxy, nx, ny, n):
+    # the p(x,y) log(p(x,y) / (p(x) p(y))) term of a contingency table cell,
+    # with 0 log 0 taken as 0 so that np.seterr(all='raise') stays quiet
+    nz = nxy > 0
+    nxy_ = where(nz, nxy, 1).astype(float)
+    den = where(nz, nx, 1).astype(float) * where(nz, ny, 1)
+    return where(nz, nxy_ * log(nxy_ * n / den), 0.) / n
+
+
+class BitMatrix(object):
+    """
+    an N x F binary feature matrix stored feature-major, as an F x ceil(N / 64)
+    array of uint64 words in which bit n of a feature's words is sample n;
+    indexing selects rows, or rows and features, as it would an array, so
+    that cross-validation can split it, and np.asarray() unpacks it
+    """
+
+    ndim = 2
+
+    def __init__(self, words, nsample):
+        words = ascontiguousarray(words, dtype=uint64)
+        if words.ndim != 2 or words.shape[1] != _nwords(nsample):
+            raise ValueError('words do not match the number of samples')
+        self.words = words
+        self.shape = (nsample, words.shape[0])
+
+    @staticmethod
+    def from_indices(rows, cols, shape):
+        return BitMatrix(_pack(rows, cols, shape[0], shape[1]), shape[0])
+
+    @staticmethod
+    def from_array(X):
+        if isinstance(X, BitMatrix):
+            return X
+        if issparse(X):
+            X = X.tocoo()
+            return BitMatrix.from_indices(X.row[X.data != 0], X.col[X.data != 0], X.shape)
+        X = asarray(X)
+        rows, cols = X.nonzero()
+        return BitMatrix.from_indices(rows, cols, X.shape)
+
+    @staticmethod
+    def hstack(blocks):
+        blocks = list(blocks)
+        nsample = blocks[0].shape[0]
+        if any(b.shape[0] != nsample for b in blocks):
+            raise ValueError('all blocks must share the same samples')
+        return BitMatrix(concatenate([b.words for b in blocks]), nsample)
+
+    @staticmethod
+    def vstack(blocks):
+        blocks = list(blocks)
+        nfeat = blocks[0].shape[1]
+        if any(b.shape[1] != nfeat for b in blocks):
+            raise ValueError('all blocks must share the same features')
+        nsample = sum(b.shape[0] for b in blocks)
+        words = zeros((nfeat, _nwords(nsample) + 1), dtype=uint64)
+        lwr = 0
+        # the bits past a block's last sample are clear, so each block is
+        # shifted into place and ORed over the words it straddles
+        for b in blocks:
+            word, shift = divmod(lwr, 64)
+            nword = b.words.shape[1]
+            words[:, word:word + nword] |= left_shift(b.words, uint64(shift))
+            if shift:
+                words[:, word + 1:word + nword + 1] |= right_shift(b.words, uint64(64 - shift))
+            lwr += b.shape[0]
+        return BitMatrix(words[:, :_nwords(nsample)], nsample)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, index):
+        if isinstance(index, tuple):
+            if len(index) != 2:
+                raise TypeError("invalid index type")
+            rows, cols = index
+            return self.take(cols, axis=1).take(rows)
+        return self.take(index)
+
+    def __array__(self, dtype=None, copy=None):
+        X = self.toarray()
+        return X if dtype is None else X.astype(dtype)
+
+    def __unpack(self):
+        # F x N matrix of bits
+        nsample = self.shape[0]
+        if self.shape[1] == 0:
+            return zeros((0, nsample), dtype=uint8)
+        bytes_ = ascontiguousarray(self.words.astype('<u8')).view(uint8)
+        # unpackbits is most-significant-bit first, so flip each byte
+        bits = unpackbits(bytes_, axis=1).reshape((self.shape[1], -1, 8))[:, :, ::-1]
+        return bits.reshape((self.shape[1], -1))[:, :nsample]
+
+    def toarray(self):
+        return self.__unpack().T.astype(int)
+
+    def tocsr(self):
+        cols, rows = self.__unpack().nonzero()
+        return csr_matrix(
+            (ones((len(rows),), dtype=int), (rows, cols)),
+            shape=self.shape
+            )
+
+    def pack_samples(self, mask):
+        """
+        pack a length N boolean sample mask into words compatible with ours
+        """
+        mask = asarray(mask, dtype=bool)
+        if mask.shape != (self.shape[0],):
+            raise ValueError('sample mask does not match the number of samples')
+        return _pack(mask.nonzero()[0], zeros((mask.sum(),), dtype=int), self.shape[0], 1)[0]
+
+    def counts(self):
+        """
+        the number of samples in which each feature is present
+        """
+        return _popcount(self.words)
+
+    def joint_counts(self, words):
+        """
+        the number of samples in which each feature and the packed sample set
+        `words` are both present
+        """
+        return _popcount(self.words & words)
+
+    def mutual_information(self, y):
+        """
+        the mutual information (in nats) between every feature and labels y
+        """
+        y = asarray(y)
+        n = self.shape[0]
+        if y.shape != (n,):
+            raise ValueError('labels do not match the number of samples')
+        mi = zeros((self.shape[1],), dtype=float)
+        if n == 0:
+            return mi
+        n1 = self.counts()
+        n0 = n - n1
+        for c in unique(y).tolist():
+            mask = y == c
+            nc = mask.sum()
+            n1c = self.joint_counts(self.pack_samples(mask))
+            mi += _mi(n1c, n1, nc, n) + _mi(nc - n1c, n0, nc, n)
+        return mi
+
+    def redundancy(self, j):
+        """
+        the mutual information (in nats) between feature j and every feature
+        """
+        n = self.shape[0]
+        if n == 0:
+            return zeros((self.shape[1],), dtype=float)
+        n1 = self.counts()
+        n0 = n - n1
+        n11 = self.joint_counts(self.words[j])
+        n10 = n1 - n11
+        n01 = n1[j] - n11
+        n00 = n - n1 - n1[j] + n11
+        return (
+            _mi(n11, n1, n1[j], n) +
+            _mi(n10, n1, n0[j], n) +
+            _mi(n01, n0, n1[j], n) +
+            _mi(n00, n0, n0[j], n)
+            )
+
+    def take(self, idxs, axis=0):
+        """
+        the samples (axis 0) or features (axis 1) at idxs, which may also
+        be an int, slice, Ellipsis or boolean mask, as a BitMatrix
+        """
+        n = self.shape[axis]
+        if idxs is Ellipsis:
+            return self
+        if isinstance(idxs, slice):
+            lwr, upr, step = idxs.indices(n)
+            if step == 1 and axis == 0:
+                # a run of samples is shifted out of the words it spans
+                upr = max(lwr, upr)
+                return BitMatrix(_slice_rows(self.words, lwr, upr), upr - lwr)
+            idxs = arange(n)[idxs]
+        idxs = asarray(idxs).reshape((-1,))
+        if idxs.dtype == bool:
+            if len(idxs) != n:
+                raise IndexError('boolean index does not match the dimension')
+            idxs = idxs.nonzero()[0]
+        idxs = arange(n)[idxs.astype(int)]
+        if axis == 1:
+            return BitMatrix(self.words[idxs], self.shape[0])
+        elif axis != 0:
+            raise ValueError('axis must be 0 or 1')
+        return BitMatrix(_take_rows(self.words, idxs), len(idxs))
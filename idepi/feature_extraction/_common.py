@@ -0,0 +1,149 @@
+from __future__ import division, print_function
+
+from math import ceil
+
+from numpy import (
+    arange,
+    ascontiguousarray,
+    asarray,
+    column_stack,
+    lexsort,
+    ones,
+    split,
+    uint64,
+    zeros
+    )
+
+from scipy.sparse import csr_matrix, issparse
+
+from idepi.feature_extraction._bitmatrix import BitMatrix
+
+
+__all__ = []
+
+
+def feature_matrix(rows, cols, shape, sparse=False, packed=False):
+    """
+    build a binary feature matrix with ones at (rows, cols), either dense,
+    in scipy.sparse CSR format, or bit-packed (which takes precedence)
+    """
+    if packed:
+        return BitMatrix.from_indices(rows, cols, shape)
+    if sparse:
+        data = csr_matrix((ones((len(rows),), dtype=int), (rows, cols)), shape=shape)
+        # duplicate coordinates are summed by the conversion, undo that
+        data.data[:] = 1
+        return data
+    data = zeros(shape, dtype=int)
+    data[rows, cols] = 1
+    return data
+
+
+class TransformIterMixin(object):
+
+    def transform_iter(self, alignment, chunk_size=1024):
+        """
+        transform alignment chunk_size rows at a time, yielding one block of
+        features per chunk, so that only a chunk is ever encoded at once
+        """
+        if not isinstance(chunk_size, int) or chunk_size < 1:
+            raise ValueError('chunk_size expects a positive integer')
+        for lwr in range(0, len(alignment), chunk_size):
+            yield self.transform(alignment[lwr:lwr + chunk_size])
+
+
+def check_alignment_length(ncol, learned):
+    if ncol != learned:
+        msg = 'alignment length ({0:d}) does not match the learned length ({1:d})'.format(
+            ncol,
+            learned
+            )
+        raise ValueError(msg)
+
+
+def min_count(min_support, nsample):
+    """
+    the number of samples a minimum support amounts to, min_support being a
+    count or, if below 1, a fraction of nsample; never less than 1
+    """
+    if min_support < 0:
+        raise ValueError('min_support expects a nonnegative number')
+    if min_support < 1:
+        return max(int(ceil(min_support * nsample)), 1)
+    return int(min_support)
+
+
+def lookup(vkeys, keys):
+    """
+    the index of each of keys in the (not necessarily sorted) vkeys,
+    and a mask of the keys that are present at all
+    """
+    if len(vkeys) == 0:
+        return zeros(keys.shape, dtype=int), zeros(keys.shape, dtype=bool)
+    order = vkeys.argsort(kind='mergesort')
+    pos = vkeys[order].searchsorted(keys).clip(0, len(vkeys) - 1)
+    idxs = order[pos]
+    return idxs, vkeys[idxs] == keys
+
+
+def hash_features(keys, n_features):
+    """
+    map nonnegative integer feature keys into range(n_features) with the
+    splitmix64 finalizer, vectorized over keys
+    """
+    z = asarray(keys, dtype=int).astype(uint64) + uint64(0x9e3779b97f4a7c15)
+    z = (z ^ (z >> uint64(30))) * uint64(0xbf58476d1ce4e5b9)
+    z = (z ^ (z >> uint64(27))) * uint64(0x94d049bb133111eb)
+    z ^= z >> uint64(31)
+    return (z % uint64(n_features)).astype(int)
+
+
+_FNV_OFFSET = uint64(14695981039346656037)
+_FNV_PRIME = uint64(1099511628211)
+
+
+def duplicate_features(X):
+    """
+    group the identical columns of a matrix of (weighted) indicator features,
+    returning a boolean mask selecting the first column of every group and,
+    for each selected column, the indices of all the columns in its group
+    """
+    nsample, nfeat = X.shape
+    if nfeat == 0:
+        return zeros((0,), dtype=bool), []
+    if isinstance(X, BitMatrix):
+        words, values = X.words, ones((nfeat,), dtype=float)
+    else:
+        words = BitMatrix.from_array(X).words
+        if nsample == 0:
+            values = zeros((nfeat,), dtype=float)
+        else:
+            values = asarray(X.max(axis=0).todense() if issparse(X) else X.max(axis=0))
+            values = values.ravel().astype(float)
+
+    # a column is its packed indicator pattern plus the value it takes
+    keys = column_stack((words, ascontiguousarray(values).view(uint64)))
+
+    # hash each column FNV-style, one 64-bit word at a time
+    hashes = zeros((nfeat,), dtype=uint64) + _FNV_OFFSET
+    for k in range(keys.shape[1]):
+        hashes = (hashes ^ keys[:, k]) * _FNV_PRIME
+
+    # a stable sort keeps every group in column order
+    order = hashes.argsort(kind='mergesort')
+    new = ones((nfeat,), dtype=bool)
+    new[1:] = hashes[order[1:]] != hashes[order[:-1]]
+    starts = new.nonzero()[0]
+
+    if not (keys[order] == keys[order[starts]][new.cumsum() - 1]).all():
+        # a hash collision, so fall back to sorting on the columns themselves
+        order = lexsort((arange(nfeat),) + tuple(keys.T[::-1]))
+        new[1:] = (keys[order[1:]] != keys[order[:-1]]).any(axis=1)
+        starts = new.nonzero()[0]
+
+    groups = split(order, starts[1:])
+    groups.sort(key=lambda group: group[0])
+    support = zeros((nfeat,), dtype=bool)
+    support[[group[0] for group in groups]] = True
+
+    return support, groups
@@ -0,0 +1,174 @@
+from __future__ import division, print_function
+
+from numpy import arange, bincount, frombuffer, ones, uint8, zeros
+
+from idepi.constants import GAPS
+from idepi.labeledmsa import ArrayMSA
+
+
+__all__ = ['EncodedMSA']
+
+
+_UPPER = arange(256, dtype=uint8)
+_UPPER[ord('a'):ord('z') + 1] -= ord('a') - ord('A')
+
+_GAPS = zeros((256,), dtype=bool)
+_GAPS[[ord(g) for g in GAPS]] = True
+
+
+def msa_bytes(alignment):
+    """
+    return the alignment as an N x L matrix of bytes
+    """
+    ncol = alignment.get_alignment_length()
+    buf = ''.join(str(record.seq) for record in alignment)
+    return frombuffer(buf.encode('ascii'), dtype=uint8).reshape((len(alignment), ncol))
+
+
+class EncodedMSA(object):
+    """
+    a LabeledMSA parsed once into an N x L byte matrix, from which encoder
+    codes, ungapped-to-aligned coordinate maps and column filter results
+    are derived at most once and shared by every consumer
+    """
+
+    def __init__(self, data, labels, positions):
+        if data.ndim != 2 or len(labels) != data.shape[1] or len(positions) != data.shape[1]:
+            raise ValueError("all arguments must share the same column space")
+        self.__data = data
+        self.__labels = list(labels)
+        self.__positions = list(positions)
+        self.__upper = None
+        self.__histogram = None
+        self.__compacted = None
+        self.__ungapped = None
+        self.__codes = {}
+        self.__allowed = {}
+        self.__letters = {}
+
+    @staticmethod
+    def of(alignment):
+        if isinstance(alignment, EncodedMSA):
+            return alignment
+        if isinstance(alignment, ArrayMSA):
+            # already bytes, so share them rather than parse the records
+            return EncodedMSA(alignment.data, list(alignment.labels), list(alignment.positions))
+        return EncodedMSA(
+            msa_bytes(alignment),
+            list(alignment.labels),
+            list(alignment.positions)
+            )
+
+    def __len__(self):
+        return self.__data.shape[0]
+
+    def __getitem__(self, index):
+        # rows only, as a view sharing the bytes
+        if not isinstance(index, slice):
+            raise TypeError("invalid index type")
+        return EncodedMSA(self.__data[index], self.__labels, self.__positions)
+
+    def get_alignment_length(self):
+        return self.__data.shape[1]
+
+    @property
+    def labels(self):
+        return iter(self.__labels)
+
+    @property
+    def positions(self):
+        return iter(self.__positions)
+
+    @property
+    def data(self):
+        return self.__data
+
+    @property
+    def upper(self):
+        if self.__upper is None:
+            self.__upper = _UPPER[self.__data]
+        return self.__upper
+
+    def column(self, idx):
+        return self.__data[:, idx].tobytes().decode('ascii')
+
+    def codes(self, encoder):
+        """
+        the N x L matrix of encoder codes for the upper-cased alignment
+        """
+        if encoder not in self.__codes:
+            self.__codes[encoder] = encoder.encode_array(self.upper)
+        return self.__codes[encoder]
+
+    @property
+    def histogram(self):
+        """
+        the L x 256 counts of every upper-cased byte in each column
+        """
+        if self.__histogram is None:
+            ncol = self.get_alignment_length()
+            keys = arange(ncol) * 256 + self.upper
+            self.__histogram = bincount(keys.ravel(), minlength=ncol * 256).reshape((ncol, 256))
+        return self.__histogram
+
+    def allowed(self, filter):
+        """
+        the L x 256 mask of the upper-cased bytes each column filter admits,
+        evaluated for all columns at once if the filter has columns()
+        """
+        if filter not in self.__allowed:
+            if hasattr(filter, 'columns'):
+                mask = filter.columns(self.histogram)
+            else:
+                mask = zeros((self.get_alignment_length(), 256), dtype=bool)
+                for i in range(self.get_alignment_length()):
+                    letters = ''.join(filter(self.column(i))).encode('latin-1', 'replace')
+                    mask[i, frombuffer(letters, dtype=uint8)] = True
+            self.__allowed[filter] = mask
+        return self.__allowed[filter]
+
+    def letters(self, filter):
+        """
+        the letters each column filter admits, one list per column
+        """
+        if filter not in self.__letters:
+            if hasattr(filter, 'columns'):
+                self.__letters[filter] = [
+                    [chr(b) for b in row.nonzero()[0].tolist()] for row in self.allowed(filter)
+                    ]
+            else:
+                self.__letters[filter] = [
+                    filter(self.column(i)) for i in range(self.get_alignment_length())
+                    ]
+        return self.__letters[filter]
+
+    def compacted(self):
+        """
+        the ungapped sequences as an N x M byte matrix padded with zero bytes,
+        and the aligned column of every letter in it (-1 in the padding)
+        """
+        if self.__compacted is None:
+            residues = ~_GAPS[self.__data]
+            rows, cols = residues.nonzero()
+            ranks = residues.cumsum(axis=1)[rows, cols] - 1
+            width = int(ranks.max()) + 1 if len(ranks) else 0
+            seqs = zeros((len(self), width), dtype=uint8)
+            seqs[rows, ranks] = self.__data[rows, cols]
+            index = -ones((len(self), width), dtype=int)
+            index[rows, ranks] = cols
+            self.__compacted = (seqs, index)
+        return self.__compacted
+
+    def ungapped(self):
+        """
+        the ungapped sequences, and for each the aligned column of every letter
+        """
+        if self.__ungapped is None:
+            seqs_, index = self.compacted()
+            lengths = (index >= 0).sum(axis=1).tolist()
+            seqs, cols = [], []
+            for row, idxs, n in zip(seqs_, index, lengths):
+                seqs.append(row[:n].tobytes().decode('ascii'))
+                cols.append(idxs[:n].tolist())
+            self.__ungapped = (seqs, cols)
+        return self.__ungapped
@@ -0,0 +1,126 @@
+"""
+This module provides a lazily rendered sequence of feature names
+
+>>> names = FeatureNames([[0, 1, -1, -1, 0], [1, 0, 0, 1, 1]], ['{0:s}{1:s}', '{0:s}{1:s}+{2:s}{3:s}'], ['1', '2'], ['A', 'C'])
+>>> len(names), names[0], names[-1]
+(2, '1C', '2A+1C')
+>>> list(names.take([1]))
+['2A+1C']
+"""
+
+from __future__ import division, print_function
+
+from numpy import asarray, broadcast_arrays, column_stack, concatenate, where, zeros
+
+
+__all__ = ['FeatureNames']
+
+
+def feature_ids(cols, codes=-1, cols2=-1, codes2=-1, kinds=0):
+    """
+    stack (column, code, column2, code2, kind) feature identities into a
+    K x 5 array, broadcasting any scalars
+    """
+    ids = broadcast_arrays(*[asarray(x, dtype=int) for x in (cols, codes, cols2, codes2, kinds)])
+    return column_stack(ids).reshape((-1, 5))
+
+
+def _shift(ids, nletter, nformat):
+    # move ids into the letters and kinds of a larger table
+    ids = ids.copy()
+    for k in (1, 3):
+        ids[:, k] = where(ids[:, k] >= 0, ids[:, k] + nletter, -1)
+    ids[:, 4] += nformat
+    return ids
+
+
+class FeatureNames(object):
+    """
+    a read-only sequence of feature names, kept as a K x 5 integer array of
+    (column, code, column2, code2, kind) feature identities and rendered only
+    when a name is asked for, by formatting the kind's format string with the
+    column labels and letters of each identity (empty if out of range), then
+    the raw identity itself; a feature may also map to several identities
+    through collisions, a dict of feature index to M x 5 array, whose names
+    are joined by '|', or through compounds, a like dict of the identities
+    a feature is the conjunction of, whose names are joined by '+'
+    """
+
+    def __init__(self, ids, formats, column_labels, letters=(), collisions=None, compounds=None):
+        self.ids = asarray(ids, dtype=int).reshape((-1, 5))
+        self.formats = list(formats)
+        self.column_labels = list(column_labels)
+        self.letters = list(letters)
+        self.collisions = dict(collisions or {})
+        self.compounds = dict(compounds or {})
+
+    @staticmethod
+    def concatenate(parts):
+        parts = [part for part in parts if len(part)]
+        if not parts:
+            return FeatureNames(zeros((0, 5), dtype=int), [], [])
+        column_labels = parts[0].column_labels
+        if any(part.column_labels != column_labels for part in parts[1:]):
+            raise ValueError('feature names must share the same column labels')
+        ids, formats, letters, collisions, compounds, nfeat = [], [], [], {}, {}, 0
+        # give each part its own range of letters and kinds
+        for part in parts:
+            ids.append(_shift(part.ids, len(letters), len(formats)))
+            for idx, ids_ in part.collisions.items():
+                collisions[nfeat + idx] = _shift(ids_, len(letters), len(formats))
+            for idx, ids_ in part.compounds.items():
+                compounds[nfeat + idx] = _shift(ids_, len(letters), len(formats))
+            formats.extend(part.formats)
+            letters.extend(part.letters)
+            nfeat += len(part)
+        return FeatureNames(concatenate(ids), formats, column_labels, letters, collisions, compounds)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __render(self, x, table):
+        return table[x] if 0 <= x < len(table) else ''
+
+    def __format(self, col, code, col2, code2, kind):
+        return self.formats[kind].format(
+            self.__render(col, self.column_labels),
+            self.__render(code, self.letters),
+            self.__render(col2, self.column_labels),
+            self.__render(code2, self.letters),
+            col,
+            code,
+            col2,
+            code2
+            )
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        idx = range(len(self))[idx]
+        if idx in self.collisions:
+            return '|'.join(self.__format(*ids) for ids in self.collisions[idx].tolist())
+        if idx in self.compounds:
+            return '+'.join(self.__format(*ids) for ids in self.compounds[idx].tolist())
+        return self.__format(*self.ids[idx].tolist())
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def take(self, idxs):
+        """
+        the names of the features at idxs, still unrendered
+        """
+        idxs = asarray(idxs, dtype=int).reshape((-1,))
+        collisions, compounds = {}, {}
+        for i, idx in enumerate(idxs.tolist()):
+            if idx in self.collisions:
+                collisions[i] = self.collisions[idx]
+            if idx in self.compounds:
+                compounds[i] = self.compounds[idx]
+        names = FeatureNames(self.ids[idxs], (), (), (), collisions, compounds)
+        # the tables are never modified, so share rather than copy them
+        names.formats = self.formats
+        names.column_labels = self.column_labels
+        names.letters = self.letters
+        return names
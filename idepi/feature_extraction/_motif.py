@@ -0,0 +1,264 @@
+"""
+This module finds fixed-width motifs in every ungapped sequence of an
+alignment at once, falling back to the regex engine for anything else
+
+>>> import re
+>>> masks = compile_motif(re.compile(r'N[^P][TS][^P]', re.I))
+>>> len(masks), bool(masks[0][ord('n')]), bool(masks[1][ord('p')])
+(4, True, False)
+>>> compile_motif(re.compile(r'N+')) is None
+True
+"""
+
+from __future__ import division, print_function
+
+import re
+
+from numpy import array, concatenate, lexsort, ones, uint64, zeros
+
+try:
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError:
+    import sre_constants
+    import sre_parse
+
+
+__all__ = []
+
+
+_FLAGS = re.I | re.S | getattr(re, 'U', 0) | getattr(re, 'A', 0)
+
+
+def _casefold(chars):
+    return set(chars) | set(c.lower() for c in chars) | set(c.upper() for c in chars)
+
+
+def _class(op, av, flags):
+    # the set of characters one position of the pattern admits
+    negate = False
+    if op == sre_constants.LITERAL:
+        chars = set([chr(av)])
+    elif op == sre_constants.NOT_LITERAL:
+        chars, negate = set([chr(av)]), True
+    elif op == sre_constants.ANY:
+        chars, negate = (set() if flags & re.S else set(['\n'])), True
+    elif op == sre_constants.IN:
+        chars = set()
+        for op_, av_ in av:
+            if op_ == sre_constants.NEGATE:
+                negate = True
+            elif op_ == sre_constants.LITERAL:
+                chars.add(chr(av_))
+            elif op_ == sre_constants.RANGE:
+                chars.update(chr(c) for c in range(av_[0], min(av_[1], 255) + 1))
+            else:
+                return None
+    else:
+        return None
+    if flags & re.I and op != sre_constants.ANY:
+        chars = _casefold(chars)
+    mask = zeros((256,), dtype=bool)
+    mask[[ord(c) for c in chars if ord(c) < 256]] = True
+    if negate:
+        mask = ~mask
+    # the zero byte pads the compacted sequences and must never match
+    mask[0] = False
+    return mask
+
+
+def _masks(parsed, flags):
+    masks = []
+    for op, av in parsed:
+        if op == sre_constants.SUBPATTERN:
+            # (group, p) before python 3.6, (group, add, del, p) after
+            if len(av) > 2 and (av[1] or av[2]):
+                return None
+            sub = _masks(av[-1], flags)
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT) and av[0] == av[1]:
+            sub = _masks(av[2], flags)
+            sub = None if sub is None else sub * av[0]
+        else:
+            mask = _class(op, av, flags)
+            sub = None if mask is None else [mask]
+        if sub is None:
+            return None
+        masks.extend(sub)
+    return masks
+
+
+def compile_motif(regex):
+    """
+    one 256-entry byte mask per position of regex, or None if regex is not
+    a fixed-width run of character classes
+    """
+    if not isinstance(regex.pattern, str) or regex.flags & ~(_FLAGS | getattr(re, 'T', 0)):
+        return None
+    try:
+        masks = _masks(sre_parse.parse(regex.pattern, regex.flags), regex.flags)
+    except (re.error, TypeError, ValueError):
+        return None
+    return masks if masks else None
+
+
+def _nonoverlapping(rows, starts, width):
+    # finditer resumes its scan after each match, so a hit that starts
+    # inside the last hit kept for the same sequence is not reported
+    close = (rows[1:] == rows[:-1]) & (starts[1:] - starts[:-1] < width)
+    if not close.any():
+        return rows, starts
+    keep = ones((len(rows),), dtype=bool)
+    for i in (close.nonzero()[0] + 1).tolist():
+        j = i - 1
+        while not keep[j]:
+            j -= 1
+        if rows[j] == rows[i] and starts[i] - starts[j] < width:
+            keep[i] = False
+    return rows[keep], starts[keep]
+
+
+def _check_length(match, regex_length):
+    if regex_length >= 0 and len(match) != regex_length:
+        raise ValueError("supplied regex_length incorrect for: '{0}'".format(match))
+
+
+def _find_regex(msa, regex, regex_length):
+    rows, cols = [], []
+    for i, (seq_, cols_) in enumerate(zip(*msa.ungapped())):
+        for m in regex.finditer(seq_):
+            _check_length(m.group(0), regex_length)
+            rows.append(i)
+            cols.append(cols_[m.start(0)])
+    return array(rows, dtype=int), array(cols, dtype=int)
+
+
+def find_motif(msa, regex, regex_length=-1):
+    """
+    the sequence and aligned column of every match of regex in the ungapped
+    sequences of an EncodedMSA, ordered by sequence then column
+    """
+    masks = compile_motif(regex)
+    if masks is None:
+        return _find_regex(msa, regex, regex_length)
+
+    seqs, index = msa.compacted()
+    width = len(masks)
+    nstart = seqs.shape[1] - width + 1
+
+    if nstart <= 0:
+        return zeros((0,), dtype=int), zeros((0,), dtype=int)
+
+    # a motif starts wherever every one of its shifted masks agrees
+    hits = masks[0][seqs[:, :nstart]]
+    for k, mask in enumerate(masks[1:], start=1):
+        hits &= mask[seqs[:, k:k + nstart]]
+
+    rows, starts = _nonoverlapping(*hits.nonzero(), width=width)
+
+    if len(rows):
+        _check_length(seqs[rows[0], starts[0]:starts[0] + width].tobytes().decode('ascii'), regex_length)
+
+    return rows, index[rows, starts]
+
+
+def motif_pairs(rows, cols, ncol):
+    """
+    the sequence and (column * ncol + column) key of every pair of distinct
+    motif hits within a sequence, as produced by find_motif
+    """
+    keys, rows_ = [zeros((0,), dtype=int)], [zeros((0,), dtype=int)]
+    bounds = concatenate(([0], (rows[1:] != rows[:-1]).nonzero()[0] + 1, [len(rows)]))
+    for lwr, upr in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        if upr - lwr < 2:
+            continue
+        cols_ = cols[lwr:upr]
+        idx1, idx2 = (cols_[:, None] < cols_[None, :]).nonzero()
+        keys.append(cols_[idx1] * ncol + cols_[idx2])
+        rows_.append(zeros((len(idx1),), dtype=int) + rows[lwr])
+    return concatenate(rows_), concatenate(keys)
+
+
+class MotifScanner(object):
+    """
+    a shift-and automaton that finds several motifs in one pass over the
+    gap-compacted alignment, keeping one state bit per motif position and
+    packing the motifs into as few 64-bit words as fit
+    """
+
+    def __init__(self, regexes):
+        self.regexes = list(regexes)
+        self.__fallback = []
+        # (word, bit of the final position, width) per fixed-width motif
+        self.__slots = {}
+        tables, starts = [], []
+        used = 64
+        for m, regex in enumerate(self.regexes):
+            masks = compile_motif(regex)
+            if masks is None or len(masks) > 64:
+                self.__fallback.append(m)
+                continue
+            if used + len(masks) > 64:
+                tables.append(zeros((256,), dtype=uint64))
+                starts.append(0)
+                used = 0
+            for k, mask in enumerate(masks):
+                tables[-1][mask] |= uint64(1) << uint64(used + k)
+            starts[-1] |= 1 << used
+            used += len(masks)
+            self.__slots[m] = (len(tables) - 1, uint64(1) << uint64(used - 1), len(masks))
+        self.__tables = array(tables, dtype=uint64).reshape((len(tables), 256))
+        self.__starts = array(starts, dtype=uint64)
+        # the bits of the final positions in each word
+        self.__finals = zeros((len(tables),), dtype=uint64)
+        for word, final, _ in self.__slots.values():
+            self.__finals[word] |= final
+
+    def __len__(self):
+        return len(self.regexes)
+
+    def scan(self, msa, regex_lengths=None):
+        """
+        for every motif, the sequence and aligned column of each of its
+        matches, ordered by sequence then column as find_motif does
+        """
+        if regex_lengths is None:
+            regex_lengths = [-1] * len(self.regexes)
+
+        seqs, index = msa.compacted()
+        nseq, width = seqs.shape
+        tables, starts, finals = self.__tables, self.__starts[:, None], self.__finals[:, None]
+
+        # a single left-to-right traversal advances every motif at once,
+        # keeping only the current state of each sequence, and records
+        # the word, sequence, end and final bits of every state that has
+        # any motif ending at that position
+        words, rows, ends, bits = [], [], [], []
+        state = zeros((len(tables), nseq), dtype=uint64)
+        for p in range(width if len(tables) else 0):
+            state = ((state << uint64(1)) | starts) & tables[:, seqs[:, p]]
+            found = state & finals
+            words_, rows_ = found.nonzero()
+            if len(words_):
+                words.append(words_)
+                rows.append(rows_)
+                ends.append(zeros((len(words_),), dtype=int) + p)
+                bits.append(found[words_, rows_])
+        words, rows, ends = [concatenate([zeros((0,), dtype=int)] + v) for v in (words, rows, ends)]
+        bits = concatenate([zeros((0,), dtype=uint64)] + bits)
+
+        hits = []
+        for m, regex in enumerate(self.regexes):
+            if m not in self.__slots:
+                hits.append(_find_regex(msa, regex, regex_lengths[m]))
+                continue
+            word, final, nchar = self.__slots[m]
+            keep = ((words == word) & ((bits & final) != 0)).nonzero()[0]
+            keep = keep[lexsort((ends[keep], rows[keep]))]
+            rows_, starts_ = _nonoverlapping(rows[keep], ends[keep] - nchar + 1, nchar)
+            if len(rows_):
+                _check_length(
+                    seqs[rows_[0], starts_[0]:starts_[0] + nchar].tobytes().decode('ascii'),
+                    regex_lengths[m]
+                    )
+            hits.append((rows_, index[rows_, starts_]))
+
+        return hits
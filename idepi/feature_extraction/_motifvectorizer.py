@@ -8,96 +8,78 @@ This module provides a class to convert alignments to matrices suitable for cons
 
 from __future__ import division, print_function
 
-from numpy import zeros
+from numpy import arange, concatenate, ones, setdiff1d, unique, zeros
 
 from sklearn.base import BaseEstimator, TransformerMixin
 
-from idepi.constants import GAPS
-from idepi.labeledmsa import LabeledMSA
+from idepi.feature_extraction._common import TransformIterMixin, feature_matrix
+from idepi.feature_extraction._encodedmsa import EncodedMSA
+from idepi.feature_extraction._featurenames import FeatureNames, feature_ids
+from idepi.feature_extraction._motif import find_motif
+from idepi.labeledmsa import ArrayMSA, LabeledMSA
 
 
 __all__ = ['MotifVectorizer']
 
 
-class MotifVectorizer(BaseEstimator, TransformerMixin):
+class MotifVectorizer(BaseEstimator, TransformerMixin, TransformIterMixin):
 
-    def __init__(self, regex, regex_length=-1, name=''):
+    def __init__(self, regex, regex_length=-1, name='', sparse=False, packed=False):
         self.name = name
         self.regex = regex
         self.regex_length = regex_length
-        self.feature_names_ = []
-        self.vocabulary_ = {}
+        self.sparse = sparse
+        self.packed = packed
+        self.column_labels_ = []
+        # a K x 5 array of (column, -1, -1, -1, 0) feature identities
+        self.feature_ids_ = zeros((0, 5), dtype=int)
 
     def fit(self, alignment):
-        if not isinstance(alignment, LabeledMSA):
+        self.column_labels_ = []
+        self.feature_ids_ = zeros((0, 5), dtype=int)
+        return self.partial_fit(alignment)
+
+    def partial_fit(self, alignment):
+        """
+        extend the vocabulary with the motif positions found in alignment,
+        keeping the indices of every feature already learned
+        """
+        if not isinstance(alignment, (LabeledMSA, ArrayMSA, EncodedMSA)):
             raise ValueError("MotifVectorizers require a LabeledMSA")
 
-        calls = set()
+        msa = EncodedMSA.of(alignment)
+        # do NOT convert to encoder coords
+        _, cols = find_motif(msa, self.regex, self.regex_length)
+        calls = setdiff1d(unique(cols), self.feature_ids_[:, 0])
 
-        for idx, seq in enumerate(alignment):
-            # do NOT convert to encoder coords
-            cols = []
-            ltrs = []
-            for col, ltr in enumerate(str(seq.seq)):
-                if ltr not in GAPS:
-                    cols.append(col)
-                    ltrs.append(ltr)
-
-            seq_ = ''.join(ltrs)
-
-            for m in self.regex.finditer(seq_):
-                start = m.start(0)
-                idx = cols[start]
-                calls.add(idx)
-                if self.regex_length >= 0 and len(m.group(0)) != self.regex_length:
-                    raise ValueError(
-                        "supplied regex_length incorrect for: '{0}'".format(m.group(0))
-                        )
-
-        column_labels = list(alignment.labels)
-        feature_names = []
-        vocab = {}
-
-        for j, idx in enumerate(sorted(calls)):
-            vocab[idx] = j
-            feature_names.append('{0:s}({1:s})'.format(self.name, column_labels[idx]))
-
-        self.feature_names_ = feature_names
-        self.vocabulary_ = vocab
+        if not self.column_labels_:
+            self.column_labels_ = list(msa.labels)
+        self.feature_ids_ = concatenate((self.feature_ids_, feature_ids(calls)))
 
         return self
 
-    def transform(self, alignment):
-        vocab = self.vocabulary_
-        data = zeros((len(alignment), len(vocab)), dtype=int)
+    def transform(self, alignment, start=0):
+        """
+        the features of alignment, or only those from index start on
+        """
+        vocab = self.feature_ids_[start:]
+        shape = (len(alignment), len(vocab))
 
         if len(vocab) == 0:
-            return data
-
-        for i, seq in enumerate(alignment):
-            # do NOT convert to encoder coords
-            cols = []
-            ltrs = []
-            for col, ltr in enumerate(str(seq.seq)):
-                if ltr not in GAPS:
-                    cols.append(col)
-                    ltrs.append(ltr)
-
-            seq_ = ''.join(ltrs)
+            return feature_matrix([], [], shape, self.sparse, self.packed)
 
-            # generate a list of all aln col idx at which the pattern is found,
-            # the sorted should be unnecessary (finditer scans l-to-r), but I'm paranoid
-            matches = sorted(cols[m.start(0)] for m in self.regex.finditer(seq_))
+        # do NOT convert to encoder coords
+        msa = EncodedMSA.of(alignment)
+        rows, cols = find_motif(msa, self.regex)
 
-            # match all idx pairs to the ones in filtercalls,
-            # and set the data matrix appropriately
-            for idx in matches:
-                try:
-                    data[i, vocab[idx]] = 1
-                except KeyError:
-                    pass
+        # map each hit's aln col idx to its feature, if it has one
+        table = -ones((max(msa.get_alignment_length(), vocab[:, 0].max() + 1),), dtype=int)
+        table[vocab[:, 0]] = arange(len(vocab))
+        idxs = table[cols]
+        keep = idxs >= 0
 
-        return data
+        return feature_matrix(rows[keep], idxs[keep], shape, self.sparse, self.packed)
 
     def get_feature_names(self):
-        return self.feature_names_
+        name = self.name.replace('{', '{{').replace('}', '}}')
+        return FeatureNames(self.feature_ids_, [name + '({0:s})'], self.column_labels_)
@@ -0,0 +1,209 @@
+"""
+This module provides a class to convert alignments to matrices suitable for consumption by scikit-learn
+
+>>> import re
+>>> m = MultiMotifVectorizer([
+...     ('PNGS', re.compile(r'N[^P][TS][^P]', re.I), 4),
+...     ('FURIN', re.compile(r'R..R'), 4)
+...     ], pairwise=True)
+
+"""
+
+from __future__ import division, print_function
+
+from numpy import arange, concatenate, union1d, unique, zeros
+
+from sklearn.base import BaseEstimator, TransformerMixin
+
+from idepi.feature_extraction._common import (
+    TransformIterMixin,
+    check_alignment_length,
+    feature_matrix,
+    hash_features,
+    lookup
+    )
+from idepi.feature_extraction._encodedmsa import EncodedMSA
+from idepi.feature_extraction._featurenames import FeatureNames, feature_ids
+from idepi.feature_extraction._motif import MotifScanner, motif_pairs
+from idepi.labeledmsa import ArrayMSA, LabeledMSA
+
+
+__all__ = ['MultiMotifVectorizer']
+
+
+def _feature_keys(kinds, cols, cols2, ncol):
+    return (kinds * ncol + cols) * (ncol + 1) + cols2 + 1
+
+
+def _pair_keys(motif, keys, ncol):
+    # the (column * ncol + column) keys of motif_pairs, made distinct per motif
+    return motif * ncol * ncol + keys
+
+
+class MultiMotifVectorizer(BaseEstimator, TransformerMixin, TransformIterMixin):
+    """
+    the features of MotifVectorizer and PairwiseMotifVectorizer for any number
+    of (name, regex, regex_length) motifs, found in one shared scan; if
+    n_features is given, the pairs of every motif are hashed into that many
+    features instead, which come before the single features
+    """
+
+    def __init__(self, motifs, single=True, pairwise=False, sparse=False, packed=False, n_features=None):
+        if n_features is not None and (not isinstance(n_features, int) or n_features < 1):
+            raise ValueError('n_features expects a positive integer')
+        self.__alignment_length = 0
+        self.motifs = motifs
+        self.single = single
+        self.pairwise = pairwise
+        self.sparse = sparse
+        self.packed = packed
+        self.n_features = n_features
+        self.column_labels_ = []
+        # for each motif, every aln col idx at which it has been found
+        self.motif_columns_ = []
+        # a K x 5 array of (column, -1, column2, -1, kind) feature identities,
+        # kind being the motif for single features (whose column2 is -1)
+        # and len(motifs) plus the motif for pairs
+        self.feature_ids_ = zeros((0, 5), dtype=int)
+        # when hashing, an M x 5 array of the pairs behind each resolved feature
+        self.collisions_ = {}
+
+    def __hashed(self):
+        # the number of hashed pair features
+        return self.n_features if self.pairwise and self.n_features is not None else 0
+
+    def __scan(self, msa, check=False):
+        scanner = MotifScanner(regex for _, regex, _ in self.motifs)
+        return scanner.scan(msa, [length for _, _, length in self.motifs] if check else None)
+
+    def fit(self, alignment):
+        self.__alignment_length = 0
+        self.motif_columns_ = []
+        self.feature_ids_ = zeros((0, 5), dtype=int)
+        self.collisions_ = {}
+        return self.partial_fit(alignment)
+
+    def partial_fit(self, alignment):
+        """
+        extend the vocabulary with the motif positions (and pairs of them)
+        found in alignment, keeping the indices of every feature already learned
+        """
+        if not isinstance(alignment, (LabeledMSA, ArrayMSA, EncodedMSA)):
+            raise ValueError("MultiMotifVectorizers require a LabeledMSA")
+
+        msa = EncodedMSA.of(alignment)
+        ncol = msa.get_alignment_length()
+        nmotif = len(self.motifs)
+
+        if self.__alignment_length == 0:
+            self.__alignment_length = ncol
+            self.column_labels_ = list(msa.labels)
+            self.motif_columns_ = [zeros((0,), dtype=int) for _ in range(nmotif)]
+        else:
+            check_alignment_length(ncol, self.__alignment_length)
+
+        singles, pairs = [zeros((0, 5), dtype=int)], [zeros((0, 5), dtype=int)]
+
+        # do NOT convert to encoder coords
+        for m, (_, cols) in enumerate(self.__scan(msa, check=True)):
+            calls = union1d(self.motif_columns_[m], unique(cols))
+            self.motif_columns_[m] = calls
+            if self.single:
+                singles.append(feature_ids(calls, kinds=m))
+            if self.pairwise and not self.__hashed():
+                idx1, idx2 = (calls[:, None] < calls[None, :]).nonzero()
+                pairs.append(feature_ids(calls[idx1], -1, calls[idx2], kinds=nmotif + m))
+
+        # new features follow the learned ones, singles before pairs,
+        # each ordered by motif then column(s)
+        vocab = concatenate([concatenate(singles), concatenate(pairs)])
+        ids = self.feature_ids_
+        _, known = lookup(
+            _feature_keys(ids[:, 4], ids[:, 0], ids[:, 2], ncol),
+            _feature_keys(vocab[:, 4], vocab[:, 0], vocab[:, 2], ncol)
+            )
+        self.feature_ids_ = concatenate((ids, vocab[~known]))
+
+        return self
+
+    def transform(self, alignment, start=0):
+        """
+        the features of alignment, or only those from index start on
+        """
+        ncol = alignment.get_alignment_length()
+        check_alignment_length(ncol, self.__alignment_length)
+
+        vocab = self.feature_ids_
+        nhash = self.__hashed()
+        shape = (len(alignment), nhash + len(vocab) - start)
+
+        if shape[1] == 0:
+            return feature_matrix([], [], shape, self.sparse, self.packed)
+
+        nmotif = len(self.motifs)
+        vkeys = _feature_keys(vocab[:, 4], vocab[:, 0], vocab[:, 2], ncol)
+        rows, feats = [zeros((0,), dtype=int)], [zeros((0,), dtype=int)]
+
+        for m, (rows_, cols) in enumerate(self.__scan(EncodedMSA.of(alignment))):
+            hits = [(rows_, _feature_keys(m, cols, -1, ncol))]
+            if self.pairwise:
+                prows, keys = motif_pairs(rows_, cols, ncol)
+                if nhash:
+                    rows.append(prows)
+                    feats.append(hash_features(_pair_keys(m, keys, ncol), nhash))
+                else:
+                    idx1, idx2 = divmod(keys, ncol)
+                    hits.append((prows, _feature_keys(nmotif + m, idx1, idx2, ncol)))
+            for rows__, keys in hits:
+                idxs, keep = lookup(vkeys, keys)
+                rows.append(rows__[keep])
+                feats.append(nhash + idxs[keep])
+
+        rows, feats = concatenate(rows), concatenate(feats) - start
+        keep = feats >= 0
+
+        return feature_matrix(rows[keep], feats[keep], shape, self.sparse, self.packed)
+
+    def resolve(self, alignment, idxs):
+        """
+        record which motif pairs observed in alignment hash into the features
+        idxs, so that their names can be rendered
+        """
+        nhash = self.__hashed()
+        if not nhash:
+            return self
+
+        ncol = self.__alignment_length
+        nmotif = len(self.motifs)
+        keys = [zeros((0,), dtype=int)]
+        for m, (rows, cols) in enumerate(self.__scan(EncodedMSA.of(alignment))):
+            keys.append(_pair_keys(m, motif_pairs(rows, cols, ncol)[1], ncol))
+        keys = unique(concatenate(keys))
+        hashes = hash_features(keys, nhash)
+        _, keep = lookup(unique(idxs), hashes)
+        keys, hashes = keys[keep], hashes[keep]
+
+        for idx in unique(hashes).tolist():
+            keys_ = keys[hashes == idx]
+            if idx in self.collisions_:
+                ids = self.collisions_[idx]
+                keys_ = union1d(keys_, _pair_keys(ids[:, 4] - nmotif, ids[:, 0] * ncol + ids[:, 2], ncol))
+            motifs, keys_ = divmod(keys_, ncol * ncol)
+            idx1, idx2 = divmod(keys_, ncol)
+            self.collisions_[idx] = feature_ids(idx1, -1, idx2, kinds=nmotif + motifs)
+
+        return self
+
+    def get_feature_names(self):
+        names = [name.replace('{', '{{').replace('}', '}}') for name, _, _ in self.motifs]
+        formats = [name + '({0:s})' for name in names] + [name + '({0:s}+{2:s})' for name in names]
+        nhash = self.__hashed()
+        if not nhash:
+            return FeatureNames(self.feature_ids_, formats, self.column_labels_)
+        # unresolved hashed features are named by their index alone
+        return FeatureNames(
+            concatenate((feature_ids(arange(nhash), kinds=len(formats)), self.feature_ids_)),
+            formats + ['|'.join(names) + '#{4:d}'],
+            self.column_labels_,
+            collisions=self.collisions_
+            )
@@ -1,101 +1,144 @@
 
-from numpy import zeros
+from numpy import arange, concatenate, union1d, unique, zeros
 
 from sklearn.base import BaseEstimator, TransformerMixin
 
-from idepi.constants import GAPS
-from idepi.labeledmsa import LabeledMSA
+from idepi.feature_extraction._common import TransformIterMixin, feature_matrix, hash_features, lookup
+from idepi.feature_extraction._encodedmsa import EncodedMSA
+from idepi.feature_extraction._featurenames import FeatureNames, feature_ids
+from idepi.feature_extraction._motif import find_motif, motif_pairs
+from idepi.labeledmsa import ArrayMSA, LabeledMSA
 
 
 __all__ = ['PairwiseMotifVectorizer']
 
 
-class PairwiseMotifVectorizer(BaseEstimator, TransformerMixin):
+class PairwiseMotifVectorizer(BaseEstimator, TransformerMixin, TransformIterMixin):
+    """
+    pairs of motif positions; if n_features is given, pairs are hashed into
+    that many features instead, as PairwiseSiteVectorizer does
+    """
 
-    def __init__(self, regex, regex_length=-1, name=''):
+    def __init__(self, regex, regex_length=-1, name='', sparse=False, packed=False, n_features=None):
+        if n_features is not None and (not isinstance(n_features, int) or n_features < 1):
+            raise ValueError('n_features expects a positive integer')
         self.name = name
         self.regex = regex
         self.regex_length = regex_length
-        self.feature_names_ = []
-        self.vocabulary_ = {}
+        self.sparse = sparse
+        self.packed = packed
+        self.n_features = n_features
+        self.column_labels_ = []
+        # every aln col idx at which the motif has been found
+        self.motif_columns_ = zeros((0,), dtype=int)
+        # a K x 5 array of (column, -1, column2, -1, 0) feature identities
+        self.feature_ids_ = zeros((0, 5), dtype=int)
+        # when hashing, an M x 5 array of the pairs behind each resolved feature
+        self.collisions_ = {}
 
     def fit(self, alignment):
-        if not isinstance(alignment, LabeledMSA):
+        self.column_labels_ = []
+        self.motif_columns_ = zeros((0,), dtype=int)
+        self.feature_ids_ = zeros((0, 5), dtype=int)
+        self.collisions_ = {}
+        return self.partial_fit(alignment)
+
+    def partial_fit(self, alignment):
+        """
+        extend the vocabulary with the pairs of motif positions involving any
+        found in alignment, keeping the indices of every feature already learned
+        """
+        if not isinstance(alignment, (LabeledMSA, ArrayMSA, EncodedMSA)):
             raise ValueError("PairwiseMotifVectorizers require a LabeledMSA")
 
-        calls = set()
-
-        for idx, seq in enumerate(alignment):
-            # do NOT convert to encoder coords
-            cols = []
-            ltrs = []
-            for col, ltr in enumerate(str(seq.seq)):
-                if ltr not in GAPS:
-                    cols.append(col)
-                    ltrs.append(ltr)
-
-            seq_ = ''.join(ltrs)
-
-            for m in self.regex.finditer(seq_):
-                start = m.start(0)
-                idx = cols[start]
-                calls.add(idx)
-                if self.regex_length >= 0 and len(m.group(0)) != self.regex_length:
-                    raise ValueError(
-                        "supplied regex_length incorrect for: '{0}'".format(m.group(0))
-                        )
-
-        calls_ = sorted(calls)
-        column_labels = list(alignment.labels)
-        vocab = {}
-        feature_names = []
-
-        j = 0
-        for o, idx1 in enumerate(calls_[:-1], start=1):
-            for idx2 in calls_[o:]:
-                vocab[(idx1, idx2)] = j
-                feature_names.append('{0:s}({1:s}+{2:s})'.format(
-                    self.name, column_labels[idx1], column_labels[idx2]
-                    ))
-                j += 1
-
-        self.feature_names_ = feature_names
-        self.vocabulary_ = vocab
+        msa = EncodedMSA.of(alignment)
+        # do NOT convert to encoder coords
+        _, cols = find_motif(msa, self.regex, self.regex_length)
+        calls = union1d(self.motif_columns_, unique(cols))
+
+        if not self.column_labels_:
+            self.column_labels_ = list(msa.labels)
+        self.motif_columns_ = calls
+
+        if self.n_features is not None:
+            return self
+
+        idx1, idx2 = (calls[:, None] < calls[None, :]).nonzero()
+
+        # only pairs not yet learned are appended, in (idx1, idx2) order
+        ncol = msa.get_alignment_length()
+        vocab = feature_ids(calls[idx1], -1, calls[idx2])
+        _, known = lookup(
+            self.feature_ids_[:, 0] * ncol + self.feature_ids_[:, 2],
+            vocab[:, 0] * ncol + vocab[:, 2]
+            )
+
+        self.feature_ids_ = concatenate((self.feature_ids_, vocab[~known]))
 
         return self
 
-    def transform(self, alignment):
-        vocab = self.vocabulary_
-        data = zeros((len(alignment), len(vocab)), dtype=int)
+    def transform(self, alignment, start=0):
+        """
+        the features of alignment, or only those from index start on
+        """
+        if self.n_features is not None:
+            # key pairs by the learned alignment length, so hashes are stable
+            rows, cols = find_motif(EncodedMSA.of(alignment), self.regex)
+            rows, keys = motif_pairs(rows, cols, len(self.column_labels_))
+            hits = hash_features(keys, self.n_features) - start
+            keep = hits >= 0
+            shape = (len(alignment), self.n_features - start)
+            return feature_matrix(rows[keep], hits[keep], shape, self.sparse, self.packed)
+
+        vocab = self.feature_ids_[start:]
+        shape = (len(alignment), len(vocab))
 
         if len(vocab) == 0:
-            return data
-
-        for i, seq in enumerate(alignment):
-            # do NOT convert to encoder coords
-            cols = []
-            ltrs = []
-            for col, ltr in enumerate(str(seq.seq)):
-                if ltr not in GAPS:
-                    cols.append(col)
-                    ltrs.append(ltr)
-
-            seq_ = ''.join(ltrs)
-
-            # generate a list of all aln col idx at which the pattern is found,
-            # the sorted should be unnecessary (finditer scans l-to-r), but I'm paranoid
-            matches = sorted(cols[m.start(0)] for m in self.regex.finditer(seq_))
-
-            # match all idx pairs to the ones in filtercalls,
-            # and set the data matrix appropriately
-            for o, idx1 in enumerate(matches[:-1], start=1):
-                for idx2 in matches[o:]:
-                    try:
-                        data[i, vocab[(idx1, idx2)]] = 1
-                    except KeyError:
-                        pass
-
-        return data
+            return feature_matrix([], [], shape, self.sparse, self.packed)
+
+        # do NOT convert to encoder coords
+        msa = EncodedMSA.of(alignment)
+        rows, cols = find_motif(msa, self.regex)
+        ncol = max(msa.get_alignment_length(), vocab[:, 2].max() + 1)
+        rows, keys = motif_pairs(rows, cols, ncol)
+
+        idxs, keep = lookup(vocab[:, 0] * ncol + vocab[:, 2], keys)
+
+        return feature_matrix(rows[keep], idxs[keep], shape, self.sparse, self.packed)
+
+    def resolve(self, alignment, idxs):
+        """
+        record which motif pairs observed in alignment hash into the features
+        idxs, so that their names can be rendered
+        """
+        if self.n_features is None:
+            return self
+
+        ncol = len(self.column_labels_)
+        rows, cols = find_motif(EncodedMSA.of(alignment), self.regex)
+        keys = unique(motif_pairs(rows, cols, ncol)[1])
+        hashes = hash_features(keys, self.n_features)
+        _, keep = lookup(unique(idxs), hashes)
+        keys, hashes = keys[keep], hashes[keep]
+
+        for idx in unique(hashes).tolist():
+            keys_ = keys[hashes == idx]
+            if idx in self.collisions_:
+                ids = self.collisions_[idx]
+                keys_ = union1d(keys_, ids[:, 0] * ncol + ids[:, 2])
+            idx1, idx2 = divmod(keys_, ncol)
+            self.collisions_[idx] = feature_ids(idx1, -1, idx2)
+
+        return self
 
     def get_feature_names(self):
-        return self.feature_names_
+        name = self.name.replace('{', '{{').replace('}', '}}')
+        if self.n_features is None:
+            return FeatureNames(self.feature_ids_, [name + '({0:s}+{2:s})'], self.column_labels_)
+        # unresolved hashed features are named by their index alone
+        return FeatureNames(
+            feature_ids(arange(self.n_features), kinds=1),
+            [name + '({0:s}+{2:s})', name + '#{4:d}'],
+            self.column_labels_,
+            collisions=self.collisions_
+            )
@@ -1,111 +1,235 @@
 
-from numpy import zeros
+from numpy import arange, bincount, column_stack, concatenate, lexsort, ones, unique, zeros
 
 from sklearn.base import BaseEstimator, TransformerMixin
 
+from idepi.feature_extraction._common import (
+    TransformIterMixin,
+    check_alignment_length,
+    feature_matrix,
+    hash_features,
+    lookup,
+    min_count
+    )
+from idepi.feature_extraction._encodedmsa import EncodedMSA
+from idepi.feature_extraction._featurenames import FeatureNames, feature_ids
 from idepi.filters import null_filter
-from idepi.labeledmsa import LabeledMSA
+from idepi.labeledmsa import ArrayMSA, LabeledMSA
 
 
 __all__ = ['PairwiseSiteVectorizer']
 
 
-class PairwiseSiteVectorizer(BaseEstimator, TransformerMixin):
+def _pair_keys(codes, offset, nltr):
+    # key every (column, code, column + offset, code) pair of each sequence
+    ncol = codes.shape[1]
+    return (arange(ncol - offset) * nltr + codes[:, :ncol - offset]) * nltr + codes[:, offset:]
 
-    def __init__(self, encoder, filter=null_filter, radius=0):
+
+def _feature_keys(ids, ncol, nltr):
+    return ((ids[:, 0] * nltr + ids[:, 1]) * ncol + ids[:, 2]) * nltr + ids[:, 3]
+
+
+class PairwiseSiteVectorizer(BaseEstimator, TransformerMixin, TransformIterMixin):
+    """
+    pairs of sites within radius of each other, learned if they co-occur in at
+    least min_support sequences (a count, or if below 1, a fraction) of an
+    alignment given to fit or partial_fit; if n_features is given, pairs are
+    instead hashed into that many features, and resolve() recovers the real
+    pairs behind any of the hashed features
+    """
+
+    def __init__(
+            self,
+            encoder,
+            filter=null_filter,
+            radius=0,
+            sparse=False,
+            packed=False,
+            n_features=None,
+            min_support=1):
         if not isinstance(radius, int) or radius < 0:
             raise ValueError('radius expects a positive integer')
+        if n_features is not None and (not isinstance(n_features, int) or n_features < 1):
+            raise ValueError('n_features expects a positive integer')
         self.__alignment_length = 0
         self.encoder = encoder
         self.filter = filter
         self.radius = radius
-        self.feature_names_ = []
-        self.vocabulary_ = {}
+        self.sparse = sparse
+        self.packed = packed
+        self.n_features = n_features
+        self.min_support = min_support
+        self.column_labels_ = []
+        # a K x 5 array of (column, code, column2, code2, 0) feature identities
+        self.feature_ids_ = zeros((0, 5), dtype=int)
+        # when hashing, the columns admitted by the filter, and for each
+        # resolved feature an M x 5 array of the pairs hashed into it
+        self.valid_columns_ = zeros((0,), dtype=bool)
+        self.collisions_ = {}
 
     def fit(self, alignment):
-        if not isinstance(alignment, LabeledMSA):
+        self.__alignment_length = 0
+        self.feature_ids_ = zeros((0, 5), dtype=int)
+        self.valid_columns_ = zeros((0,), dtype=bool)
+        self.collisions_ = {}
+        return self.partial_fit(alignment)
+
+    def __valid_columns(self, msa):
+        return msa.allowed(self.filter).any(axis=1)
+
+    def __observed_pairs(self, msa, valid_columns, support=1):
+        ncol = msa.get_alignment_length()
+        nltr = len(self.encoder)
+        codes = msa.codes(self.encoder)
+
+        # each offset is one band of the site co-occurrence matrix,
+        # and every co-occurrence count of at least support is an observed pair
+        calls = [zeros((0, 4), dtype=int)]
+        for offset in range(1, min(self.radius, ncol - 1) + 1):
+            counts = bincount(
+                _pair_keys(codes, offset, nltr).ravel(),
+                minlength=(ncol - offset) * nltr * nltr
+                )
+            idx1, rest = divmod((counts >= support).nonzero()[0], nltr * nltr)
+            ltr1, ltr2 = divmod(rest, nltr)
+            idx2 = idx1 + offset
+            keep = valid_columns[idx1] & valid_columns[idx2]
+            calls.append(column_stack((idx1[keep], ltr1[keep], idx2[keep], ltr2[keep])))
+
+        vocab = concatenate(calls)
+        return vocab[lexsort(vocab.T[::-1])]
+
+    def partial_fit(self, alignment):
+        """
+        extend the vocabulary with the pairs observed in alignment,
+        keeping the indices of every feature already learned
+        """
+        if not isinstance(alignment, (LabeledMSA, ArrayMSA, EncodedMSA)):
             raise ValueError("PairwiseSiteVectorizers require a LabeledMSA")
 
-        valid_columns = [
-            len(self.__filter(alignment[:, i])) > 0
-            for i in range(alignment.get_alignment_length())]
-
-        calls = set()
-
-        for seq in alignment:
-            seq_ = str(seq.seq).upper()
-            for i, ltr1 in enumerate(seq_[:-1]):
-                if not valid_columns[i]:
-                    continue
-                a = i + 1
-                b = i + self.radius + 1
-                try:
-                    u = self.encoder(ltr1)
-                    for j, ltr2 in enumerate(seq_[a:b], start=a):
-                        if not valid_columns[j]:
-                            continue
-                        try:
-                            v = self.encoder(ltr2)
-                            calls.add((i, u, j, v))
-                        except KeyError:
-                            pass
-                except KeyError:
-                    pass
-
-        column_labels = list(alignment.labels)
-        feature_names = []
-        vocab = {}
-
-        for i, k in enumerate(sorted(calls)):
-            vocab[k] = i
-            idx1, ltr1, idx2, ltr2 = k
-            feature_names.append('{0:s}{1:s}+{2:s}{3:s}'.format(
-                column_labels[idx1],
-                self.encoder[ltr1],
-                column_labels[idx2],
-                self.encoder[ltr2]
-                ))
-
-        self.__alignment_length = alignment.get_alignment_length()
-        self.feature_names_ = feature_names
-        self.vocabulary_ = vocab
+        msa = EncodedMSA.of(alignment)
+        ncol = msa.get_alignment_length()
+
+        if self.__alignment_length == 0:
+            self.__alignment_length = ncol
+            self.column_labels_ = list(msa.labels)
+        else:
+            check_alignment_length(ncol, self.__alignment_length)
+
+        valid_columns = self.__valid_columns(msa)
+
+        if self.n_features is not None:
+            # there is no vocabulary to learn, only which columns to admit
+            if len(self.valid_columns_):
+                valid_columns |= self.valid_columns_
+            self.valid_columns_ = valid_columns
+            return self
+
+        nltr = len(self.encoder)
+        vocab = self.__observed_pairs(msa, valid_columns, min_count(self.min_support, len(msa)))
+
+        # new features follow the learned ones, in (column, code, column, code) order
+        _, known = lookup(
+            _feature_keys(self.feature_ids_, ncol, nltr),
+            _feature_keys(vocab, ncol, nltr)
+            )
+        vocab = vocab[~known]
+        self.feature_ids_ = concatenate((self.feature_ids_, feature_ids(*vocab.T)))
 
         return self
 
-    def transform(self, alignment):
+    def transform(self, alignment, start=0):
+        """
+        the features of alignment, or only those from index start on
+        """
         ncol = alignment.get_alignment_length()
+        check_alignment_length(ncol, self.__alignment_length)
 
-        if ncol != self.__alignment_length:
-            msg = 'alignment length ({0:d}) does not match the learned length ({1:d})'.format(
-                ncol,
-                self.__alignment_length
-            )
-            raise ValueError(msg)
+        if self.n_features is not None:
+            return self.__transform_hashed(alignment, start)
 
-        vocab = self.vocabulary_
-        data = zeros((len(alignment), len(vocab)), dtype=int)
+        vocab = self.feature_ids_[start:]
+        nltr = len(self.encoder)
+        shape = (len(alignment), len(vocab))
+        rows, feats = [zeros((0,), dtype=int)], [zeros((0,), dtype=int)]
 
         if len(vocab) == 0:
-            return data
-
-        for row, seq in enumerate(alignment):
-            seq_ = str(seq.seq).upper()
-            for i, ltr1 in enumerate(seq_[:-1]):
-                a = i + 1
-                b = i + self.radius + 1
-                try:
-                    u = self.encoder(ltr1)
-                    for j, ltr2 in enumerate(seq_[a:b], start=a):
-                        try:
-                            v = self.encoder(ltr2)
-                            k = (i, u, j, v)
-                            data[row, vocab[k]] = 1
-                        except KeyError:
-                            pass
-                except KeyError:
-                    pass
-
-        return data
+            return feature_matrix(rows[0], feats[0], shape, self.sparse, self.packed)
+
+        codes = EncodedMSA.of(alignment).codes(self.encoder)
+        offsets = vocab[:, 2] - vocab[:, 0]
+
+        # a pair is present when both of its site indicators are,
+        # so look up each sequence's pair keys band by band
+        for offset in sorted(set(offsets.tolist())):
+            idxs = (offsets == offset).nonzero()[0]
+            table = -ones(((ncol - offset) * nltr * nltr,), dtype=int)
+            table[(vocab[idxs, 0] * nltr + vocab[idxs, 1]) * nltr + vocab[idxs, 3]] = idxs
+            hits = table[_pair_keys(codes, offset, nltr)]
+            rows_, cols_ = (hits >= 0).nonzero()
+            rows.append(rows_)
+            feats.append(hits[rows_, cols_])
+
+        return feature_matrix(concatenate(rows), concatenate(feats), shape, self.sparse, self.packed)
+
+    def __transform_hashed(self, alignment, start):
+        ncol = alignment.get_alignment_length()
+        nltr = len(self.encoder)
+        shape = (len(alignment), self.n_features - start)
+        rows, feats = [zeros((0,), dtype=int)], [zeros((0,), dtype=int)]
+        codes = EncodedMSA.of(alignment).codes(self.encoder)
+
+        # hash every valid pair key of each sequence, band by band
+        for offset in range(1, min(self.radius, ncol - 1) + 1):
+            idx1 = arange(ncol - offset)
+            idx2 = idx1 + offset
+            keep = self.valid_columns_[idx1] & self.valid_columns_[idx2]
+            keys = ((idx1[keep] * nltr + codes[:, idx1[keep]]) * ncol + idx2[keep]) * nltr + codes[:, idx2[keep]]
+            hits = hash_features(keys, self.n_features) - start
+            rows_, cols_ = (hits >= 0).nonzero()
+            rows.append(rows_)
+            feats.append(hits[rows_, cols_])
+
+        return feature_matrix(concatenate(rows), concatenate(feats), shape, self.sparse, self.packed)
+
+    def resolve(self, alignment, idxs):
+        """
+        record which pairs observed in alignment hash into the features idxs,
+        so that their names can be rendered
+        """
+        if self.n_features is None:
+            return self
+
+        msa = EncodedMSA.of(alignment)
+        ncol = msa.get_alignment_length()
+        check_alignment_length(ncol, self.__alignment_length)
+
+        nltr = len(self.encoder)
+        pairs = self.__observed_pairs(msa, self.valid_columns_)
+        hashes = hash_features(_feature_keys(pairs, ncol, nltr), self.n_features)
+        _, keep = lookup(unique(idxs), hashes)
+        pairs, hashes = pairs[keep], hashes[keep]
+
+        for idx in unique(hashes).tolist():
+            ids = feature_ids(*pairs[hashes == idx].T)
+            if idx in self.collisions_:
+                ids = concatenate((self.collisions_[idx], ids))
+                _, first = unique(_feature_keys(ids, ncol, nltr), return_index=True)
+                ids = ids[first]
+            self.collisions_[idx] = ids
+
+        return self
 
     def get_feature_names(self):
-        return self.feature_names_
+        letters = [self.encoder[i] for i in range(len(self.encoder))]
+        if self.n_features is None:
+            return FeatureNames(self.feature_ids_, ['{0:s}{1:s}+{2:s}{3:s}'], self.column_labels_, letters)
+        # unresolved hashed features are named by their index alone
+        return FeatureNames(
+            feature_ids(arange(self.n_features), kinds=1),
+            ['{0:s}{1:s}+{2:s}{3:s}', 'pair#{4:d}'],
+            self.column_labels_,
+            letters,
+            self.collisions_
+            )
@@ -0,0 +1,198 @@
+"""
+This module provides a class to convert alignments to matrices suitable for consumption by scikit-learn
+
+>>> from idepi.encoder import DNAEncoder
+>>> v = SiteInteractionVectorizer(DNAEncoder, max_order=3, min_support=2)
+"""
+
+from __future__ import division, print_function
+
+from numpy import arange, column_stack, concatenate, iinfo, lexsort, maximum, ones, uint8, where, zeros
+
+from sklearn.base import BaseEstimator, TransformerMixin
+
+from idepi.feature_extraction._bitmatrix import BitMatrix, _popcount
+from idepi.feature_extraction._common import (
+    TransformIterMixin,
+    check_alignment_length,
+    lookup,
+    min_count
+    )
+from idepi.feature_extraction._encodedmsa import EncodedMSA
+from idepi.feature_extraction._featurenames import FeatureNames, feature_ids
+from idepi.filters import null_filter
+from idepi.labeledmsa import ArrayMSA, LabeledMSA
+
+
+__all__ = ['SiteInteractionVectorizer']
+
+
+def _itemset_keys(sets, nsite):
+    # a mixed-radix key of each -1-padded row of site indices
+    if (nsite + 1) ** sets.shape[1] > iinfo(int).max:
+        raise ValueError('too many sites to key interactions of this order')
+    keys = zeros((len(sets),), dtype=int)
+    for j in range(sets.shape[1]):
+        keys = keys * (nsite + 1) + sets[:, j] + 1
+    return keys
+
+
+class SiteInteractionVectorizer(BaseEstimator, TransformerMixin, TransformIterMixin):
+    """
+    conjunctions of 2 to max_order sites, each in a different column, that
+    co-occur in at least min_support sequences (a count, or if below 1, a
+    fraction) of an alignment given to fit or partial_fit; these are mined
+    level by level on the bit-packed site matrix as Apriori does, so that a
+    k-site candidate is only ever counted if every one of its (k - 1)-site
+    subsets is frequent
+    """
+
+    def __init__(self, encoder, filter=null_filter, max_order=3, min_support=0.05, sparse=False, packed=False):
+        if not isinstance(max_order, int) or max_order < 2:
+            raise ValueError('max_order expects an integer of at least 2')
+        self.__alignment_length = 0
+        self.encoder = encoder
+        self.filter = filter
+        self.max_order = max_order
+        self.min_support = min_support
+        self.sparse = sparse
+        self.packed = packed
+        self.column_labels_ = []
+        # an L x len(encoder) table of site indices, -1 if absent,
+        # and the (column, code) of each site
+        self.vocabulary_ = -ones((0, len(encoder)), dtype=int)
+        self.sites_ = zeros((0, 2), dtype=int)
+        # a K x max_order array of the site indices of each feature, -1 padded
+        self.itemsets_ = zeros((0, max_order), dtype=int)
+
+    def fit(self, alignment):
+        self.__alignment_length = 0
+        self.vocabulary_ = -ones((0, len(self.encoder)), dtype=int)
+        self.sites_ = zeros((0, 2), dtype=int)
+        self.itemsets_ = zeros((0, self.max_order), dtype=int)
+        return self.partial_fit(alignment)
+
+    def __sites(self, msa):
+        # the N x S bit-packed matrix of the learned sites
+        ncol = msa.get_alignment_length()
+        idxs = self.vocabulary_[arange(ncol), msa.codes(self.encoder)]
+        rows, cols = (idxs >= 0).nonzero()
+        return BitMatrix.from_indices(rows, idxs[rows, cols], (len(msa), len(self.sites_)))
+
+    def __mine(self, X, support):
+        # mine the sites ranked by (column, code) rather than by index, as
+        # sites learned by a later partial_fit take the next indices, so
+        # that the sites of every interaction are in increasing columns
+        rank = lexsort((self.sites_[:, 1], self.sites_[:, 0]))
+        sets = (X.counts()[rank] >= support).nonzero()[0][:, None]
+        words = X.words[rank[sets[:, 0]]]
+        levels = []
+
+        for order in range(2, self.max_order + 1):
+            if len(sets) < 2:
+                break
+            # sets sharing all but their last site form a block, and any two
+            # sets of a block join into a candidate of the next order
+            same = (sets[1:, :-1] == sets[:-1, :-1]).all(axis=1)
+            ends = concatenate(((~same).nonzero()[0] + 1, [len(sets)]))
+            ends = ends[ends.searchsorted(arange(len(sets)), side='right')]
+            keys = _itemset_keys(sets, len(self.sites_))
+            sets_, words_ = [zeros((0, order), dtype=int)], [words[:0]]
+            for i in range(len(sets)):
+                js = arange(i + 1, ends[i])
+                if len(js) == 0:
+                    continue
+                cands = concatenate((sets[[i] * len(js)], sets[js, -1:]), axis=1)
+                # prune those with an infrequent subset (dropping either of
+                # the last two sites gives one of the joined sets)
+                keep = ones((len(js),), dtype=bool)
+                for p in range(order - 2):
+                    subsets = concatenate((cands[:, :p], cands[:, p + 1:]), axis=1)
+                    keep &= lookup(keys, _itemset_keys(subsets, len(self.sites_)))[1]
+                js, cands = js[keep], cands[keep]
+                cwords = words[i] & words[js]
+                frequent = _popcount(cwords) >= support
+                sets_.append(cands[frequent])
+                words_.append(cwords[frequent])
+            sets, words = concatenate(sets_), concatenate(words_)
+            levels.append(concatenate((sets, -ones((len(sets), self.max_order - order), dtype=int)), axis=1))
+
+        ranks = concatenate([zeros((0, self.max_order), dtype=int)] + levels)
+        return where(ranks >= 0, rank[maximum(ranks, 0)], -1)
+
+    def partial_fit(self, alignment):
+        """
+        extend the vocabulary with the interactions frequent in alignment,
+        keeping the indices of every feature already learned
+        """
+        if not isinstance(alignment, (LabeledMSA, ArrayMSA, EncodedMSA)):
+            raise ValueError("SiteInteractionVectorizers require a LabeledMSA")
+
+        msa = EncodedMSA.of(alignment)
+        ncol = msa.get_alignment_length()
+
+        if len(self.vocabulary_) == 0:
+            self.__alignment_length = ncol
+            self.column_labels_ = list(msa.labels)
+            self.vocabulary_ = -ones((ncol, len(self.encoder)), dtype=int)
+        else:
+            check_alignment_length(ncol, self.__alignment_length)
+
+        # the letters the filter admits in each column, as encoder codes
+        cols, bytes_ = msa.allowed(self.filter).nonzero()
+        valid = zeros((ncol, len(self.encoder)), dtype=bool)
+        valid[cols, self.encoder.encode_array(bytes_.astype(uint8))] = True
+
+        # new sites take the next indices, in (column, code) order
+        cols, ltrs = (valid & (self.vocabulary_ < 0)).nonzero()
+        self.vocabulary_[cols, ltrs] = len(self.sites_) + arange(len(cols))
+        self.sites_ = concatenate((self.sites_, column_stack((cols, ltrs))))
+
+        vocab = self.__mine(self.__sites(msa), min_count(self.min_support, len(msa)))
+
+        # new features follow the learned ones, by order, then by sites
+        _, known = lookup(
+            _itemset_keys(self.itemsets_, len(self.sites_)),
+            _itemset_keys(vocab, len(self.sites_))
+            )
+        self.itemsets_ = concatenate((self.itemsets_, vocab[~known]))
+
+        return self
+
+    def transform(self, alignment, start=0):
+        """
+        the features of alignment, or only those from index start on
+        """
+        ncol = alignment.get_alignment_length()
+        check_alignment_length(ncol, self.__alignment_length)
+
+        sets = self.itemsets_[start:]
+        X = self.__sites(EncodedMSA.of(alignment))
+
+        # an interaction is present where all of its sites are
+        words = X.words[sets[:, 0]]
+        for j in range(1, self.max_order):
+            rows = (sets[:, j] >= 0).nonzero()[0]
+            words[rows] &= X.words[sets[rows, j]]
+
+        X = BitMatrix(words, len(alignment))
+        if self.packed:
+            return X
+        return X.tocsr() if self.sparse else X.toarray()
+
+    def get_feature_names(self):
+        sets = self.itemsets_
+        cols, codes = self.sites_[sets, 0], self.sites_[sets, 1]
+        # pairs render from their identity, larger interactions as compounds
+        compounds = dict(
+            (i, feature_ids(cols[i, :n], codes[i, :n]))
+            for i, n in enumerate((sets >= 0).sum(axis=1).tolist())
+            if n > 2
+            )
+        return FeatureNames(
+            feature_ids(cols[:, 0], codes[:, 0], cols[:, 1], codes[:, 1], kinds=1),
+            ['{0:s}{1:s}', '{0:s}{1:s}+{2:s}{3:s}'],
+            self.column_labels_,
+            [self.encoder[i] for i in range(len(self.encoder))],
+            compounds=compounds
+            )
@@ -1,76 +1,93 @@
 
-from numpy import zeros
+from numpy import arange, concatenate, ones, uint8, zeros
 
 from sklearn.base import BaseEstimator, TransformerMixin
 
+from idepi.feature_extraction._common import (
+    TransformIterMixin,
+    check_alignment_length,
+    feature_matrix
+    )
+from idepi.feature_extraction._encodedmsa import EncodedMSA
+from idepi.feature_extraction._featurenames import FeatureNames, feature_ids
 from idepi.filters import null_filter
-from idepi.labeledmsa import LabeledMSA
+from idepi.labeledmsa import ArrayMSA, LabeledMSA
 
 
 __all__ = ['SiteVectorizer']
 
 
-class SiteVectorizer(BaseEstimator, TransformerMixin):
+class SiteVectorizer(BaseEstimator, TransformerMixin, TransformIterMixin):
 
-    def __init__(self, encoder, filter=null_filter):
+    def __init__(self, encoder, filter=null_filter, sparse=False, packed=False):
         self.__alignment_length = 0
         self.encoder = encoder
         self.filter = filter
-        self.feature_names_ = []
-        self.vocabulary_ = {}
+        self.sparse = sparse
+        self.packed = packed
+        self.column_labels_ = []
+        # a K x 5 array of (column, code, -1, -1, 0) feature identities
+        self.feature_ids_ = zeros((0, 5), dtype=int)
+        # an L x len(encoder) table of feature indices, -1 if absent
+        self.vocabulary_ = -ones((0, len(encoder)), dtype=int)
 
     def fit(self, alignment):
-        if not isinstance(alignment, LabeledMSA):
+        self.__alignment_length = 0
+        self.feature_ids_ = zeros((0, 5), dtype=int)
+        self.vocabulary_ = -ones((0, len(self.encoder)), dtype=int)
+        return self.partial_fit(alignment)
+
+    def partial_fit(self, alignment):
+        """
+        extend the vocabulary with the letters admitted in alignment,
+        keeping the indices of every feature already learned
+        """
+        if not isinstance(alignment, (LabeledMSA, ArrayMSA, EncodedMSA)):
             raise ValueError("SiteVectorizers require a LabeledMSA")
 
-        column_labels = list(alignment.labels)
-        vocab = {}
-        feature_names = []
+        msa = EncodedMSA.of(alignment)
+        ncol = msa.get_alignment_length()
 
-        k = 0
-        for i in range(alignment.get_alignment_length()):
-            letters = self.filter(alignment[:, i])
+        if len(self.vocabulary_) == 0:
+            self.__alignment_length = ncol
+            self.column_labels_ = list(msa.labels)
+            self.vocabulary_ = -ones((ncol, len(self.encoder)), dtype=int)
+        else:
+            check_alignment_length(ncol, self.__alignment_length)
 
-            for ltr in letters:
-                try:
-                    j = self.encoder(ltr)
-                    feature_name = '{0:s}{1:s}'.format(column_labels[i], self.encoder[j])
-                    vocab[(i, j)] = k
-                    feature_names.append(feature_name)
-                    k += 1
-                except KeyError:
-                    pass
+        # the letters the filter admits in each column, as encoder codes
+        cols, bytes_ = msa.allowed(self.filter).nonzero()
+        valid = zeros((ncol, len(self.encoder)), dtype=bool)
+        valid[cols, self.encoder.encode_array(bytes_.astype(uint8))] = True
 
-        self.__alignment_length = alignment.get_alignment_length()
-        self.feature_names_ = feature_names
-        self.vocabulary_ = vocab
+        # new features follow the learned ones, ordered by column, then by encoder code
+        cols, ltrs = (valid & (self.vocabulary_ < 0)).nonzero()
+        self.vocabulary_[cols, ltrs] = len(self.feature_ids_) + arange(len(cols))
+        self.feature_ids_ = concatenate((self.feature_ids_, feature_ids(cols, ltrs)))
 
         return self
 
-    def transform(self, alignment):
+    def transform(self, alignment, start=0):
+        """
+        the features of alignment, or only those from index start on
+        """
         ncol = alignment.get_alignment_length()
+        check_alignment_length(ncol, self.__alignment_length)
 
-        if ncol != self.__alignment_length:
-            msg = 'alignment length ({0:d}) does not match the learned length ({1:d})'.format(
-                ncol,
-                self.__alignment_length)
-            raise ValueError(msg)
-
-        vocab = self.vocabulary_
-        data = zeros((len(alignment), len(vocab)), dtype=int)
+        shape = (len(alignment), len(self.feature_ids_) - start)
 
-        if len(vocab) == 0:
-            return data
+        if shape[1] == 0:
+            return feature_matrix([], [], shape, self.sparse, self.packed)
 
-        for i, seq in enumerate(alignment):
-            seq_ = ''.join(ltr.upper() for ltr in str(seq.seq))
-            for j, ltr in enumerate(seq_):
-                try:
-                    data[i, vocab[(j, self.encoder(ltr))]] = 1
-                except KeyError:
-                    pass
+        idxs = self.vocabulary_[arange(ncol), EncodedMSA.of(alignment).codes(self.encoder)] - start
+        rows, cols = (idxs >= 0).nonzero()
 
-        return data
+        return feature_matrix(rows, idxs[rows, cols], shape, self.sparse, self.packed)
 
     def get_feature_names(self):
-        return self.feature_names_
+        return FeatureNames(
+            self.feature_ids_,
+            ['{0:s}{1:s}'],
+            self.column_labels_,
+            [self.encoder[i] for i in range(len(self.encoder))]
+            )
@@ -3,6 +3,8 @@ from __future__ import division, print_function
 
 from functools import partial
 
+from numpy import where, zeros
+
 from BioExt.collections import Counter
 
 from idepi.constants import GAPS
@@ -44,15 +46,48 @@ def __naive_filter(max_conservation, min_conservation, max_gap_ratio, column):
         return sorted(counts.keys())
 
 
+_GAP_BYTES = zeros((256,), dtype=bool)
+_GAP_BYTES[[ord(g) for g in GAPS]] = True
+
+
+def __naive_columns(max_conservation, min_conservation, max_gap_ratio, counts):
+    # __naive_filter for every column at once, given the L x 256 counts
+    # of each upper-cased byte per column, as an L x 256 mask of letters
+    residues = where(_GAP_BYTES, 0, counts)
+    total = counts.sum(axis=1)
+    nres = residues.sum(axis=1)
+    maxc = residues.max(axis=1)
+    minc = where(residues > 0, residues, maxc[:, None]).min(axis=1)
+    # columns of nothing but gaps have no conservation, and are dropped
+    nres_ = where(nres > 0, nres, 1)
+    keep = (
+        (nres > 0) &
+        ((total - nres) / where(total > 0, total, 1) <= max_gap_ratio) &
+        (maxc / nres_ <= max_conservation) &
+        (minc / nres_ <= min_conservation)
+        )
+    return (counts > 0) & keep[:, None]
+
+
 def naive_filter(max_conservation, min_conservation, max_gap_ratio):
     """
-    filter an iterable by its maximum and minimum conservation, and the maximum proportion of gap characters
+    filter an iterable by its maximum and minimum conservation, and the maximum proportion of gap characters;
+    the filter's columns() does the same for every column of an alignment at once, from its byte histogram
 
     >>> f = naive_filter(0.2, 0.2, 0.2)
     >>> f([
     """
-    return partial(__naive_filter, max_conservation, min_conservation, max_gap_ratio)
+    filter = partial(__naive_filter, max_conservation, min_conservation, max_gap_ratio)
+    filter.columns = partial(__naive_columns, max_conservation, min_conservation, max_gap_ratio)
+    return filter
 
 
 def null_filter(column):
     return sorted(set(l.upper() for l in column))
+
+
+def __null_columns(counts):
+    return counts > 0
+
+
+null_filter.columns = __null_columns
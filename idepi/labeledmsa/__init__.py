@@ -1,18 +1,59 @@
 
+from json import dumps as json_dumps, loads as json_loads
+from os import chmod, fdopen, remove, rename, umask
+from os.path import abspath, dirname, exists
+from struct import pack, unpack
+from tempfile import mkstemp
+
+from numpy import (
+    add,
+    arange,
+    array,
+    asarray,
+    concatenate,
+    cumsum,
+    diff,
+    frombuffer,
+    fromfile,
+    hstack,
+    maximum,
+    memmap,
+    minimum,
+    repeat,
+    uint8,
+    vstack,
+    zeros
+    )
+
+from scipy.sparse import csr_matrix
+
 from Bio.Align import MultipleSeqAlignment
+from Bio.Seq import Seq
+from Bio.SeqRecord import SeqRecord
 
 from BioExt.collections import Counter
 
-from idepi.constants import GAPS
+from idepi.constants import GAPS, AminoAlphabet, DNAAlphabet
 from idepi._common import base_10_to_n, base_26_to_alph
 
 
 __all__ = [
+    'ArrayMSA',
     'LabeledMSA',
+    'MetadataTable',
+    'ValueMatrix',
     'column_labels'
     ]
 
 
+# a binary alignment is this magic, a little-endian uint32 version and
+# header length, a JSON header padded so that the data starts on a 64 byte
+# boundary, then the N x L letters of the alignment, row by row
+_MAGIC = b'IDEPIMSA'
+_VERSION = 1
+_ALIGN = 64
+
+
 def column_labels(alignment, refidx):
     refseq = str(alignment[refidx].seq)
     pos, insert = 0, 0
@@ -26,6 +67,316 @@ def column_labels(alignment, refidx):
         yield pos, '{0:s}{1:d}{2:s}'.format(char.upper() if insert == 0 else '', pos, ins)
 
 
+def _ragged_take(offsets, idxs):
+    # the flat indices of the lists at idxs, in order, and their offsets
+    lwrs = offsets[idxs]
+    lengths = offsets[idxs + 1] - lwrs
+    offsets_ = concatenate(([0], cumsum(lengths))).astype(int)
+    return repeat(lwrs - offsets_[:-1], lengths) + arange(offsets_[-1]), offsets_
+
+
+class MetadataTable(object):
+    """
+    the id, subtype and value lists of every sequence of an alignment, row
+    for row; the lists of each label are kept flat, delimited by N + 1 row
+    offsets, and a sequence without a label has an empty list for it
+    """
+
+    def __init__(self, ids, subtypes, values, offsets):
+        if len(ids) != len(subtypes):
+            raise ValueError("all arguments must share the same row space")
+        if any(len(offsets[name]) != len(ids) + 1 for name in values):
+            raise ValueError("all arguments must share the same row space")
+        self.__ids = list(ids)
+        self.__subtypes = list(subtypes)
+        self.__values = values
+        self.__offsets = offsets
+
+    @staticmethod
+    def from_rows(ids, subtypes, rows):
+        """
+        the table of the sequences ids, given their subtypes and
+        a dict of value lists for each
+        """
+        rows = list(rows)
+        values, offsets = {}, {}
+        for name in sorted(set(name for row in rows for name in row)):
+            lists = [row.get(name, []) for row in rows]
+            values[name] = array([v for l in lists for v in l], dtype=float)
+            offsets[name] = concatenate(([0], cumsum([len(l) for l in lists]))).astype(int)
+        return MetadataTable(ids, subtypes, values, offsets)
+
+    @staticmethod
+    def from_descriptions(ids, descriptions):
+        """
+        the table of the sequences ids, parsed from their JSON descriptions
+        """
+        subtypes, rows = [], []
+        for description in descriptions:
+            try:
+                desc = json_loads(description)
+            except ValueError:
+                desc = None
+            # sequences without JSON descriptions, such as references, have no values
+            if not isinstance(desc, dict):
+                desc = {}
+            subtypes.append(desc.get('subtype'))
+            rows.append(desc.get('values') or {})
+        return MetadataTable.from_rows(ids, subtypes, rows)
+
+    @staticmethod
+    def from_records(records):
+        records = list(records)
+        return MetadataTable.from_descriptions(
+            [record.id for record in records],
+            [record.description for record in records]
+            )
+
+    @staticmethod
+    def concatenate(tables):
+        tables = list(tables)
+        names = sorted(set(name for table in tables for name in table.__values))
+        values, offsets = {}, {}
+        for name in names:
+            values_, lengths = [zeros((0,), dtype=float)], [zeros((0,), dtype=int)]
+            for table in tables:
+                if name in table.__values:
+                    values_.append(table.__values[name])
+                    lengths.append(table.__offsets[name][1:] - table.__offsets[name][:-1])
+                else:
+                    lengths.append(zeros((len(table),), dtype=int))
+            values[name] = concatenate(values_)
+            offsets[name] = concatenate(([0], cumsum(concatenate(lengths)))).astype(int)
+        return MetadataTable(
+            [i for table in tables for i in table.__ids],
+            [subtype for table in tables for subtype in table.__subtypes],
+            values,
+            offsets
+            )
+
+    def __len__(self):
+        return len(self.__ids)
+
+    def __contains__(self, name):
+        return name in self.__values
+
+    def __getitem__(self, index):
+        if isinstance(index, int):
+            return self.take([index])
+        return self.take(arange(len(self))[index])
+
+    def take(self, idxs):
+        """
+        the table of the rows at idxs
+        """
+        idxs = arange(len(self))[asarray(idxs, dtype=int).reshape((-1,))]
+        values, offsets = {}, {}
+        for name in self.__values:
+            # gather every kept list, in order, from the flat values
+            flat, offsets[name] = _ragged_take(self.__offsets[name], idxs)
+            values[name] = self.__values[name][flat]
+        return MetadataTable(
+            [self.__ids[i] for i in idxs.tolist()],
+            [self.__subtypes[i] for i in idxs.tolist()],
+            values,
+            offsets
+            )
+
+    def select(self, ids):
+        """
+        the table of the rows of ids, in that order
+        """
+        rows = dict((id, i) for i, id in enumerate(self.__ids))
+        return self.take([rows[id] for id in ids])
+
+    @property
+    def ids(self):
+        return iter(self.__ids)
+
+    @property
+    def names(self):
+        return sorted(self.__values.keys())
+
+    @property
+    def subtypes(self):
+        return iter(self.__subtypes)
+
+    def ragged(self, name):
+        """
+        the flat values and N + 1 row offsets of label name
+        """
+        return self.__values[name], self.__offsets[name]
+
+    def row(self, idx):
+        """
+        the values dict of row idx, as its description holds it
+        """
+        values = {}
+        for name in self.__values:
+            lwr, upr = self.__offsets[name][idx:idx + 2]
+            if upr > lwr:
+                values[name] = self.__values[name][lwr:upr].tolist()
+        return values
+
+
+class ValueMatrix(object):
+    """
+    the value lists of every sequence of a panel for every antibody, as a
+    sparse N x A matrix: row by row, each label keeps the columns of the
+    antibodies measured and their lists, flat and delimited by offsets, so
+    that a pair never measured is a missing entry rather than a zero
+    """
+
+    __REDUCTIONS = {'max': maximum, 'min': minimum, 'sum': add}
+
+    def __init__(self, ids, subtypes, antibodies, entries):
+        # entries holds, for each label, the N + 1 row pointers to its
+        # entries, the column of each entry, and the offsets and values
+        # of their lists, as a csr_matrix keeps its indptr and indices
+        if len(ids) != len(subtypes):
+            raise ValueError("all arguments must share the same row space")
+        if any(len(indptr) != len(ids) + 1 for indptr, _, _, _ in entries.values()):
+            raise ValueError("all arguments must share the same row space")
+        self.__ids = list(ids)
+        self.__subtypes = list(subtypes)
+        self.__antibodies = list(antibodies)
+        self.__entries = entries
+
+    @staticmethod
+    def from_rows(ids, subtypes, antibodies, rows):
+        """
+        the matrix of the sequences ids, given their subtypes and for each
+        a dict of the value lists of every antibody measured, by label
+        """
+        columns = dict((ab, j) for j, ab in enumerate(antibodies))
+        rows = list(rows)
+        entries = {}
+        for name in sorted(set(name for row in rows for values in row.values() for name in values)):
+            counts, cols, lengths, values = [], [], [], []
+            for row in rows:
+                count = 0
+                for ab in sorted(row, key=columns.get):
+                    list_ = row[ab].get(name, [])
+                    if not list_:
+                        continue
+                    cols.append(columns[ab])
+                    lengths.append(len(list_))
+                    values.extend(list_)
+                    count += 1
+                counts.append(count)
+            entries[name] = (
+                concatenate(([0], cumsum(counts))).astype(int),
+                array(cols, dtype=int),
+                concatenate(([0], cumsum(lengths))).astype(int),
+                array(values, dtype=float)
+                )
+        return ValueMatrix(ids, subtypes, antibodies, entries)
+
+    def __len__(self):
+        return len(self.__ids)
+
+    def __contains__(self, name):
+        return name in self.__entries
+
+    def __getitem__(self, index):
+        if isinstance(index, int):
+            return self.take([index])
+        return self.take(arange(len(self))[index])
+
+    @property
+    def shape(self):
+        return len(self.__ids), len(self.__antibodies)
+
+    @property
+    def ids(self):
+        return iter(self.__ids)
+
+    @property
+    def subtypes(self):
+        return iter(self.__subtypes)
+
+    @property
+    def antibodies(self):
+        return list(self.__antibodies)
+
+    @property
+    def names(self):
+        return sorted(self.__entries.keys())
+
+    def take(self, idxs):
+        """
+        the matrix of the rows at idxs
+        """
+        idxs = arange(len(self))[asarray(idxs, dtype=int).reshape((-1,))]
+        entries = {}
+        for name, (indptr, cols, offsets, values) in self.__entries.items():
+            kept, indptr_ = _ragged_take(indptr, idxs)
+            flat, offsets_ = _ragged_take(offsets, kept)
+            entries[name] = (indptr_, cols[kept], offsets_, values[flat])
+        return ValueMatrix(
+            [self.__ids[i] for i in idxs.tolist()],
+            [self.__subtypes[i] for i in idxs.tolist()],
+            self.__antibodies,
+            entries
+            )
+
+    def select(self, ids):
+        """
+        the matrix of the rows of ids, in that order
+        """
+        rows = dict((id, i) for i, id in enumerate(self.__ids))
+        return self.take([rows[id] for id in ids])
+
+    def metadata(self, antibody):
+        """
+        the MetadataTable of column antibody, with which a Labeler labels
+        the rows of this matrix for that antibody alone
+        """
+        j = self.__antibodies.index(antibody)
+        values, offsets = {}, {}
+        for name, (indptr, cols, offsets_, values_) in self.__entries.items():
+            # a row has at most one entry in each column
+            hits = (cols == j).nonzero()[0]
+            if len(hits) == 0:
+                continue
+            rows = repeat(arange(len(self)), diff(indptr))[hits]
+            lengths = zeros((len(self),), dtype=int)
+            lengths[rows] = diff(offsets_)[hits]
+            offsets[name] = concatenate(([0], cumsum(lengths))).astype(int)
+            flat = repeat(offsets_[hits] - offsets[name][rows], lengths[rows]) + arange(offsets[name][-1])
+            values[name] = values_[flat]
+        return MetadataTable(self.__ids, self.__subtypes, values, offsets)
+
+    def tocsr(self, name, reduce='max'):
+        """
+        an N x A csr_matrix of the max, min, sum or mean of the values of
+        label name in each entry; missing entries are those not stored,
+        while measured ones are stored even if zero
+        """
+        if reduce != 'mean' and reduce not in ValueMatrix.__REDUCTIONS:
+            raise ValueError("reduce must be one of 'max', 'min', 'sum', 'mean'")
+        if name not in self.__entries:
+            return csr_matrix(self.shape, dtype=float)
+        indptr, cols, offsets, values = self.__entries[name]
+        if len(cols) == 0:
+            data = zeros((0,), dtype=float)
+        elif reduce == 'mean':
+            data = add.reduceat(values, offsets[:-1]) / diff(offsets)
+        else:
+            data = ValueMatrix.__REDUCTIONS[reduce].reduceat(values, offsets[:-1])
+        return csr_matrix((data, cols, indptr), shape=self.shape)
+
+    def mask(self, name=None):
+        """
+        an N x A array, true where label name, or any label, was measured
+        """
+        mask = zeros(self.shape, dtype=bool)
+        for name_, (indptr, cols, _, _) in self.__entries.items():
+            if name is None or name_ == name:
+                mask[repeat(arange(len(self)), diff(indptr)), cols] = True
+        return mask
+
+
 class LabeledMSA(MultipleSeqAlignment):
 
     @staticmethod
@@ -42,34 +393,42 @@ class LabeledMSA(MultipleSeqAlignment):
             positions
             )
 
-    def __init__(self, msa, labels, positions):
+    def __init__(self, msa, labels, positions, metadata=None):
         if not isinstance(msa, MultipleSeqAlignment):
             raise TypeError("invalid msa type")
         ncol = msa.get_alignment_length()
         if ncol > 0 and (len(labels) != ncol or len(positions) != ncol):
             raise ValueError("all arguments must share the same column space")
+        if metadata is not None and len(metadata) != len(msa):
+            raise ValueError("all arguments must share the same row space")
         self.__labels = labels
         self.__positions = positions
+        self._metadata = metadata
         super(LabeledMSA, self).__init__(iter(msa), msa._alphabet)
 
+    def __metadata_rows(self, index):
+        return None if self._metadata is None else self._metadata[index]
+
     def __getitem__(self, index):
         if isinstance(index, (int, slice)):
             return LabeledMSA(
                 super(LabeledMSA, self).__getitem__(index),
                 self.__labels,
-                self.__positions
+                self.__positions,
+                self.__metadata_rows(index)
                 )
         elif len(index) != 2 or not all(isinstance(idx, (int, slice)) for idx in index):
             raise TypeError("invalid index type")
 
-        _, col_index = index
+        row_index, col_index = index
         if isinstance(col_index, int):
             return super(LabeledMSA, self).__getitem__(index)
         elif isinstance(col_index, slice):
             return LabeledMSA(
                 super(LabeledMSA, self).__getitem__(index),
                 self.__labels[col_index],
-                self.__positions[col_index]
+                self.__positions[col_index],
+                self.__metadata_rows(row_index)
                 )
         else:
             raise TypeError("invalid index type")
@@ -80,9 +439,27 @@ class LabeledMSA(MultipleSeqAlignment):
         return LabeledMSA(
             super(LabeledMSA, self).__add__(other),
             self.__labels + other.__labels,
-            self.__positions + other.__positions
+            self.__positions + other.__positions,
+            self._metadata
             )
 
+    def take(self, idxs):
+        """
+        the rows at idxs
+        """
+        idxs = list(idxs)
+        return LabeledMSA(
+            MultipleSeqAlignment([self._records[i] for i in idxs], self._alphabet),
+            self.__labels,
+            self.__positions,
+            None if self._metadata is None else self._metadata.take(idxs)
+            )
+
+    def append(self, record):
+        super(LabeledMSA, self).append(record)
+        if self._metadata is not None:
+            self._metadata = MetadataTable.concatenate((self._metadata, MetadataTable.from_records([record])))
+
     def get_alignment_length(self):
         return len(self.__labels)
 
@@ -93,3 +470,352 @@ class LabeledMSA(MultipleSeqAlignment):
     @property
     def positions(self):
         return iter(self.__positions)
+
+    @property
+    def metadata(self):
+        """
+        the MetadataTable of the sequences, parsed from their descriptions
+        unless one was attached
+        """
+        if self._metadata is None:
+            self._metadata = MetadataTable.from_records(self)
+        return self._metadata
+
+    @metadata.setter
+    def metadata(self, metadata):
+        if len(metadata) != len(self):
+            raise ValueError("all arguments must share the same row space")
+        self._metadata = metadata
+
+
+class ArrayMSA(object):
+    """
+    a LabeledMSA kept as an N x L uint8 matrix of its letters, alongside the
+    ids and descriptions of its sequences and the labels and positions of its
+    columns; slicing rows or columns returns a view sharing the matrix, and
+    SeqRecords are only built when a sequence is asked for
+    """
+
+    def __init__(self, data, ids, descriptions, labels, positions, alphabet=None, metadata=None):
+        if data.ndim != 2 or len(ids) != data.shape[0] or len(descriptions) != data.shape[0]:
+            raise ValueError("all arguments must share the same row space")
+        if metadata is not None and len(metadata) != data.shape[0]:
+            raise ValueError("all arguments must share the same row space")
+        if len(labels) != data.shape[1] or len(positions) != data.shape[1]:
+            raise ValueError("all arguments must share the same column space")
+        self.__data = data
+        self.__ids = list(ids)
+        self.__descriptions = list(descriptions)
+        self.__labels = list(labels)
+        self.__positions = list(positions)
+        self._alphabet = alphabet
+        self._metadata = metadata
+
+    @staticmethod
+    def from_msa(msa):
+        """
+        the ArrayMSA of a LabeledMSA
+        """
+        if isinstance(msa, ArrayMSA):
+            return msa
+        ncol = msa.get_alignment_length()
+        buf = ''.join(str(record.seq) for record in msa).encode('ascii')
+        return ArrayMSA(
+            frombuffer(buf, dtype=uint8).reshape((len(msa), ncol)),
+            [record.id for record in msa],
+            [record.description for record in msa],
+            list(msa.labels),
+            list(msa.positions),
+            getattr(msa, '_alphabet', None),
+            getattr(msa, '_metadata', None)
+            )
+
+    @staticmethod
+    def from_msa_with_ref(msa, refidx):
+        return ArrayMSA.from_msa(LabeledMSA.from_msa_with_ref(msa, refidx))
+
+    @staticmethod
+    def __header(fh, filename):
+        if fh.read(len(_MAGIC)) != _MAGIC:
+            raise ValueError("'{0:s}' is not a binary alignment".format(filename))
+        version, hdrlen = unpack('<II', fh.read(8))
+        if version != _VERSION:
+            raise ValueError("unsupported binary alignment version {0:d}".format(version))
+        return json_loads(fh.read(hdrlen).decode('utf-8'))
+
+    @staticmethod
+    def fingerprint(filename):
+        """
+        the fingerprint saved with the alignment in filename, if any,
+        reading only its header
+        """
+        with open(filename, 'rb') as fh:
+            return ArrayMSA.__header(fh, filename).get('fingerprint')
+
+    @staticmethod
+    def load(filename, mmap=True):
+        """
+        the ArrayMSA saved in filename; unless mmap is False its matrix is a
+        read-only memory map of the file, so that loading costs only the
+        header and processes opening the same file share its pages
+        """
+        with open(filename, 'rb') as fh:
+            header = ArrayMSA.__header(fh, filename)
+            offset = fh.tell()
+            shape = tuple(header['shape'])
+            if shape[0] * shape[1] == 0:
+                data = zeros(shape, dtype=uint8)
+            elif mmap:
+                data = memmap(fh, dtype=uint8, mode='r', offset=offset, shape=shape)
+            else:
+                data = fromfile(fh, dtype=uint8, count=shape[0] * shape[1]).reshape(shape)
+        alphabet = {'amino': AminoAlphabet, 'dna': DNAAlphabet}.get(header['alphabet'])
+        return ArrayMSA(
+            data,
+            header['ids'],
+            header['descriptions'],
+            header['labels'],
+            header['positions'],
+            alphabet
+            )
+
+    @staticmethod
+    def __write(filename, header, write):
+        header = json_dumps(header).encode('utf-8')
+        # JSON ignores trailing whitespace, so pad the header with it
+        hdrlen = len(header) + (-(len(_MAGIC) + 8 + len(header)) % _ALIGN)
+        fd, tmpfile = mkstemp(dir=dirname(abspath(filename)))
+        try:
+            with fdopen(fd, 'wb') as fh:
+                fh.write(_MAGIC)
+                fh.write(pack('<II', _VERSION, hdrlen))
+                fh.write(header.ljust(hdrlen))
+                write(fh)
+            # mkstemp is private to the user, unlike a file opened plainly
+            mask = umask(0)
+            umask(mask)
+            chmod(tmpfile, 0o666 & ~mask)
+            rename(tmpfile, filename)
+        finally:
+            if exists(tmpfile):
+                remove(tmpfile)
+
+    def save(self, filename, fingerprint=None):
+        """
+        write the alignment to filename in the binary format load() maps,
+        with a fingerprint of what it was built from, if given; the file
+        is replaced whole, so that maps of an earlier one stay intact
+        """
+        # alphabets compare by value, as copies of them are common
+        if str(self._alphabet) == str(AminoAlphabet):
+            alphabet = 'amino'
+        elif str(self._alphabet) == str(DNAAlphabet):
+            alphabet = 'dna'
+        else:
+            alphabet = None
+        ArrayMSA.__write(filename, {
+            'shape': list(self.__data.shape),
+            'ids': self.__ids,
+            'descriptions': self.__descriptions,
+            'labels': self.__labels,
+            'positions': [int(pos) for pos in self.__positions],
+            'alphabet': alphabet,
+            'fingerprint': fingerprint
+            }, self.__data.tofile)
+
+    @staticmethod
+    def __stockholm_rows(sto_filename, ranges):
+        # the (id, tag, value) of each #=GS line, and the (id, None, letters)
+        # of each sequence line, in the columns of ranges
+        with open(sto_filename) as fh:
+            for line in fh:
+                if line.startswith('#=GS'):
+                    _, id, tag, value = (line.split(None, 3) + [''])[:4]
+                    yield id, tag, value.strip()
+                elif line.strip() and not line.startswith('#') and not line.startswith('//'):
+                    id, seq = line.split()
+                    if ranges is not None:
+                        seq = ''.join(seq[lwr:upr] for lwr, upr in ranges)
+                    yield id, None, seq
+
+    @staticmethod
+    def save_stockholm(sto_filename, filename, ranges=None, fingerprint=None):
+        """
+        write the single-block (Pfam) Stockholm alignment in sto_filename to
+        filename in the binary format, keeping only the columns in ranges if
+        given; it is read line by line, twice, so that memory holds only its
+        ids, and its columns are known by number alone
+        """
+        ids, descriptions, ncol = [], {}, 0
+        for id, tag, value in ArrayMSA.__stockholm_rows(sto_filename, ranges):
+            if tag == 'DE':
+                descriptions[id] = value
+            elif tag is None:
+                if ids and len(value) != ncol:
+                    raise ValueError("'{0:s}' is not a single-block alignment".format(sto_filename))
+                ids.append(id)
+                ncol = len(value)
+        if len(set(ids)) != len(ids):
+            raise ValueError("'{0:s}' is not a single-block alignment".format(sto_filename))
+
+        def write(fh):
+            for _, tag, value in ArrayMSA.__stockholm_rows(sto_filename, ranges):
+                if tag is None:
+                    # gaps in insert columns are dots
+                    fh.write(value.replace('.', '-').encode('ascii'))
+
+        ArrayMSA.__write(filename, {
+            'shape': [len(ids), ncol],
+            'ids': ids,
+            'descriptions': [descriptions.get(id, id) for id in ids],
+            'labels': [str(i) for i in range(1, ncol + 1)],
+            'positions': list(range(1, ncol + 1)),
+            'alphabet': None,
+            'fingerprint': fingerprint
+            }, write)
+
+    def to_msa(self):
+        """
+        the LabeledMSA of the same sequences
+        """
+        return LabeledMSA(
+            MultipleSeqAlignment(list(self), self._alphabet),
+            self.__labels,
+            self.__positions,
+            self._metadata
+            )
+
+    def __len__(self):
+        return self.__data.shape[0]
+
+    def __record(self, i):
+        seq = self.__data[i].tobytes().decode('ascii')
+        return SeqRecord(
+            Seq(seq) if self._alphabet is None else Seq(seq, self._alphabet),
+            id=self.__ids[i],
+            name=self.__ids[i],
+            description=self.__descriptions[i]
+            )
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.__record(i)
+
+    def __metadata_rows(self, index):
+        return None if self._metadata is None else self._metadata[index]
+
+    def __rows(self, index):
+        return ArrayMSA(
+            self.__data[index],
+            self.__ids[index],
+            self.__descriptions[index],
+            self.__labels,
+            self.__positions,
+            self._alphabet,
+            self.__metadata_rows(index)
+            )
+
+    def __getitem__(self, index):
+        if isinstance(index, int):
+            return self.__record(index)
+        elif isinstance(index, slice):
+            return self.__rows(index)
+        elif len(index) != 2 or not all(isinstance(idx, (int, slice)) for idx in index):
+            raise TypeError("invalid index type")
+
+        row_index, col_index = index
+        if isinstance(row_index, int):
+            row_index = slice(row_index, row_index + 1 if row_index != -1 else None)
+        if isinstance(col_index, int):
+            return self.__data[row_index, col_index].tobytes().decode('ascii')
+        return ArrayMSA(
+            self.__data[row_index, col_index],
+            self.__ids[row_index],
+            self.__descriptions[row_index],
+            self.__labels[col_index],
+            self.__positions[col_index],
+            self._alphabet,
+            self.__metadata_rows(row_index)
+            )
+
+    def __add__(self, other):
+        if not isinstance(other, ArrayMSA):
+            raise NotImplementedError
+        if len(self) != len(other):
+            raise ValueError("alignments must have the same number of rows")
+        return ArrayMSA(
+            hstack((self.__data, other.__data)),
+            self.__ids,
+            self.__descriptions,
+            self.__labels + other.__labels,
+            self.__positions + other.__positions,
+            self._alphabet,
+            self._metadata
+            )
+
+    def take(self, idxs):
+        """
+        a copy of the rows at idxs
+        """
+        idxs = list(idxs)
+        return ArrayMSA(
+            self.__data[idxs],
+            [self.__ids[i] for i in idxs],
+            [self.__descriptions[i] for i in idxs],
+            self.__labels,
+            self.__positions,
+            self._alphabet,
+            None if self._metadata is None else self._metadata.take(idxs)
+            )
+
+    def append(self, record):
+        """
+        append a SeqRecord, copying the matrix; prefer take() to build subsets
+        """
+        seq = str(record.seq).encode('ascii')
+        if len(seq) != self.get_alignment_length():
+            raise ValueError("sequences must all be the same length")
+        self.__data = vstack((self.__data, frombuffer(seq, dtype=uint8)[None, :]))
+        self.__ids.append(record.id)
+        self.__descriptions.append(record.description)
+        if self._metadata is not None:
+            self._metadata = MetadataTable.concatenate((self._metadata, MetadataTable.from_records([record])))
+
+    def get_alignment_length(self):
+        return self.__data.shape[1]
+
+    @property
+    def data(self):
+        return self.__data
+
+    @property
+    def ids(self):
+        return iter(self.__ids)
+
+    @property
+    def descriptions(self):
+        return iter(self.__descriptions)
+
+    @property
+    def labels(self):
+        return iter(self.__labels)
+
+    @property
+    def positions(self):
+        return iter(self.__positions)
+
+    @property
+    def metadata(self):
+        """
+        the MetadataTable of the sequences, parsed from their descriptions
+        unless one was attached
+        """
+        if self._metadata is None:
+            self._metadata = MetadataTable.from_descriptions(self.__ids, self.__descriptions)
+        return self._metadata
+
+    @metadata.setter
+    def metadata(self, metadata):
+        if len(metadata) != len(self):
+            raise ValueError("all arguments must share the same row space")
+        self._metadata = metadata
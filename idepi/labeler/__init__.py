@@ -1,24 +1,257 @@
 
 from __future__ import division, print_function
 
+from ast import And, Compare, Not, NodeTransformer, fix_missing_locations, parse
 from json import loads as json_loads
 
-from numpy import zeros
+from numpy import (
+    add,
+    array,
+    asarray,
+    diff,
+    errstate,
+    isfinite,
+    logical_not,
+    maximum,
+    minimum,
+    ones,
+    where,
+    zeros
+    )
+
+from six.moves import builtins
+
+from idepi.labeledmsa import MetadataTable
 
 
 __all__ = [
     'Labeler',
+    'LabelExpression',
+    'Skipper',
     'expression',
     'skipper',
     ]
 
 
+def _mean(values):
+    return sum(values) / len(values)
+
+
+class _Ragged(object):
+    # the value lists of one label, which only reductions may consume
+
+    def __init__(self, values, offsets):
+        self.values = values
+        self.offsets = offsets
+
+    def reduce(self, ufunc):
+        lengths = diff(self.offsets)
+        full = (lengths > 0).nonzero()[0]
+        out = zeros((len(lengths),), dtype=float)
+        if len(full):
+            out[full] = ufunc.reduceat(self.values, self.offsets[full])
+        return out
+
+
+def _reduction(ufunc):
+    def reduce(values):
+        if not isinstance(values, _Ragged):
+            raise TypeError('reductions vectorize over value lists only')
+        return values.reduce(ufunc)
+    return reduce
+
+
+def _ragged_mean(values):
+    if not isinstance(values, _Ragged):
+        raise TypeError('reductions vectorize over value lists only')
+    return values.reduce(add) / maximum(diff(values.offsets), 1)
+
+
+def _ragged_len(values):
+    if not isinstance(values, _Ragged):
+        raise TypeError('reductions vectorize over value lists only')
+    return diff(values.offsets)
+
+
+# as and and or do, these give the first false or true value, or the last
+
+def _and(*values):
+    out = values[-1]
+    for value in values[-2::-1]:
+        out = where(value, out, value)
+    return out
+
+
+def _or(*values):
+    out = values[-1]
+    for value in values[-2::-1]:
+        out = where(value, value, out)
+    return out
+
+
+def _call(name, args):
+    # build the call portably, as the ast.Call signature varies
+    node = parse('{0:s}()'.format(name), mode='eval').body
+    node.args = list(args)
+    return node
+
+
+class _Vectorize(NodeTransformer):
+    # and, or, not, if-else and chained comparisons become element-wise
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        return _call('_and' if isinstance(node.op, And) else '_or', node.values)
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, Not):
+            return _call('_not', [node.operand])
+        return node
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        if len(node.ops) == 1:
+            return node
+        lefts = [node.left] + node.comparators[:-1]
+        return _call('_and', [
+            Compare(left=left, ops=[op], comparators=[right])
+            for left, op, right in zip(lefts, node.ops, node.comparators)
+            ])
+
+    def visit_IfExp(self, node):
+        self.generic_visit(node)
+        return _call('_where', [node.test, node.body, node.orelse])
+
+
+_RECORD_GLOBALS = {'mean': _mean}
+
+_VECTOR_GLOBALS = {
+    '__builtins__': builtins,
+    '_and': _and,
+    '_or': _or,
+    '_not': logical_not,
+    '_where': where,
+    'abs': abs,
+    'len': _ragged_len,
+    'max': _reduction(maximum),
+    'mean': _ragged_mean,
+    'min': _reduction(minimum),
+    'sum': _reduction(add)
+    }
+
+
+def _label_array(labels):
+    # the labels, or None where missing, as an array and a mask of present
+    valid = array([label is not None for label in labels], dtype=bool)
+    dtype = bool
+    for label in labels:
+        if label is None:
+            continue
+        type_ = type(label)
+        # raise errors is something is wonky
+        if type_ not in (bool, int, float):
+            raise ValueError(
+                "unmanageable label type '{0}'".format(
+                    type_.__name__
+                    )
+                )
+        # if even a single value is a float, they're all floats,
+        # and bools are ints once mixed with them
+        if type_ is float:
+            dtype = float
+        elif type_ is int and dtype is bool:
+            dtype = int
+    y = zeros((len(labels),), dtype=dtype)
+    for i, label in enumerate(labels):
+        if label is None:
+            continue
+        if dtype is not bool and type(label) is bool:
+            label = 1 if label else -1
+        y[i] = label
+    return y, valid
+
+
+class LabelExpression(object):
+    """
+    a label expression compiled once, that labels either a single record
+    or, through evaluate(), every row of a MetadataTable at once, where
+    max, min, mean, sum and len reduce each record's value lists;
+    expressions that do not vectorize are evaluated record by record
+    """
+
+    __cache = {}
+
+    def __init__(self, label):
+        self.label = label
+        self.__code = compile(label, '<label>', 'eval')
+        tree = fix_missing_locations(_Vectorize().visit(parse(label, mode='eval')))
+        self.__vcode = compile(tree, '<label>', 'eval')
+
+    @staticmethod
+    def of(label):
+        if label not in LabelExpression.__cache:
+            LabelExpression.__cache[label] = LabelExpression(label)
+        return LabelExpression.__cache[label]
+
+    def __call__(self, seqrecord):
+        return self.evaluate_one(json_loads(seqrecord.description)['values'])
+
+    def evaluate_one(self, values):
+        try:
+            return eval(self.__code, dict(_RECORD_GLOBALS), values)
+        except NameError:
+            return None
+
+    def evaluate(self, table):
+        """
+        the labels of every record of table, and a mask of those labeled
+        """
+        size = len(table)
+        names = [name for name in self.__vcode.co_names if name in table]
+        # records with every value the expression refers to evaluate at once,
+        # the rest (whose labels may short-circuit) one by one
+        full = ones((size,), dtype=bool)
+        for name in names:
+            full &= diff(table.ragged(name)[1]) > 0
+
+        try:
+            with errstate(all='ignore'):
+                y = eval(self.__vcode, dict(_VECTOR_GLOBALS), dict(
+                    (name, _Ragged(*table.ragged(name)))
+                    for name in names
+                    ))
+        except (NameError, TypeError, ValueError):
+            y = None
+
+        if y is None or isinstance(y, _Ragged):
+            return self.__evaluate_rows(table, range(size))
+        y = asarray(y)
+        if y.dtype.kind not in 'biuf' or y.ndim > 1:
+            return self.__evaluate_rows(table, range(size))
+        if y.ndim == 0:
+            y = zeros((size,), dtype=y.dtype) + y
+        if y.dtype.kind in 'iu':
+            y = y.astype(int)
+        # let the records raise whatever errors they would have, one by one
+        if y.dtype.kind == 'f' and not isfinite(y[full]).all():
+            return self.__evaluate_rows(table, range(size))
+
+        rest = (~full).nonzero()[0]
+        yr, valid = self.__evaluate_rows(table, rest.tolist())
+        if valid.any() and yr.dtype != y.dtype:
+            return self.__evaluate_rows(table, range(size))
+        y[rest[valid]] = yr[valid]
+        valid, full[rest] = full, valid
+
+        return y, valid
+
+    def __evaluate_rows(self, table, idxs):
+        return _label_array([self.evaluate_one(table.row(i)) for i in idxs])
+
+
 def expression(label, seqrecord):
-    desc = json_loads(seqrecord.description)
-    try:
-        return eval(label, {}, desc['values'])
-    except NameError:
-        return None
+    return LabelExpression.of(label)(seqrecord)
 
 
 def skipper(is_refseq, subtypes, seqrecord):
@@ -33,9 +266,33 @@ def skipper(is_refseq, subtypes, seqrecord):
         return True
 
 
+class Skipper(object):
+    """
+    skipper, which can also mask all the records of an alignment at once
+    """
+
+    def __init__(self, is_refseq, subtypes):
+        self.is_refseq = is_refseq
+        self.subtypes = subtypes
+
+    def __call__(self, seqrecord):
+        return skipper(self.is_refseq, self.subtypes, seqrecord)
+
+    def mask(self, alignment, table):
+        skip = array([self.is_refseq(seq) for seq in alignment], dtype=bool).reshape((-1,))
+        if self.subtypes:
+            skip |= array([
+                subtype is None or subtype not in self.subtypes
+                for subtype in table.subtypes
+                ], dtype=bool).reshape((-1,))
+        return skip
+
+
 class Labeler:
 
     def __init__(self, label, skip):
+        if isinstance(label, str):
+            label = LabelExpression.of(label)
         self.__label = label
         self.__skip = (lambda _: False) if skip is None else skip
 
@@ -44,58 +301,47 @@ class Labeler:
 
     def __call__(self, alignment):
 
-        size = len(alignment)
-
-        labels = [None for _ in range(size)]
-
-        alignment_ = alignment[:0]
-        i = 0
-        for seq in alignment:
-            if self.__skip(seq):
-                continue
-            label = self.__label(seq)
-            # skip if we have no label at all
-            if label is None:
-                continue
-            labels[i] = label
-            alignment_.append(seq)
-            i += 1
-
-        size = i
-        labels = labels[:size]
-
-        dtype = int
-        for label in labels:
-            type_ = type(label)
-            # bools are ints
-            if type_ is bool:
-                type_ = int
-            # raise errors is something is wonky
-            if type_ not in (int, float):
-                raise ValueError(
-                    "unmanageable label type '{0}'".format(
-                        type_.__name__
-                        )
-                    )
-            # if even a single value is a float,
-            # they're all floats
-            if dtype is int and type_ is float:
-                dtype = float
+        if isinstance(self.__label, LabelExpression):
+            # read the metadata columns, parsing descriptions at most once,
+            # and label every sequence at once
+            if hasattr(alignment, 'metadata'):
+                table = alignment.metadata
+            else:
+                table = MetadataTable.from_records(alignment)
+            if hasattr(self.__skip, 'mask'):
+                skip = self.__skip.mask(alignment, table)
+            else:
+                skip = array([self.__skip(seq) for seq in alignment], dtype=bool).reshape((-1,))
+            y, valid = self.__label.evaluate(table)
+            keep = (valid & ~skip).nonzero()[0].tolist()
+            y = y[keep]
+        else:
+            labels, keep = [], []
+            for j, seq in enumerate(alignment):
+                if self.__skip(seq):
+                    continue
+                label = self.__label(seq)
+                # skip if we have no label at all
+                if label is None:
+                    continue
+                labels.append(label)
+                keep.append(j)
+            y, _ = _label_array(labels)
 
-        y = zeros((size,), dtype=dtype)
+        # array-backed alignments copy the kept rows at once
+        if hasattr(alignment, 'take'):
+            alignment_ = alignment.take(keep)
+        else:
+            alignment_ = alignment[:0]
+            seqs = list(alignment)
+            for j in keep:
+                alignment_.append(seqs[j])
+
+        # convert to +1/-1 if we're bool
+        if y.dtype == bool:
+            y = where(y, 1, -1)
 
         # try to balance the data using median
         median_ = None
 
-        i = 0
-        for label in labels:
-            if label is None:
-                continue
-            # convert to +1/-1 if we're bool
-            if type(label) is bool:
-                y[i] = 1 if label else -1
-            else:
-                y[i] = label
-            i += 1
-
         return alignment_, y, median_
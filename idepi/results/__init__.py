@@ -164,10 +164,12 @@ def _dumps_weights(weights, ident=0, similar=True):
 
 class Results(dict):
 
-    def __init__(self, labels, scorer, similar=0.0):
+    def __init__(self, labels, scorer, similar=0.0, groups=None):
         super(Results, self).__init__()
         self.__labels = labels
-        self.__similar = similar > 0.0
+        # groups[i] names every feature identical to labels[i], itself included
+        self.__groups = groups if groups and any(len(g) > 1 for g in groups) else None
+        self.__similar = similar > 0.0 or self.__groups is not None
         self.__nfeat = NormalValue(int)
         self.__nfold = 0
         self.__npos = 0
@@ -255,25 +257,28 @@ class Results(dict):
             )
 
         weights = []
-        for i, label in enumerate(self.__labels):
+        for i in range(len(self.__labels)):
             v = self.__coefs[i]
             r = self.__ranks[i]
             if len(v) == 0:
                 continue
-            weights.append(
-                dict(
-                    position=label,
-                    N=len(v),
-                    rank=dict(
-                        mean=r.mean,
-                        std=r.std
-                        ),
-                    value=dict(
-                        mean=v.mean,
-                        std=v.std,
-                        )
+            # only render the names of features actually reported
+            label = self.__labels[i]
+            weight = dict(
+                position=label,
+                N=len(v),
+                rank=dict(
+                    mean=r.mean,
+                    std=r.std
+                    ),
+                value=dict(
+                    mean=v.mean,
+                    std=v.std,
                     )
                 )
+            if self.__groups is not None:
+                weight['similar'] = [name for name in self.__groups[i] if name != label]
+            weights.append(weight)
         self['weights'] = weights
         self.__valid = True
 
@@ -1,18 +1,24 @@
 
+from ._db import main as db
 from ._discrete import main as discrete
 from ._learn import main as learn
+from ._msa2sto import main as msa2sto
 from ._phylo import main as phylo
 from ._predict import main as predict
 # from ._regressor import main as regressor
 from ._sto2fa import main as sto2fa
+from ._sto2msa import main as sto2msa
 from ._tree import main as tree
 
 __all__ = [
+    'db',
     'discrete',
     'learn',
+    'msa2sto',
     'phylo',
     'predict',
 #     'regressor',
     'sto2fa',
+    'sto2msa',
     'tree'
 ]
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# db.py :: maintains the neutralization database: builds its indexes and
+# materialized tables, and benchmarks the queries that read it.
+#
+# Copyright (C) 2011 N Lance Hepler <nlhepler@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+from __future__ import division, print_function
+
+from argparse import ArgumentParser
+from os import close, remove
+from os.path import exists, join
+from shutil import copyfile
+from sqlite3 import connect
+from sys import argv, exit, stdout
+from tempfile import mkstemp
+from timeit import default_timer
+
+from idepi import __path__ as idepi_path
+from idepi.argument import PathType
+from idepi.datasource import Sqlite3Db
+
+
+def time_queries(filename, antibodies, repeat):
+    # the query plan of the first antibody, and the rows
+    # and best time of each antibody's query
+    db = Sqlite3Db(filename)
+    queries = [db.query([antibody])[:2] for antibody in antibodies]
+    db.close()
+    conn = connect(filename)
+    try:
+        plan = [row[-1] for row in conn.execute('explain query plan ' + queries[0][0], queries[0][1])]
+        results = []
+        for stmt, params in queries:
+            best = None
+            for _ in range(repeat):
+                start = default_timer()
+                nrow = len(conn.execute(stmt, params).fetchall())
+                elapsed = default_timer() - start
+                best = elapsed if best is None else min(best, elapsed)
+            results.append((nrow, best))
+    finally:
+        conn.close()
+    return plan, results
+
+
+def benchmark(ns, fh=stdout):
+    fd, tmpdb = mkstemp(suffix='.sqlite3'); close(fd)
+    try:
+        # never touch the database itself, only a copy of it
+        copyfile(ns.DATABASE, tmpdb)
+        antibodies = ns.ANTIBODIES or sorted(Sqlite3Db(tmpdb).antibodies)
+        before_plan, before = time_queries(tmpdb, antibodies, ns.REPEAT)
+        Sqlite3Db.optimize(tmpdb)
+        after_plan, after = time_queries(tmpdb, antibodies, ns.REPEAT)
+    finally:
+        if exists(tmpdb):
+            remove(tmpdb)
+
+    for name, plan in (('before', before_plan), ('after', after_plan)):
+        print('query plan for {0:s}, {1:s} optimizing:'.format(antibodies[0], name), file=fh)
+        for detail in plan:
+            print('  ' + detail, file=fh)
+
+    # before optimizing, a row is a sequence with its concatenated values,
+    # after, a row is one of its values
+    fmt = '{0:<16s} {1:>8} {2:>12} {3:>8} {4:>12}'
+    print(fmt.format('antibody', 'rows', 'before (ms)', 'rows', 'after (ms)'), file=fh)
+    for antibody, (nrow0, t0), (nrow1, t1) in zip(antibodies, before, after):
+        print(fmt.format(antibody.strip(), nrow0, '{0:.3f}'.format(1000 * t0), nrow1, '{0:.3f}'.format(1000 * t1)), file=fh)
+    total0, total1 = sum(t for _, t in before), sum(t for _, t in after)
+    print(fmt.format('total', '', '{0:.3f}'.format(1000 * total0), '', '{0:.3f}'.format(1000 * total1)), file=fh)
+
+
+def main(args=None):
+
+    if args is None:
+        args = argv[1:]
+
+    parser = ArgumentParser(description='maintain the neutralization database')
+    subparsers = parser.add_subparsers(dest='COMMAND')
+
+    p = subparsers.add_parser(
+        'optimize',
+        help='index the database and materialize the LABELED_SEQUENCE table'
+        )
+    p.add_argument('DATABASE', type=PathType)
+
+    p = subparsers.add_parser(
+        'benchmark',
+        help='compare query plans and times on a copy of the database, before and after optimizing'
+        )
+    p.add_argument('DATABASE', type=PathType, nargs='?',
+                   default=join(idepi_path[0], 'data', 'allneuts.sqlite3'))
+    p.add_argument('--antibody', action='append', dest='ANTIBODIES',
+                   help='benchmark only this antibody (may be repeated) [all]')
+    p.add_argument('--repeat', type=int, default=10, dest='REPEAT',
+                   help='time the best of this many runs of each query [10]')
+
+    ns = parser.parse_args(args)
+
+    if ns.COMMAND == 'optimize':
+        Sqlite3Db.optimize(ns.DATABASE)
+    elif ns.COMMAND == 'benchmark':
+        benchmark(ns)
+    else:
+        parser.print_usage()
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
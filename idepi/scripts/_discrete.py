@@ -27,7 +27,6 @@ from __future__ import division, print_function
 
 import sys
 
-from functools import partial
 from os import getenv
 from os.path import join
 from re import compile as re_compile, I as re_I
@@ -58,14 +57,14 @@ from idepi.feature_extraction import (
     FeatureUnion,
     SiteVectorizer,
     PairwiseSiteVectorizer,
-    MotifVectorizer,
-    PairwiseMotifVectorizer
+    SiteInteractionVectorizer,
+    MultiMotifVectorizer
     )
 from idepi.filters import naive_filter
 from idepi.labeler import (
+    LabelExpression,
     Labeler,
-    expression,
-    skipper
+    Skipper
     )
 from idepi.logging import init_log
 from idepi.results import Results
@@ -136,7 +135,7 @@ def main(args=None):
     # grab the relevant antibody from the SQLITE3 data
     # format as SeqRecord so we can output as FASTA
     # and generate an alignment using HMMER if it doesn't already exist
-    seqrecords, clonal, antibodies = ARGS.DATA.seqrecords(antibodies, ARGS.CLONAL)
+    seqrecords, clonal, antibodies, metadata = ARGS.DATA.seqrecords(antibodies, ARGS.CLONAL)
 
     # if we're doing LOOCV, make sure we set CV_FOLDS appropriately
     if ARGS.LOOCV:
@@ -155,13 +154,13 @@ def main(args=None):
     sto_filename = alignment_basename + '.sto'
 
     # don't capture the second variable, let it be gc'd
-    alignment = generate_alignment(seqrecords, sto_filename, is_refseq, ARGS)[0]
+    alignment = generate_alignment(seqrecords, sto_filename, is_refseq, ARGS, metadata=metadata)[0]
 
     re_pngs = re_compile(r'N[^P][TS][^P]', re_I)
 
     ylabeler = Labeler(
-        partial(expression, ARGS.LABEL),
-        partial(skipper, is_refseq, ARGS.SUBTYPES)
+        LabelExpression(ARGS.LABEL),
+        Skipper(is_refseq, ARGS.SUBTYPES)
         )
     alignment, y, threshold = ylabeler(alignment)
 
@@ -174,21 +173,47 @@ def main(args=None):
         max_gap_ratio=ARGS.MAX_GAP_RATIO
         )
 
-    extractors = [('site_ident', SiteVectorizer(ARGS.ENCODER, filter))]
+    extractors = [('site_ident', SiteVectorizer(ARGS.ENCODER, filter, sparse=ARGS.SPARSE))]
 
     if ARGS.RADIUS:
-        extractors.append(('pair_ident', PairwiseSiteVectorizer(ARGS.ENCODER, filter, ARGS.RADIUS)))
-
-    if ARGS.PNGS:
-        extractors.append(('pngs', MotifVectorizer(re_pngs, 4, name='PNGS')))
-
-    if ARGS.PNGS_PAIRS:
-        extractors.append(
-            ('pngs_pair', PairwiseMotifVectorizer(re_pngs, 4, name='PNGS'))
-            )
-
-    extractor = FeatureUnion(extractors, n_jobs=1)  # n_jobs must be 1 for now
+        extractors.append(('pair_ident', PairwiseSiteVectorizer(
+            ARGS.ENCODER,
+            filter,
+            ARGS.RADIUS,
+            sparse=ARGS.SPARSE,
+            n_features=ARGS.HASH_PAIRS or None,
+            min_support=ARGS.MIN_SUPPORT
+            )))
+
+    if ARGS.MAX_ORDER:
+        extractors.append(('site_interactions', SiteInteractionVectorizer(
+            ARGS.ENCODER,
+            filter,
+            ARGS.MAX_ORDER,
+            ARGS.INTERACTION_SUPPORT,
+            sparse=ARGS.SPARSE
+            )))
+
+    motifs = [('PNGS', re_pngs, 4)]
+
+    # all motifs share a single scan of the alignment
+    if ARGS.PNGS or ARGS.PNGS_PAIRS:
+        extractors.append(('motifs', MultiMotifVectorizer(
+            motifs,
+            single=ARGS.PNGS,
+            pairwise=ARGS.PNGS_PAIRS,
+            sparse=ARGS.SPARSE,
+            n_features=ARGS.HASH_PAIRS or None
+            )))
+
+    extractor = FeatureUnion(
+        extractors,
+        n_jobs=int(getenv('NCPU', -1)),
+        sparse=ARGS.SPARSE,
+        deduplicate=ARGS.DEDUP
+        )
     X = extractor.fit_transform(alignment)
+    extractor.close()
 
     assert y.shape[0] == X.shape[0], \
         "number of classes doesn't match the data: %d vs %d" % (y.shape[0], X.shape[0])
@@ -209,13 +234,13 @@ def main(args=None):
 
     results = None
     for n_features in ARGS.FEATURE_GRID:
-        results_ = Results(extractor.get_feature_names(), scorer, ARGS.SIMILAR)
+        folds = []
 
         for train_idxs, test_idxs in StratifiedKFold(y, ARGS.CV_FOLDS):
 
             if train_idxs.sum() < 1 or test_idxs.sum() < 1:
                 y_true = y[test_idxs]
-                results_.add(y_true, y_true, {})
+                folds.append((y_true, y_true, {}))
                 continue
 
             X_train = X[train_idxs]
@@ -263,7 +288,21 @@ def main(args=None):
             else:
                 coefs, ranks = coefs_ranks(selector_.ranking_, selector_.support_, svm_.coef_)
 
-            results_.add(y_true, y_pred, coefs, ranks)
+            folds.append((y_true, y_pred, coefs, ranks))
+
+        # hashed features can be named only once we know which were selected
+        if ARGS.HASH_PAIRS:
+            extractor.resolve(alignment, sorted(set(i for fold in folds for i in fold[2])))
+
+        results_ = Results(
+            extractor.get_feature_names(),
+            scorer,
+            ARGS.SIMILAR,
+            extractor.get_feature_groups()
+            )
+
+        for fold in folds:
+            results_.add(*fold)
 
         if results is None or results_ > results:
             results = results_
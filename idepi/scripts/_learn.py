@@ -28,7 +28,6 @@ from __future__ import division, print_function
 import sys
 
 from argparse import ArgumentTypeError
-from functools import partial
 from gzip import open as gzip_open
 from os import getenv
 from pickle import dump as pickle_dump
@@ -60,14 +59,14 @@ from idepi.feature_extraction import (
     FeatureUnion,
     SiteVectorizer,
     PairwiseSiteVectorizer,
-    MotifVectorizer,
-    PairwiseMotifVectorizer
+    SiteInteractionVectorizer,
+    MultiMotifVectorizer
     )
 from idepi.filters import naive_filter
 from idepi.labeler import (
+    LabelExpression,
     Labeler,
-    expression,
-    skipper
+    Skipper
     )
 from idepi.results import Results
 from idepi.scorer import Scorer
@@ -134,7 +133,7 @@ def main(args=None):
     # grab the relevant antibody from the SQLITE3 data
     # format as SeqRecord so we can output as FASTA
     # and generate an alignment using HMMER if it doesn't already exist
-    seqrecords, clonal, antibodies = ARGS.DATA.seqrecords(antibodies, ARGS.CLONAL)
+    seqrecords, clonal, antibodies, metadata = ARGS.DATA.seqrecords(antibodies, ARGS.CLONAL)
 
     ab_basename = ''.join((
         '+'.join(antibodies),
@@ -148,14 +147,14 @@ def main(args=None):
         ))
     sto_filename = alignment_basename + '.sto'
 
-    alignment, hmm = generate_alignment(seqrecords, sto_filename, is_refseq, ARGS)
+    alignment, hmm = generate_alignment(seqrecords, sto_filename, is_refseq, ARGS, metadata=metadata)
 
     re_pngs = re_compile(r'N[^P][TS][^P]', re_I)
 
     # compute features
     ylabeler = Labeler(
-        partial(expression, ARGS.LABEL),
-        partial(skipper, is_refseq, ARGS.SUBTYPES)
+        LabelExpression(ARGS.LABEL),
+        Skipper(is_refseq, ARGS.SUBTYPES)
     )
     alignment, y, threshold = ylabeler(alignment)
 
@@ -165,21 +164,50 @@ def main(args=None):
         max_gap_ratio=ARGS.MAX_GAP_RATIO
         )
 
-    extractors = [('site', SiteVectorizer(ARGS.ENCODER, filter))]
+    extractors = [('site', SiteVectorizer(ARGS.ENCODER, filter, sparse=ARGS.SPARSE))]
 
     if ARGS.RADIUS:
-        extractors.append(('site_pairs', PairwiseSiteVectorizer(ARGS.ENCODER, filter, ARGS.RADIUS)))
-
-    if ARGS.PNGS:
-        extractors.append(('pngs', MotifVectorizer(re_pngs, 4, name='PNGS')))
-
-    if ARGS.PNGS_PAIRS:
-        extractors.append(
-            ('pngs_pairs', PairwiseMotifVectorizer(re_pngs, 4, name='PNGS'))
-            )
-
-    extractor = FeatureUnion(extractors, n_jobs=1)  # n_jobs must be one for now
+        extractors.append(('site_pairs', PairwiseSiteVectorizer(
+            ARGS.ENCODER,
+            filter,
+            ARGS.RADIUS,
+            sparse=ARGS.SPARSE,
+            n_features=ARGS.HASH_PAIRS or None,
+            min_support=ARGS.MIN_SUPPORT
+            )))
+
+    if ARGS.MAX_ORDER:
+        extractors.append(('site_interactions', SiteInteractionVectorizer(
+            ARGS.ENCODER,
+            filter,
+            ARGS.MAX_ORDER,
+            ARGS.INTERACTION_SUPPORT,
+            sparse=ARGS.SPARSE
+            )))
+
+    motifs = [('PNGS', re_pngs, 4)]
+
+    # all motifs share a single scan of the alignment
+    if ARGS.PNGS or ARGS.PNGS_PAIRS:
+        extractors.append(('motifs', MultiMotifVectorizer(
+            motifs,
+            single=ARGS.PNGS,
+            pairwise=ARGS.PNGS_PAIRS,
+            sparse=ARGS.SPARSE,
+            n_features=ARGS.HASH_PAIRS or None
+            )))
+
+    extractor = FeatureUnion(
+        extractors,
+        n_jobs=int(getenv('NCPU', -1)),
+        sparse=ARGS.SPARSE,
+        deduplicate=ARGS.DEDUP
+        )
     X = extractor.fit_transform(alignment)
+    # the model transforms a chunk of sequences at a time when predicting,
+    # for which worker processes cost more than they save
+    extractor.close()
+    extractor.n_jobs = 1
 
     Cs = list(C_range(*ARGS.LOG2C))
     scorer = Scorer(ARGS.OPTSTAT)
@@ -224,14 +252,23 @@ def main(args=None):
             cv=ARGS.CV_FOLDS
             ).fit(X, y).best_estimator_
 
-    pickle_dump((MODEL_VERSION, ARGS.ENCODER, ARGS.LABEL, hmm, extractor, clf), ARGS.MODEL)
-    ARGS.MODEL.close()
-
     mrmr_ = clf.named_steps['mrmr']
     svm_ = clf.named_steps['svm'].best_estimator_
 
+    # name the hashed features that were selected before saving the model
+    if ARGS.HASH_PAIRS:
+        extractor.resolve(alignment, mrmr_.support_.nonzero()[0])
+
+    pickle_dump((MODEL_VERSION, ARGS.ENCODER, ARGS.LABEL, hmm, extractor, clf), ARGS.MODEL)
+    ARGS.MODEL.close()
+
     coefs, ranks = coefs_ranks(mrmr_.ranking_, mrmr_.support_, svm_.coef_)
-    results = Results(extractor.get_feature_names(), scorer, ARGS.SIMILAR)
+    results = Results(
+        extractor.get_feature_names(),
+        scorer,
+        ARGS.SIMILAR,
+        extractor.get_feature_groups()
+        )
 
     results.add(y, clf.predict(X), coefs, ranks)
     results.metadata(antibodies, ARGS.LABEL)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# msa2sto.py :: converts a memory-mapped binary alignment file to stockholm
+# format.
+#
+# Copyright (C) 2011 N Lance Hepler <nlhepler@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+from __future__ import division, print_function
+
+from argparse import ArgumentParser
+from sys import argv, exit, stdout
+
+from six import StringIO
+
+from Bio import AlignIO
+from Bio.Align import MultipleSeqAlignment
+from Bio.Seq import Seq
+from Bio.SeqRecord import SeqRecord
+
+from idepi.argument import PathType
+from idepi.labeledmsa import ArrayMSA
+
+
+def main(args=None):
+
+    if args is None:
+        args = argv[1:]
+
+    parser = ArgumentParser(description='convert binary alignment to stockholm file')
+    parser.add_argument('MSAFILE', type=PathType)
+    parser.add_argument('--refid', dest='REFID', default='reference',
+                        help='id of the reference sequence rebuilt from the column labels [reference]')
+    ns = parser.parse_args(args)
+
+    msa = ArrayMSA.load(ns.MSAFILE)
+
+    # residue columns are labeled by the reference letter, insertions by
+    # their position alone, so the reference row is rebuilt from the labels
+    refseq = ''.join(label[0] if label[0].isalpha() else '-' for label in msa.labels)
+    records = [SeqRecord(Seq(refseq), id=ns.REFID, name=ns.REFID, description='')]
+    records.extend(msa)
+
+    buf = StringIO()
+    AlignIO.write(MultipleSeqAlignment(records), buf, 'stockholm')
+
+    # every column of a binary alignment is a reference column
+    lines = buf.getvalue().splitlines()
+    lines.insert(-1, '#=GC RF ' + 'x' * len(refseq))
+    stdout.write('\n'.join(lines) + '\n')
+
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -36,7 +36,7 @@ def main(args=None):
     except IndexError:
         raise RuntimeError('No reference sequence found!')
 
-    labels = SiteVectorizer(AminoEncoder).fit(msa).get_feature_names()
+    labels = list(SiteVectorizer(AminoEncoder).fit(msa).get_feature_names())
 
     seqrecords = [r for i, r in enumerate(msa) if not i == refidx]
 
@@ -28,13 +28,16 @@ from __future__ import division, print_function
 import sys
 
 from gzip import open as gzip_open
-from os import close, remove
-from os.path import exists
+from hashlib import sha1
+from os import close, makedirs, remove
+from os.path import abspath, dirname, exists, isdir, join
 from pickle import load as pickle_load
 from tempfile import mkstemp
 
 import numpy as np
 
+from scipy.sparse import issparse
+
 from Bio import SeqIO
 
 from BioExt.misc import translate
@@ -49,10 +52,14 @@ from idepi.argument import (
 )
 from idepi.constants import AminoAlphabet, DNAAlphabet
 from idepi.encoder import DNAEncoder
+from idepi.labeledmsa import ArrayMSA
 from idepi.util import (
+    alignment_fingerprint,
     generate_alignment_,
-    load_stockholm,
-    seqfile_format
+    load_alignment,
+    seqfile_format,
+    stockholm_rf_ranges,
+    user_cache
     )
 from idepi.verifier import VerifyError, Verifier
 
@@ -67,8 +74,10 @@ def main(args=None):
 
     parser = hmmer_args(parser)
 
+    parser.add_argument('--chunksize', type=int, dest='CHUNK_SIZE')
     parser.add_argument('MODEL', type=PathType)
     parser.add_argument('SEQUENCES', type=PathType)
+    parser.set_defaults(CHUNK_SIZE=1024)
 
     ARGS = parse_args(parser, args, namespace=ns)
 
@@ -78,81 +87,121 @@ def main(args=None):
             if model[0] != MODEL_VERSION:
                 raise ImportError('incompatible model version')
             ARGS.ENCODER, ARGS.LABEL, hmm, extractor, clf = model[1:]
+            # chunks are transformed one after another, in this process
+            extractor.n_jobs = 1
         except ImportError:
             msg = 'your model is not of the appropriate version, please re-learn your model'
             raise RuntimeError(msg)
 
-    # create a temporary file wherein space characters have been removed
-    with open(ARGS.SEQUENCES) as seq_fh:
-
-        def seqrecords():
-            is_dna = ARGS.ENCODER == DNAEncoder
-            seq_fmt = seqfile_format(ARGS.SEQUENCES)
-            source = Verifier(SeqIO.parse(seq_fh, seq_fmt), DNAAlphabet)
+    # the alignment of SEQUENCES to the model is kept in the per-user cache
+    # directory, in the binary format, and reused while both are unchanged
+    msa_filename = user_cache(join(
+        'alignments',
+        sha1(abspath(ARGS.SEQUENCES).encode('utf-8')).hexdigest() + '.msa'
+        ))
+    is_dna = ARGS.ENCODER == DNAEncoder
+    with open(ARGS.SEQUENCES, 'rb') as fh:
+        fingerprint = alignment_fingerprint([], MODEL_VERSION, 'dna' if is_dna else 'amino', hmm, fh)
+    alignment = load_alignment(msa_filename, fingerprint)
+    tmpmsa = None
+
+    if alignment is None:
+        # create a temporary file wherein space characters have been removed
+        with open(ARGS.SEQUENCES) as seq_fh:
+
+            def seqrecords():
+                seq_fmt = seqfile_format(ARGS.SEQUENCES)
+                source = Verifier(SeqIO.parse(seq_fh, seq_fmt), DNAAlphabet)
+                try:
+                    for record in source:
+                        yield record if is_dna else translate(record)
+                except VerifyError:
+                    if is_dna:
+                        msg = (
+                            "your model specifies a DNA encoding "
+                            "which is incompatible with protein sequences"
+                            )
+                        raise RuntimeError(msg)
+                    source.set_alphabet(AminoAlphabet)
+                    for record in source:
+                        yield record
+
+            tmphmm, tmpaln = None, None
             try:
-                for record in source:
-                    yield record if is_dna else translate(record)
-            except VerifyError:
-                if is_dna:
-                    msg = (
-                        "your model specifies a DNA encoding "
-                        "which is incompatible with protein sequences"
-                        )
-                    raise RuntimeError(msg)
-                source.set_alphabet(AminoAlphabet)
-                for record in source:
-                    yield record
-
-        try:
-            fd, tmphmm = mkstemp(); close(fd)
-            with open(tmphmm, 'wb') as hmm_fh:
-                hmm_fh.write(hmm)
-                # explicitly gc hmm
-                hmm = None
-            tmpaln = generate_alignment_(seqrecords(), tmphmm, ARGS)
-            alignment = load_stockholm(tmpaln, trim=True)
-        finally:
-            if exists(tmphmm):
-                remove(tmphmm)
-            if exists(tmpaln):
-                remove(tmpaln)
-
-    X = extractor.transform(alignment)
-    y = clf.predict(X)
+                fd, tmphmm = mkstemp(); close(fd)
+                with open(tmphmm, 'wb') as hmm_fh:
+                    hmm_fh.write(hmm)
+                    # explicitly gc hmm
+                    hmm = None
+                tmpaln = generate_alignment_(seqrecords(), tmphmm, ARGS)
+                # the alignment is written to the binary format a row at a
+                # time and mapped, so that memory is bounded by the chunks
+                # transformed rather than the whole alignment; where the
+                # cache is unwritable it lasts only as long as this run
+                ranges = stockholm_rf_ranges(tmpaln)
+                try:
+                    if not isdir(dirname(msa_filename)):
+                        makedirs(dirname(msa_filename))
+                    ArrayMSA.save_stockholm(tmpaln, msa_filename, ranges, fingerprint)
+                except (IOError, OSError):
+                    fd, tmpmsa = mkstemp(); close(fd)
+                    msa_filename = tmpmsa
+                    ArrayMSA.save_stockholm(tmpaln, msa_filename, ranges)
+                alignment = ArrayMSA.load(msa_filename)
+            finally:
+                if tmphmm is not None and exists(tmphmm):
+                    remove(tmphmm)
+                if tmpaln is not None and exists(tmpaln):
+                    remove(tmpaln)
+                # the map keeps its pages, so the file need not outlive it
+                if tmpmsa is not None and exists(tmpmsa):
+                    remove(tmpmsa)
 
     feature_names = extractor.get_feature_names()
     support = clf.named_steps['mrmr'].support_
     labels = ['"{0:s}"'.format(feature_names[i]) for i, s in enumerate(support) if s]
     emptys = [' ' * (len(label) + 2) for label in labels]
-    idlen = max(len(r.id) for r in alignment) + 3
+    idlen = max([len(id) for id in alignment.ids] or [0]) + 3
 
     print('{{\n  "label": "{0:s}",\n  "predictions": ['.format(ARGS.LABEL), file=ARGS.OUTPUT)
-    for i, r in enumerate(alignment):
-        if i > 0:
-            print(',')
-        features = ['[ ']
-        for j, x in enumerate(X[i, support]):
-            if x:
-                features.append(labels[j])
-                features.append(', ')
+    ids = alignment.ids
+    i = 0
+    # features are built and predicted a chunk of sequences at a time,
+    # so memory is bounded by the chunk size and not the alignment
+    for X in extractor.transform_iter(alignment, ARGS.CHUNK_SIZE):
+        y = clf.predict(X)
+        # only the selected columns are ever densified
+        X_support = X[:, support]
+        if issparse(X_support):
+            X_support = X_support.toarray()
+        for x_support, y_ in zip(X_support, y):
+            id = next(ids)
+            if i > 0:
+                print(',')
+            i += 1
+            features = ['[ ']
+            for j, x in enumerate(x_support):
+                if x:
+                    features.append(labels[j])
+                    features.append(', ')
+                else:
+                    features.append(emptys[j])
+            features.append(' ]')
+            # replace the last comma with a space
+            idx = None
+            for k, f in enumerate(features):
+                if f == ', ':
+                    idx = k
+            if idx is None:
+                features[0] = features[0].rstrip()
+                features[-1] = features[-1].lstrip()
             else:
-                features.append(emptys[j])
-        features.append(' ]')
-        # replace the last comma with a space
-        idx = None
-        for k, f in enumerate(features):
-            if f == ', ':
-                idx = k
-        if idx is None:
-            features[0] = features[0].rstrip()
-            features[-1] = features[-1].lstrip()
-        else:
-            features[idx] = ''
-        features_ = ''.join(features)
-        print(
-            '    {{{{ "id": {{0:<{0:d}s}} "value": {{1: d}}, "features": {{2:s}} }}}}'.format(
-                idlen).format('"{0:s}",'.format(r.id), y[i], features_),
-            file=ARGS.OUTPUT, end='')
+                features[idx] = ''
+            features_ = ''.join(features)
+            print(
+                '    {{{{ "id": {{0:<{0:d}s}} "value": {{1: d}}, "features": {{2:s}} }}}}'.format(
+                    idlen).format('"{0:s}",'.format(id), y_, features_),
+                file=ARGS.OUTPUT, end='')
     print('\n  ]\n}', file=ARGS.OUTPUT)
 
     finalize_args(ARGS)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# sto2msa.py :: converts a stockholm multiple sequence alignment file to the
+# memory-mapped binary alignment format.
+#
+# Copyright (C) 2011 N Lance Hepler <nlhepler@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+from __future__ import division, print_function
+
+from argparse import ArgumentParser
+from sys import argv, exit
+
+from Bio import AlignIO
+
+from idepi.argument import PathType
+from idepi.labeledmsa import ArrayMSA
+from idepi.util import reference_index, stockholm_rf_ranges, trim_msa_to_ranges
+
+
+def main(args=None):
+
+    if args is None:
+        args = argv[1:]
+
+    parser = ArgumentParser(description='convert stockholm file to a binary alignment')
+    parser.add_argument('STOCKHOLMFILE', type=PathType)
+    parser.add_argument('OUTPUT')
+    parser.add_argument('--refid', dest='REFID', default=None,
+                        help='id of the reference sequence labeling the columns [first sequence]')
+    parser.add_argument('--trim', action='store_true', dest='TRIM',
+                        help='keep only the #=GC RF columns, as learn and discrete do')
+    ns = parser.parse_args(args)
+
+    with open(ns.STOCKHOLMFILE) as fh:
+        msa = AlignIO.read(fh, 'stockholm')
+
+    if ns.REFID is None:
+        refidx = 0
+    else:
+        refidx = reference_index(msa, lambda record: record.id == ns.REFID)
+
+    msa = ArrayMSA.from_msa_with_ref(msa, refidx)
+
+    if ns.TRIM:
+        msa = trim_msa_to_ranges(msa, stockholm_rf_ranges(ns.STOCKHOLMFILE))
+
+    msa.save(ns.OUTPUT)
+
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -15,6 +15,9 @@ class SimulatedEpitope:
         self.positions = positions
         self.names = position_names
         self.alphabet = alphabet
+        # the epitope's columns and the codes of its letters, to compare at once
+        self.__columns = list(positions.keys())
+        self.__targets = alphabet.encode_array(''.join(positions[k] for k in self.__columns))
         # default to a uniform linear kernel
         if kernel_func is None:
             self.kernel_func = lambda x, n: clamp(1. * x / len(positions) + n)
@@ -23,13 +26,10 @@ class SimulatedEpitope:
         return '\n'.join(sorted(self.names, key = lambda x: int(sub(r'[a-zA-Z\[\]]+', '', x))))
 
     def evaluate(self, seq, noise=0., proportion=-1):
-        total = 0
         # sanitize the sequence, so that it fits in our alphabet
         seq = sanitize_seq(seq, self.alphabet)
-        alphdict = self.alphabet.todict()
-        for k, v in self.positions.items():
-            if alphdict[seq[k]] == alphdict[v]:
-                total += 1
+        codes = self.alphabet.encode_array(seq)
+        total = int((codes[self.__columns] == self.__targets).sum())
         # this thing should now produce 50/50 splits no matter what
         # if the positions are more mutated than the base rate, then 25 (resistant)
         # else 1 (susceptible)
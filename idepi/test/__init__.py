@@ -1,5 +1,43 @@
 
+from ._arraymsa import *
+from ._bitmatrix import *
+from ._datasource import *
 from ._discrete import *
+from ._encodedmsa import *
+from ._encoder import *
+from ._featurenames import *
+from ._featureunion import *
+from ._filters import *
+from ._labeler import *
+from ._metadata import *
+from ._motif import *
+from ._multimotifvectorizer import *
+from ._pairwisesitevectorizer import *
+from ._partialfit import *
 from ._regressor import *
+from ._siteinteractionvectorizer import *
+from ._sitevectorizer import *
+from ._sparse import *
 
-__all__ = [] + _discrete.__all__ + _regressor.__all__
+__all__ = (
+    []
+    + _arraymsa.__all__
+    + _bitmatrix.__all__
+    + _datasource.__all__
+    + _discrete.__all__
+    + _encodedmsa.__all__
+    + _encoder.__all__
+    + _featurenames.__all__
+    + _featureunion.__all__
+    + _filters.__all__
+    + _labeler.__all__
+    + _metadata.__all__
+    + _motif.__all__
+    + _multimotifvectorizer.__all__
+    + _pairwisesitevectorizer.__all__
+    + _partialfit.__all__
+    + _regressor.__all__
+    + _siteinteractionvectorizer.__all__
+    + _sitevectorizer.__all__
+    + _sparse.__all__
+    )
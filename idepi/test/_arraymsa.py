@@ -0,0 +1,223 @@
+
+from __future__ import division, print_function
+
+from os import close, remove
+from os.path import exists
+from tempfile import mkstemp
+
+import numpy as np
+
+from six import StringIO
+
+from Bio import AlignIO
+
+from idepi.constants import AminoAlphabet
+from idepi.labeledmsa import ArrayMSA, LabeledMSA
+from idepi.util import load_alignment, load_stockholm, save_alignment, stockholm_rf_ranges
+
+from ._common import TEST_AMINO_STO
+
+
+__all__ = ['test_array_msa', 'test_binary_alignment', 'test_stockholm_alignment']
+
+
+# hmmalign's single-block output, with insert columns in lowercase and dots
+_PFAM_STO = """\
+# STOCKHOLM 1.0
+
+#=GS seq2/1-9 DE the second sequence
+seq1         AC.DEfgHK-
+seq2/1-9     ACwDE..HKL
+seq3         -C.DEf.H-L
+#=GC RF      xx.xx..xxx
+//
+"""
+
+
+def _alignment():
+    msa = AlignIO.read(StringIO(TEST_AMINO_STO), 'stockholm')
+    refidx = [record.id for record in msa].index('HXB2_env')
+    msa = ArrayMSA.from_msa_with_ref(msa, refidx)
+    return ArrayMSA(
+        msa.data,
+        list(msa.ids),
+        list(msa.descriptions),
+        list(msa.labels),
+        list(msa.positions),
+        AminoAlphabet
+        )
+
+
+def _assert_same_alignment(msa, msa_):
+    assert(msa.data.shape == msa_.data.shape)
+    assert(np.all(np.asarray(msa.data) == np.asarray(msa_.data)))
+    assert(list(msa.ids) == list(msa_.ids))
+    assert(list(msa.descriptions) == list(msa_.descriptions))
+    assert(list(msa.labels) == list(msa_.labels))
+    assert(list(msa.positions) == list(msa_.positions))
+    assert(str(msa._alphabet) == str(msa_._alphabet))
+    assert([str(r.seq) for r in msa] == [str(r.seq) for r in msa_])
+
+
+def test_array_msa():
+    msa = _alignment()
+
+    lmsa = AlignIO.read(StringIO(TEST_AMINO_STO), 'stockholm')
+    refidx = [record.id for record in lmsa].index('HXB2_env')
+    lmsa = LabeledMSA.from_msa_with_ref(lmsa, refidx)
+
+    nrow, ncol = len(msa), msa.get_alignment_length()
+    seqs = [str(record.seq) for record in lmsa]
+
+    # the matrix holds the same letters, labels and positions as a LabeledMSA
+    assert(nrow == len(lmsa) and ncol == lmsa.get_alignment_length())
+    assert([str(record.seq) for record in msa] == seqs)
+    assert(list(msa.ids) == [record.id for record in lmsa])
+    assert(list(msa.labels) == list(lmsa.labels))
+    assert(list(msa.positions) == list(lmsa.positions))
+
+    # rows are SeqRecords, columns are strings read straight from the matrix
+    assert(str(msa[1].seq) == seqs[1] and msa[1].id == list(msa.ids)[1])
+    for j in range(ncol):
+        assert(msa[:, j] == ''.join(seq[j] for seq in seqs))
+        assert(msa[1:3, j] == ''.join(seq[j] for seq in seqs[1:3]))
+        assert(msa[-1, j] == seqs[-1][j])
+
+    # slices are views of the matrix, with their labels and positions
+    msa_ = msa[1:3, 2:5]
+    assert(np.shares_memory(msa_.data, msa.data))
+    assert([str(record.seq) for record in msa_] == [seq[2:5] for seq in seqs[1:3]])
+    assert(list(msa_.labels) == list(msa.labels)[2:5])
+    assert(list(msa_.positions) == list(msa.positions)[2:5])
+    assert(len(msa[:2]) == 2 and msa[:2].get_alignment_length() == ncol)
+    try:
+        msa[0, 1, 2]
+        assert(False)
+    except TypeError:
+        pass
+
+    # adding joins columns, take copies rows
+    msa_ = msa[:, :3] + msa[:, 3:]
+    assert(np.all(msa_.data == msa.data))
+    assert(list(msa_.labels) == list(msa.labels))
+    msa_ = msa.take([2, 0])
+    assert(not np.shares_memory(msa_.data, msa.data))
+    assert([str(record.seq) for record in msa_] == [seqs[2], seqs[0]])
+    assert(list(msa_.ids) == [list(msa.ids)[i] for i in (2, 0)])
+    try:
+        msa + msa[:1]
+        assert(False)
+    except ValueError:
+        pass
+
+    # appending grows the matrix and its metadata, leaving views alone
+    msa_ = msa[:2]
+    assert(len(msa_.metadata) == 2)
+    msa_.append(msa[3])
+    assert(len(msa_) == 3 and len(msa_.metadata) == 3)
+    assert([str(record.seq) for record in msa_] == seqs[:2] + seqs[3:])
+    assert(len(msa) == nrow)
+    try:
+        msa_.append(next(iter(msa[:, 1:])))
+        assert(False)
+    except ValueError:
+        pass
+
+    # and nothing is lost converting back to a LabeledMSA
+    lmsa_ = msa.to_msa()
+    assert(isinstance(lmsa_, LabeledMSA))
+    assert([str(record.seq) for record in lmsa_] == seqs)
+    assert(list(lmsa_.labels) == list(msa.labels))
+    _assert_same_alignment(msa, ArrayMSA.from_msa(lmsa_))
+    assert(ArrayMSA.from_msa(msa) is msa)
+
+
+def test_binary_alignment():
+    msa = _alignment()
+
+    fd, filename = mkstemp(suffix='.msa'); close(fd)
+
+    try:
+        # saving and loading, mapped or read, loses nothing
+        msa.save(filename, fingerprint='abc')
+        for mmap in (True, False):
+            _assert_same_alignment(msa, ArrayMSA.load(filename, mmap=mmap))
+        assert(ArrayMSA.fingerprint(filename) == 'abc')
+
+        # and neither does a column slice of rows, nor an empty alignment
+        msa_ = msa[1:3, 2:5]
+        msa_.save(filename)
+        _assert_same_alignment(msa_, ArrayMSA.load(filename))
+        assert(ArrayMSA.fingerprint(filename) is None)
+
+        msa_ = msa[:0]
+        msa_.save(filename)
+        _assert_same_alignment(msa_, ArrayMSA.load(filename))
+
+        # only an alignment saved with the same fingerprint is reused
+        save_alignment(msa, filename, 'abc')
+        assert(load_alignment(filename, 'xyz') is None)
+        _assert_same_alignment(msa, load_alignment(filename, 'abc'))
+
+        # replacing the file leaves maps of the earlier one intact
+        mapped = ArrayMSA.load(filename)
+        msa[:1].save(filename)
+        _assert_same_alignment(msa, mapped)
+
+        # other files are not binary alignments, and are never reused
+        with open(filename, 'w') as fh:
+            fh.write(TEST_AMINO_STO)
+        assert(load_alignment(filename, 'abc') is None)
+        try:
+            ArrayMSA.load(filename)
+            assert(False)
+        except ValueError:
+            pass
+
+        # unwritable binary alignments are simply not written
+        save_alignment(msa, '/nonexistent/directory/alignment.msa', 'abc')
+
+    finally:
+        if exists(filename):
+            remove(filename)
+
+
+def test_stockholm_alignment():
+    fd, sto_filename = mkstemp(suffix='.sto'); close(fd)
+    fd, filename = mkstemp(suffix='.msa'); close(fd)
+
+    try:
+        with open(sto_filename, 'w') as fh:
+            fh.write(_PFAM_STO)
+        ranges = stockholm_rf_ranges(sto_filename)
+
+        # converting line by line reads what parsing the whole alignment does
+        msa = load_stockholm(sto_filename, trim=True)
+        for ranges_ in (ranges, None):
+            ArrayMSA.save_stockholm(sto_filename, filename, ranges_, fingerprint='abc')
+            msa_ = ArrayMSA.load(filename)
+            assert(ArrayMSA.fingerprint(filename) == 'abc')
+            assert(list(msa_.ids) == ['seq1', 'seq2/1-9', 'seq3'])
+            assert(list(msa_.descriptions) == ['seq1', 'the second sequence', 'seq3'])
+            if ranges_ is None:
+                assert([str(r.seq) for r in msa_] == ['AC-DEfgHK-', 'ACwDE--HKL', '-C-DEf-H-L'])
+            else:
+                assert([str(r.seq) for r in msa_] == [str(r.seq) for r in msa])
+                assert([str(r.seq) for r in msa_] == ['ACDEHK-', 'ACDEHKL', '-CDEH-L'])
+            ncol = msa_.get_alignment_length()
+            assert(list(msa_.labels) == [str(i) for i in range(1, ncol + 1)])
+            assert(list(msa_.positions) == list(range(1, ncol + 1)))
+
+        # interleaved alignments cannot be converted a row at a time
+        with open(sto_filename, 'w') as fh:
+            fh.write(_PFAM_STO.replace('//\n', 'seq1  ACD\nseq2/1-9  ACD\nseq3  ACD\n//\n'))
+        try:
+            ArrayMSA.save_stockholm(sto_filename, filename)
+            assert(False)
+        except ValueError:
+            pass
+
+    finally:
+        for filename_ in (sto_filename, filename):
+            if exists(filename_):
+                remove(filename_)
@@ -0,0 +1,115 @@
+
+from __future__ import division, print_function
+
+import numpy as np
+
+from scipy.sparse import csr_matrix
+
+from sklearn.metrics import mutual_info_score
+from sklearn.model_selection import KFold, cross_val_score
+from sklearn.naive_bayes import BernoulliNB
+
+from idepi.feature_extraction import BitMatrix, FeatureUnion, SiteVectorizer
+from idepi.encoder import AminoEncoder
+
+from ._arraymsa import _alignment
+
+
+__all__ = ['test_bitmatrix', 'test_bitmatrix_rows', 'test_bitmatrix_mi']
+
+
+def test_bitmatrix():
+    # more samples than fit in one word, and a feature present in none
+    rng = np.random.RandomState(0)
+    X = (rng.rand(150, 7) < 0.3).astype(int)
+    X[:, 3] = 0
+
+    for X_ in (X, csr_matrix(X)):
+        B = BitMatrix.from_array(X_)
+        assert(B.shape == X.shape)
+        assert(B.words.shape == (7, 3))
+        assert(np.all(B.toarray() == X))
+        assert(np.all(B.tocsr().toarray() == X))
+        assert(np.all(B.counts() == X.sum(axis=0)))
+
+    rows, cols = X.nonzero()
+    B = BitMatrix.from_indices(rows, cols, X.shape)
+    assert(np.all(B.toarray() == X))
+
+    # duplicate coordinates set a bit once
+    B = BitMatrix.from_indices([1, 1, 70], [0, 0, 0], (71, 1))
+    assert(B.counts().tolist() == [2])
+
+    B = BitMatrix.from_array(np.zeros((0, 2), dtype=int))
+    assert(B.shape == (0, 2) and B.toarray().shape == (0, 2))
+
+    try:
+        BitMatrix(np.zeros((2, 1)), 65)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('mismatched words must raise a ValueError')
+
+
+def test_bitmatrix_rows():
+    rng = np.random.RandomState(1)
+    X = (rng.rand(150, 9) < 0.4).astype(int)
+    B = BitMatrix.from_array(X)
+
+    # rows are selected as an array's would be, by index, slice or mask
+    for idxs in ([149, 0, 64, 63, 64], slice(3, 140, 7), slice(None, None, -1), X[:, 0] == 1, []):
+        assert(np.all(B[idxs].toarray() == X[idxs]))
+        assert(np.all(B.take(idxs).toarray() == X[idxs]))
+    assert(np.all(B[10:80, [1, 4]].toarray() == X[10:80, [1, 4]]))
+    assert(np.all(B[:, 2:5].toarray() == X[:, 2:5]))
+    assert(np.all(B.take([8, 0], axis=1).toarray() == X[:, [8, 0]]))
+    assert(np.all(np.asarray(B) == X))
+
+    # stacking blocks of samples that straddle words, and of features
+    blocks = [B[:3], B[3:3], B[3:70], B[70:128], B[128:]]
+    assert(np.all(BitMatrix.vstack(blocks).toarray() == X))
+    assert(np.all(BitMatrix.hstack([B[:, :4], B[:, 4:]]).toarray() == X))
+
+    # so a bit-packed union survives cross-validation unchanged
+    msa = _alignment()
+    union = FeatureUnion([('site', SiteVectorizer(AminoEncoder))], packed=True)
+    P = union.fit_transform(msa)
+    assert(isinstance(P, BitMatrix))
+    X_ = FeatureUnion([('site', SiteVectorizer(AminoEncoder))]).fit_transform(msa)
+    assert(np.all(P.toarray() == X_))
+    assert(np.all(union.transform(msa[1:3]).toarray() == X_[1:3]))
+    assert(np.all(np.vstack([P_.toarray() for P_ in union.transform_iter(msa, 3)]) == X_))
+
+    y = (rng.rand(150) < 0.5).astype(int)
+    y[:2] = [0, 1]
+    folds = KFold(3)
+    assert(np.allclose(
+        cross_val_score(BernoulliNB(), B, y, cv=folds),
+        cross_val_score(BernoulliNB(), X, y, cv=folds)
+        ))
+
+
+def test_bitmatrix_mi():
+    rng = np.random.RandomState(2)
+    X = (rng.rand(200, 12) < 0.3).astype(int)
+    X[:, 5] = 0
+    X[:, 6] = X[:, 7]
+    y = rng.randint(0, 3, size=200)
+    B = BitMatrix.from_array(X)
+
+    # relevance and redundancy, all features at once, as per-feature
+    # contingency tables give them
+    relevance = B.mutual_information(y)
+    assert(np.allclose(relevance, [mutual_info_score(x, y) for x in X.T]))
+    for j in (0, 5, 6):
+        assert(np.allclose(B.redundancy(j), [mutual_info_score(x, X[:, j]) for x in X.T]))
+    assert(np.allclose(B.redundancy(6)[7], mutual_info_score(X[:, 7], X[:, 7])))
+
+    assert(np.all(B.joint_counts(B.pack_samples(y == 1)) == X[y == 1].sum(axis=0)))
+    assert(BitMatrix.from_array(X[:0]).mutual_information(y[:0]).tolist() == [0.0] * 12)
+    try:
+        B.mutual_information(y[:10])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('mismatched labels must raise a ValueError')
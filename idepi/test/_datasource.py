@@ -0,0 +1,193 @@
+
+from __future__ import division, print_function
+
+from os import close, environ, remove
+from os.path import dirname, join
+from shutil import copyfile, rmtree
+from sqlite3 import OperationalError, connect
+from tempfile import mkdtemp, mkstemp
+
+from idepi.datasource import OrfCache, Sqlite3Db
+
+
+__all__ = ['test_orfcache', 'test_optimize', 'test_connection', 'test_panel']
+
+
+_DB = join(dirname(dirname(__file__)), 'data', 'allneuts.sqlite3')
+
+
+def _records(db, antibodies):
+    # group_concat leaves the order of repeated measurements unspecified
+    seqrecords, _, antibodies_, _ = db.seqrecords(antibodies)
+    return [
+        (r.id, str(r.seq), r.annotations['subtype'], sorted((k, sorted(v)) for k, v in r.annotations['antibody'].items()))
+        for r in seqrecords
+        ], antibodies_
+
+
+def test_connection():
+    tmpdir = mkdtemp()
+    try:
+        filename = join(tmpdir, 'allneuts.sqlite3')
+        copyfile(_DB, filename)
+
+        db = Sqlite3Db(filename, orfcache=False)
+        antibodies = db.antibodies
+        assert('PG9' in antibodies and 'XYZ' not in antibodies)
+
+        # the database is opened read-only
+        try:
+            db._Sqlite3Db__connection().execute("insert into ANTIBODY values ('XYZ', NULL)")
+            assert(False)
+        except OperationalError:
+            pass
+
+        # metadata queries are memoized, so other writers go unseen
+        conn = connect(filename)
+        conn.execute("insert into ANTIBODY values ('XYZ', NULL)")
+        conn.commit()
+        conn.close()
+        assert(db.antibodies == antibodies)
+
+        # until the database is closed, which forgets them
+        db.close()
+        assert(db._Sqlite3Db__conn is None)
+        assert('XYZ' in db.antibodies)
+        db.close()
+    finally:
+        rmtree(tmpdir)
+
+
+def test_optimize():
+    tmpdir = mkdtemp()
+    try:
+        filename = join(tmpdir, 'allneuts.sqlite3')
+        copyfile(_DB, filename)
+
+        db = Sqlite3Db(filename, orfcache=False)
+        assert(not db.optimized)
+        before = _records(db, ['PG9'])
+        db.close()
+
+        Sqlite3Db.optimize(filename)
+        db = Sqlite3Db(filename, orfcache=False)
+        assert(db.optimized)
+        assert(_records(db, ['PG9']) == before)
+        db.close()
+
+        # an update in place changes neither the counts nor the keys
+        conn = connect(filename)
+        conn.execute(
+            "update NEUT set VALUE = '0.001' where NEUT_NO = (select min(NEUT_NO) from NEUT where ANTIBODY = 'PG9')"
+            )
+        conn.commit()
+        conn.close()
+
+        db = Sqlite3Db(filename, orfcache=False)
+        assert(not db.optimized)
+        after = _records(db, ['PG9'])
+        assert(after != before)
+        db.close()
+
+        Sqlite3Db.optimize(filename)
+        db = Sqlite3Db(filename, orfcache=False)
+        assert(db.optimized)
+        assert(_records(db, ['PG9']) == after)
+        db.close()
+    finally:
+        rmtree(tmpdir)
+
+
+def test_orfcache():
+    tmpdir = mkdtemp()
+    try:
+        filename = join(tmpdir, 'cache', 'orfs.sqlite3')
+        seqs = ['ATGAAATAG', 'ATGCCCTAG']
+
+        # the cache directory is created on first use
+        cache = OrfCache(filename, include_stops=False)
+        assert(cache.orfs([]) == [])
+        cache.close()
+
+        # entries are found by key, so these never reach OrfList
+        conn = connect(filename)
+        conn.executemany(
+            'insert into ORF values (?, ?, ?, ?)',
+            [(cache.key(seqs[0]), 'MK', 0, 1), (cache.key(seqs[1]), 'ATGCCC', 1, 1)]
+            )
+        conn.commit()
+        conn.close()
+
+        cache = OrfCache(filename, include_stops=False)
+        assert(cache.orfs(seqs + seqs[:1]) == [
+            ('MK', False, True),
+            ('ATGCCC', True, True),
+            ('MK', False, True)
+            ])
+        cache.close()
+
+        # the parameters are part of the key
+        assert(OrfCache(filename).key(seqs[0]) != cache.key(seqs[0]))
+
+        # a cache that cannot be created lasts only as long as the object
+        fd, blocker = mkstemp(dir=tmpdir)
+        close(fd)
+        cache = OrfCache(join(blocker, 'orfs.sqlite3'))
+        assert(cache.orfs([]) == [])
+        cache.close()
+        remove(blocker)
+
+        # by default, ORFs are cached in the per-user cache directory
+        xdg = environ.get('XDG_CACHE_HOME')
+        environ['XDG_CACHE_HOME'] = tmpdir
+        try:
+            db = Sqlite3Db(join(tmpdir, 'data.sqlite3'))
+            assert(db._Sqlite3Db__orfs.filename == join(tmpdir, 'idepi', 'orfs.sqlite3'))
+            db.close()
+        finally:
+            if xdg is None:
+                del environ['XDG_CACHE_HOME']
+            else:
+                environ['XDG_CACHE_HOME'] = xdg
+    finally:
+        rmtree(tmpdir)
+
+
+def test_panel():
+    tmpdir = mkdtemp()
+    try:
+        filename = join(tmpdir, 'allneuts.sqlite3')
+        copyfile(_DB, filename)
+        antibodies = ['PG9', '2G12', 'PG9']
+
+        for optimize in (False, True):
+            if optimize:
+                Sqlite3Db.optimize(filename)
+            db = Sqlite3Db(filename, orfcache=False)
+            assert(db.optimized == optimize)
+
+            seqrecords, _, antibodies_, values = db.panel(antibodies)
+            assert(antibodies_ == ('PG9', '2G12'))
+            assert(values.antibodies == list(antibodies_))
+            assert(list(values.ids) == [r.id for r in seqrecords])
+            seqs = dict((r.id, str(r.seq)) for r in seqrecords)
+
+            # each column of the panel holds what seqrecords() reads for
+            # that antibody and its equivalents alone
+            for j, antibody in enumerate(antibodies_):
+                seqrecords_, _, _, _ = db.seqrecords([antibody])
+                table = values.metadata(antibody)
+                measured = values.mask()[:, j]
+                rows = dict(
+                    (id, sorted((k, sorted(v)) for k, v in table.row(i).items()))
+                    for i, id in enumerate(table.ids)
+                    if measured[i]
+                    )
+                assert(len(rows) == len(seqrecords_))
+                for r in seqrecords_:
+                    assert(rows[r.id] == sorted((k, sorted(v)) for k, v in r.annotations['antibody'].items()))
+                    assert(seqs[r.id] == str(r.seq))
+
+            db.close()
+    finally:
+        rmtree(tmpdir)
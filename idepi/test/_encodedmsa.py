@@ -0,0 +1,54 @@
+
+from __future__ import division, print_function
+
+import numpy as np
+
+from idepi.constants import GAPS
+from idepi.encoder import AminoEncoder, StanfelEncoder
+from idepi.feature_extraction import EncodedMSA
+
+from ._arraymsa import _alignment
+from ._sitevectorizer import _labeled_alignment
+
+
+__all__ = ['test_encoded_msa']
+
+
+def test_encoded_msa():
+    labeled = _labeled_alignment()
+    seqs = [str(record.seq) for record in labeled]
+
+    msa = EncodedMSA.of(labeled)
+    assert(EncodedMSA.of(msa) is msa)
+    assert(len(msa) == len(seqs) and msa.get_alignment_length() == len(seqs[0]))
+    assert(list(msa.labels) == list(labeled.labels))
+    assert([row.tobytes().decode('ascii') for row in msa.data] == seqs)
+
+    # an ArrayMSA shares its bytes rather than being parsed again
+    array_msa = _alignment()
+    assert(np.may_share_memory(EncodedMSA.of(array_msa).data, array_msa.data))
+
+    # everything derived is derived once, then shared
+    for encoder in (AminoEncoder, StanfelEncoder):
+        codes = msa.codes(encoder)
+        assert(msa.codes(encoder) is codes)
+        assert(codes.tolist() == [[encoder(c) for c in seq.upper()] for seq in seqs])
+    assert(msa.upper is msa.upper)
+    assert(msa.compacted() is msa.compacted())
+
+    ncol = msa.get_alignment_length()
+    for i in range(ncol):
+        column = ''.join(seq[i].upper() for seq in seqs)
+        assert(msa.column(i).upper() == column)
+        assert(all(msa.histogram[i, ord(c)] == column.count(c) for c in set(column)))
+    assert(msa.histogram.sum() == len(seqs) * ncol)
+
+    ungapped, cols = msa.ungapped()
+    for seq, seq_, cols_ in zip(seqs, ungapped, cols):
+        residues = [(i, c) for i, c in enumerate(seq) if c not in GAPS]
+        assert(seq_ == ''.join(c for _, c in residues))
+        assert(cols_ == [i for i, _ in residues])
+
+    # rows slice as views onto the same bytes
+    assert(np.may_share_memory(msa[1:3].data, msa.data))
+    assert(msa[1:3].codes(AminoEncoder).tolist() == msa.codes(AminoEncoder)[1:3].tolist())
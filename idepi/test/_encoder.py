@@ -0,0 +1,91 @@
+
+from __future__ import division, print_function
+
+from argparse import ArgumentTypeError
+
+import numpy as np
+
+from idepi.argument import EncoderType
+from idepi.encoder import (
+    AminoEncoder,
+    DNAEncoder,
+    IdentityEncoder,
+    ReducedEncoder,
+    StanfelEncoder,
+    substitution_matrix
+)
+
+
+__all__ = ['test_encode_array', 'test_reduced_encoder']
+
+
+_AMINOS = 'ACDEFGHIKLMNPQRSTVWY'
+
+
+def test_encode_array():
+    chars = ''.join(chr(b) for b in range(256))
+    data = np.arange(256, dtype=np.uint8)
+
+    for encoder in (AminoEncoder, DNAEncoder, StanfelEncoder, ReducedEncoder(6), IdentityEncoder('ACGTX-')):
+        # every byte encodes as calling the encoder on it would
+        codes = [encoder(c) for c in chars]
+        assert(encoder.table.tolist() == codes)
+        assert(encoder.encode_array(data).tolist() == codes)
+        assert(encoder.encode_array(data.view('S1')).tolist() == codes)
+        assert(encoder.encode_array(chars).tolist() == codes)
+        assert(encoder.encode_array(chars.encode('latin-1')).tolist() == codes)
+        # of any shape
+        assert(encoder.encode_array(data.reshape((16, 16))).tolist() == np.reshape(codes, (16, 16)).tolist())
+        # and beyond latin-1 as an unknown letter would
+        assert(encoder.encode_array(u'\u03b1').tolist() == [encoder('?')])
+
+    try:
+        AminoEncoder.encode_array(np.zeros((3,), dtype=int))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('an array of other than bytes must raise a ValueError')
+
+
+def _groups(encoder):
+    return [frozenset(c for c in _AMINOS if encoder(c) == g) for g in range(len(encoder) - 2)]
+
+
+def test_reduced_encoder():
+    letters, scores = substitution_matrix('blosum62')
+    assert(scores.shape == (len(letters), len(letters)) and (scores == scores.T).all())
+
+    finer = None
+    for ngroup in range(len(_AMINOS), 0, -1):
+        encoder = ReducedEncoder(ngroup)
+        assert(str(encoder) == 'blosum62-{0:d}'.format(ngroup))
+        assert(len(encoder) == ngroup + 2)
+        groups = _groups(encoder)
+        # the groups partition the amino acids, X and gaps keep their own
+        assert(all(groups) and sum(len(g) for g in groups) == len(_AMINOS))
+        assert(encoder('X') == ngroup and encoder('B') == ngroup)
+        assert(encoder('-') == encoder('.') == ngroup + 1)
+        assert(encoder.encode_array('Acx-.').tolist() == [encoder(c) for c in 'Acx-.'])
+        # merging clusters only ever joins the groups of a finer alphabet
+        if finer is not None:
+            assert(all(any(g <= g_ for g_ in groups) for g in finer))
+        finer = groups
+
+    # groups follow the order of the amino alphabet
+    assert(ReducedEncoder(len(_AMINOS)).tolist()[:4] == ['[A]', '[C]', '[G]', '[I]'])
+
+    for ngroup, matrix in ((0, 'blosum62'), (21, 'blosum62'), (4, 'nosuchmatrix')):
+        try:
+            ReducedEncoder(ngroup, matrix)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError('ReducedEncoder({0:d}, {1:s}) must raise a ValueError'.format(ngroup, matrix))
+
+    assert(str(EncoderType('blosum62-8')) == 'blosum62-8')
+    try:
+        EncoderType('blosum62-x')
+    except ArgumentTypeError:
+        pass
+    else:
+        raise AssertionError('an invalid encoding must raise an ArgumentTypeError')
@@ -0,0 +1,53 @@
+
+from __future__ import division, print_function
+
+from idepi.encoder import AminoEncoder
+from idepi.feature_extraction import FeatureNames, FeatureUnion, PairwiseSiteVectorizer, SiteVectorizer
+from idepi.feature_extraction._featurenames import feature_ids
+
+from ._arraymsa import _alignment
+
+
+__all__ = ['test_feature_names']
+
+
+def test_feature_names():
+    labels = ['1', '2', '2a']
+    sites = FeatureNames(feature_ids([0, 2], [1, 0]), ['{0:s}{1:s}'], labels, ['A', 'C'])
+    # a compound is rendered from its parts, and a hashed feature by its
+    # index until the pairs that collide in it are known
+    pairs = FeatureNames(
+        feature_ids([0, 1, 2], [0, -1, -1], [1, -1, -1], [1, -1, -1], [0, 1, 1]),
+        ['{0:s}{1:s}+{2:s}{3:s}', 'pair#{4:d}', '{0:s}{1:s}'],
+        labels,
+        ['G', 'T'],
+        collisions={2: feature_ids([0, 1], [1, 0], [2, 2], [0, 1])},
+        compounds={0: feature_ids([0, 1, 2], [0, 1, 0], kinds=2)}
+        )
+
+    assert(len(sites) == 2 and list(sites) == ['1C', '2aA'])
+    assert(list(pairs) == ['1G+2T+2aG', 'pair#1', '1T+2aG|2G+2aT'])
+    assert(pairs[-1] == pairs[2] and pairs[1:] == ['pair#1', '1T+2aG|2G+2aT'])
+
+    # each part keeps its own letters and formats, and the indices of
+    # its collisions and compounds move with it
+    names = FeatureNames.concatenate([sites, FeatureNames([], [], labels), pairs])
+    assert(list(names) == list(sites) + list(pairs))
+    assert(list(names.take([4, 0, 2])) == [pairs[2], sites[0], pairs[0]])
+    assert(len(names.take([])) == 0)
+    # taken names share their tables rather than copy them
+    assert(names.take([1]).column_labels is names.column_labels)
+    assert(names.take([1]).letters is names.letters)
+
+    try:
+        FeatureNames.concatenate([sites, FeatureNames(feature_ids([0]), ['{0:s}'], ['x'])])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('feature names over other columns must raise a ValueError')
+
+    # a union's names are those of its parts, in order
+    msa = _alignment()
+    site, pair = SiteVectorizer(AminoEncoder), PairwiseSiteVectorizer(AminoEncoder, radius=1)
+    union = FeatureUnion([('site', site), ('pair', pair)]).fit(msa)
+    assert(list(union.get_feature_names()) == list(site.get_feature_names()) + list(pair.get_feature_names()))
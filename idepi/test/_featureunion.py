@@ -0,0 +1,117 @@
+
+from __future__ import division, print_function
+
+import re
+
+from pickle import dumps, loads
+
+import numpy as np
+
+from scipy.sparse import vstack as sparse_vstack
+
+from idepi.encoder import AminoEncoder
+from idepi.feature_extraction import (
+    BitMatrix,
+    FeatureUnion,
+    MultiMotifVectorizer,
+    PairwiseSiteVectorizer,
+    SiteVectorizer
+)
+
+from ._arraymsa import _alignment
+from ._sitevectorizer import _labeled_alignment
+
+
+__all__ = ['test_parallel_union', 'test_deduplicate', 'test_transform_iter']
+
+
+def _union(**kwargs):
+    return FeatureUnion([
+        ('site', SiteVectorizer(AminoEncoder)),
+        ('site_pairs', PairwiseSiteVectorizer(AminoEncoder, radius=2)),
+        ('motifs', MultiMotifVectorizer([('FK', re.compile(r'[DFK][KHX]'), 2)], pairwise=True))
+        ], **kwargs)
+
+
+def test_parallel_union():
+    msa = _alignment()
+
+    serial = _union()
+    X = serial.fit_transform(msa)
+    names = list(serial.get_feature_names())
+
+    parallel = _union(n_jobs=2)
+    try:
+        assert(np.all(parallel.fit_transform(msa) == X))
+        assert(list(parallel.get_feature_names()) == names)
+        assert(np.all(parallel.transform(msa) == X))
+        # the pool and its shared memory are kept for smaller alignments,
+        # whose bytes overwrite those of earlier ones
+        pool = parallel._FeatureUnion__pool
+        assert(np.all(parallel.transform(msa[1:3]) == X[1:3]))
+        assert(np.all(parallel.transform(msa) == X))
+        assert(parallel._FeatureUnion__pool is pool)
+        # the workers are not pickled, but the fitted transformers are
+        parallel_ = loads(dumps(parallel))
+    finally:
+        parallel.close()
+
+    try:
+        assert(parallel_.n_jobs == 2)
+        assert(np.all(parallel_.transform(msa) == X))
+        assert(list(parallel_.get_feature_names()) == names)
+    finally:
+        parallel_.close()
+
+
+def test_deduplicate():
+    msa = _alignment()
+
+    full = _union()
+    X = full.fit_transform(msa)
+    names = list(full.get_feature_names())
+    assert(full.get_feature_groups() is None)
+
+    dedup = _union(deduplicate=True)
+    X_ = dedup.fit_transform(msa)
+    keep = dedup.support_.nonzero()[0]
+    assert(len(keep) < X.shape[1])
+    assert(np.all(X_ == X[:, keep]))
+    assert(np.all(dedup.transform(msa) == X_))
+    assert(list(dedup.get_feature_names()) == [names[i] for i in keep])
+
+    # the groups partition the features, each led by its kept feature,
+    # and no two kept features are identical
+    groups = dedup.groups_
+    assert(sorted(i for group in groups for i in group) == list(range(X.shape[1])))
+    for i, group in zip(keep, groups):
+        assert(group[0] == i)
+        assert(np.all(X[:, group] == X[:, [i]]))
+    assert(len(set(tuple(col) for col in X_.T.tolist())) == X_.shape[1])
+    assert([list(g) for g in dedup.get_feature_groups()] == [[names[i] for i in group] for group in groups])
+
+
+def test_transform_iter():
+    for msa in (_alignment(), _labeled_alignment()):
+        for union in (
+                _union(),
+                _union(deduplicate=True),
+                _union(sparse=True),
+                _union(packed=True, deduplicate=True)):
+            X = union.fit_transform(msa)
+            for chunk_size in (1, 3, len(msa), 1024):
+                blocks = list(union.transform_iter(msa, chunk_size))
+                assert(len(blocks) == -(-len(msa) // chunk_size))
+                if union.packed:
+                    assert(np.all(BitMatrix.vstack(blocks).toarray() == X.toarray()))
+                elif union.sparse:
+                    assert(np.all(sparse_vstack(blocks).toarray() == X.toarray()))
+                else:
+                    assert(np.all(np.vstack(blocks) == X))
+
+    try:
+        list(union.transform_iter(msa, 0))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('a chunk_size of 0 must raise a ValueError')
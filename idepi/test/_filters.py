@@ -0,0 +1,35 @@
+
+from __future__ import division, print_function
+
+import numpy as np
+
+from idepi.encoder import AminoEncoder
+from idepi.feature_extraction import EncodedMSA, SiteVectorizer
+from idepi.filters import naive_filter, null_filter
+
+from ._arraymsa import _alignment
+
+
+__all__ = ['test_column_filters']
+
+
+def test_column_filters():
+    msa = _alignment()
+
+    for filter in [null_filter] + [
+            naive_filter(*params)
+            for params in ((1., 1., 1.), (0.9, 0.9, 0.2), (0.8, 0.3, 0.5), (0.5, 0.5, 0.), (0.7, 0.7, 0.25))]:
+        # the same filter without columns() is evaluated column by column
+        def per_column(column):
+            return filter(column)
+
+        vectorized, fallback = EncodedMSA.of(msa), EncodedMSA.of(msa)
+        assert(np.all(vectorized.allowed(filter) == fallback.allowed(per_column)))
+        assert(
+            [sorted(ltrs) for ltrs in vectorized.letters(filter)] ==
+            [sorted(ltrs) for ltrs in fallback.letters(per_column)]
+            )
+
+        X = SiteVectorizer(AminoEncoder, filter).fit_transform(msa)
+        X_ = SiteVectorizer(AminoEncoder, per_column).fit_transform(msa)
+        assert(np.all(X == X_))
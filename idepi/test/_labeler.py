@@ -0,0 +1,122 @@
+
+from __future__ import division, print_function
+
+from functools import partial
+from json import dumps as json_dumps, loads as json_loads
+from random import Random
+
+import numpy as np
+
+from Bio.Align import MultipleSeqAlignment
+from Bio.Seq import Seq
+from Bio.SeqRecord import SeqRecord
+
+from idepi.labeledmsa import ArrayMSA, LabeledMSA, MetadataTable
+from idepi.labeler import Labeler, LabelExpression, Skipper, expression, skipper
+
+
+__all__ = ['test_label_expression', 'test_labeler']
+
+
+# expressions that vectorize, that short-circuit on missing labels,
+# and that only evaluate record by record
+_EXPRESSIONS = [
+    'max(IC50) > 20',
+    'min(IC50)',
+    'mean(IC50) <= 10',
+    '10 < max(IC50) < 30',
+    'not max(IC50) > 20',
+    'max(IC50) > 20 and min(IC80) < 10',
+    'max(IC50) > 20 or mean(IC80) > 40',
+    '1 if max(IC50) > 25 else 0',
+    'len(IC50)',
+    'sum(IC50) / len(IC50)',
+    'max(IC80) / (1 + min(IC50))',
+    'IC50[0] > 20',
+    'sorted(IC50)[0]',
+    'max(IC50 + [30])',
+    'NOPE > 2',
+    '3',
+    ]
+
+
+def _records(n=120, seed=5):
+    rnd = Random(seed)
+    records = []
+    for i in range(n):
+        values = {}
+        if rnd.random() < 0.9:
+            values['IC50'] = [round(rnd.uniform(0, 50), 2) for _ in range(rnd.randint(1, 4))]
+        if rnd.random() < 0.6:
+            values['IC80'] = [round(rnd.uniform(0, 50), 2) for _ in range(rnd.randint(1, 3))]
+        records.append(SeqRecord(
+            Seq(''.join(rnd.choice('ACGT-') for _ in range(12))),
+            id='s{0:d}'.format(i),
+            description=json_dumps({'subtype': rnd.choice('ABC'), 'values': values})
+            ))
+    # a reference, without any JSON description
+    records[7].description = 'reference'
+    return records
+
+
+def _values(record):
+    try:
+        return json_loads(record.description)['values']
+    except ValueError:
+        return {}
+
+
+def test_label_expression():
+    records = _records()
+    table = MetadataTable.from_records(records)
+
+    # every record is labeled as it would be alone, or not at all
+    for label in _EXPRESSIONS:
+        le = LabelExpression(label)
+        y, valid = le.evaluate(table)
+        assert(len(y) == len(valid) == len(records))
+        for i, record in enumerate(records):
+            y_ = le.evaluate_one(_values(record))
+            if y_ is None:
+                assert(not valid[i])
+            else:
+                assert(valid[i])
+                assert(abs(float(y[i]) - float(y_)) < 1e-9)
+
+    # and so is every row of a slice of the table
+    le = LabelExpression('max(IC50) > 20 and min(IC80) < 10')
+    y, valid = le.evaluate(table)
+    y_, valid_ = le.evaluate(table[10:30])
+    assert(np.all(valid_ == valid[10:30]))
+    assert(np.all(y_[valid_] == y[10:30][valid[10:30]]))
+
+    assert(LabelExpression.of('min(IC50)') is LabelExpression.of('min(IC50)'))
+
+
+def test_labeler():
+    records = _records()
+    is_refseq = lambda record: record.id == 's7'
+
+    msa = LabeledMSA(MultipleSeqAlignment(records), ['c{0:d}'.format(i) for i in range(12)], list(range(12)))
+    amsa = ArrayMSA.from_msa(msa)
+
+    # labeling all records at once keeps and labels those labeled one by one
+    for label in ('max(IC50) > 20', 'mean(IC50)', 'IC50[0] > 20'):
+        for subtypes in ([], ['A', 'C']):
+            msa_, y, _ = Labeler(
+                partial(expression, label),
+                partial(skipper, is_refseq, subtypes)
+                )(msa)
+            for alignment, skip in (
+                    (amsa, Skipper(is_refseq, subtypes)),
+                    (msa, Skipper(is_refseq, subtypes)),
+                    (msa, partial(skipper, is_refseq, subtypes))
+                    ):
+                alignment_, y_, _ = Labeler(label, skip)(alignment)
+                assert([r.id for r in alignment_] == [r.id for r in msa_])
+                assert(y_.dtype == y.dtype)
+                assert(np.allclose(y_, y))
+            # neither the reference nor other subtypes are ever labeled
+            assert('s7' not in [r.id for r in msa_])
+            if subtypes:
+                assert(all(json_loads(r.description)['subtype'] in subtypes for r in msa_))
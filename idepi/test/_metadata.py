@@ -0,0 +1,168 @@
+
+from __future__ import division, print_function
+
+from json import dumps as json_dumps
+
+import numpy as np
+
+from Bio.Align import MultipleSeqAlignment
+from Bio.Seq import Seq
+from Bio.SeqRecord import SeqRecord
+
+from idepi.labeledmsa import ArrayMSA, LabeledMSA, MetadataTable, ValueMatrix
+
+
+__all__ = ['test_metadata_table', 'test_value_matrix']
+
+
+_IDS = ['a', 'b', 'c', 'd', 'e']
+_SUBTYPES = ['A', 'B', None, 'C', 'A']
+_ROWS = [
+    {'IC50': [1.0, 2.0], 'IC80': [5.0]},
+    {'IC50': [3.0]},
+    {},
+    {'IC80': [7.0, 8.0, 9.0]},
+    {'IC50': [0.0, 4.0, 6.0], 'IC80': [2.0]},
+    ]
+
+# the values of each sequence, by antibody, as a panel reads them
+_PANEL = ['VRC01', 'PG9', 'b12']
+_PANEL_ROWS = [
+    {'VRC01': {'IC50': [1.0, 2.0]}, 'b12': {'IC50': [0.0], 'IC80': [5.0]}},
+    {},
+    {'PG9': {'IC50': [3.0, 4.0]}},
+    {'VRC01': {'IC80': [7.0]}, 'PG9': {'IC50': [6.0]}, 'b12': {'IC50': [8.0, 9.0]}},
+    ]
+
+
+def _records():
+    descriptions = [
+        json_dumps({'subtype': subtype, 'values': row}) if subtype is not None else 'reference'
+        for subtype, row in zip(_SUBTYPES, _ROWS)
+        ]
+    return [
+        SeqRecord(Seq(seq), id=id, description=description)
+        for id, seq, description in zip(_IDS, ['ACGT', 'AC-T', 'ACGA', 'TCGT', 'A-GT'], descriptions)
+        ]
+
+
+def _assert_rows(table, idxs):
+    assert(list(table.ids) == [_IDS[i] for i in idxs])
+    assert(list(table.subtypes) == [_SUBTYPES[i] for i in idxs])
+    assert([table.row(i) for i in range(len(table))] == [_ROWS[i] for i in idxs])
+
+
+def test_metadata_table():
+    table = MetadataTable.from_rows(_IDS, _SUBTYPES, _ROWS)
+
+    # every row reads back as it was given, from flat values and offsets
+    assert(len(table) == 5)
+    assert(table.names == ['IC50', 'IC80'])
+    assert('IC50' in table and 'IC90' not in table)
+    _assert_rows(table, range(5))
+    values, offsets = table.ragged('IC50')
+    assert(list(values) == [1.0, 2.0, 3.0, 0.0, 4.0, 6.0])
+    assert(list(offsets) == [0, 2, 3, 3, 3, 6])
+
+    # parsing the descriptions gives the same table, with no values for
+    # those that are not JSON
+    table_ = MetadataTable.from_records(_records())
+    assert(list(table_.subtypes) == _SUBTYPES)
+    assert([table_.row(i) for i in range(5)] == [row if i != 2 else {} for i, row in enumerate(_ROWS)])
+
+    # rows are taken, sliced, selected and concatenated in any order
+    _assert_rows(table.take([4, 0, 2]), [4, 0, 2])
+    _assert_rows(table[1:4], [1, 2, 3])
+    _assert_rows(table[::-2], [4, 2, 0])
+    _assert_rows(table[3], [3])
+    _assert_rows(table.take([]), [])
+    _assert_rows(table.select(['d', 'a']), [3, 0])
+    _assert_rows(MetadataTable.concatenate((table[3:], table[:1], table[1:3])), [3, 4, 0, 1, 2])
+    # even of tables without some labels
+    _assert_rows(MetadataTable.concatenate((table[1:3], table[3:])), [1, 2, 3, 4])
+
+    try:
+        MetadataTable(_IDS, _SUBTYPES[:4], {}, {})
+        assert(False)
+    except ValueError:
+        pass
+
+    # alignments carry their table along when sliced, taken, or appended to
+    records = _records()
+    msa = LabeledMSA(MultipleSeqAlignment(records), list('abcd'), list(range(4)))
+    amsa = ArrayMSA.from_msa(msa)
+    for alignment in (msa, amsa):
+        assert(list(alignment.metadata.ids) == _IDS)
+        assert(list(alignment[1:3].metadata.ids) == _IDS[1:3])
+        assert(list(alignment[1:3, 1:].metadata.ids) == _IDS[1:3])
+        assert(list(alignment.take([4, 1]).metadata.ids) == ['e', 'b'])
+        alignment_ = alignment[:2]
+        alignment_.append(records[3])
+        assert(len(alignment_.metadata) == 3)
+        assert(alignment_.metadata.row(2) == _ROWS[3])
+
+    # an attached table is kept, and must have a row for every sequence
+    msa.metadata = table
+    assert(msa.metadata is table)
+    assert(msa.take([3]).metadata.row(0) == _ROWS[3])
+    try:
+        msa.metadata = table[:2]
+        assert(False)
+    except ValueError:
+        pass
+
+
+def test_value_matrix():
+    ids = _IDS[:4]
+    matrix = ValueMatrix.from_rows(ids, _SUBTYPES[:4], _PANEL, _PANEL_ROWS)
+
+    assert(len(matrix) == 4 and matrix.shape == (4, 3))
+    assert(matrix.antibodies == _PANEL)
+    assert(matrix.names == ['IC50', 'IC80'])
+
+    # only measured pairs are stored, even when zero
+    mask = np.array([
+        [True, False, True],
+        [False, False, False],
+        [False, True, False],
+        [True, True, True],
+        ])
+    assert(np.all(matrix.mask() == mask))
+    assert(np.all(matrix.mask('IC80') == np.array([
+        [False, False, True],
+        [False, False, False],
+        [False, False, False],
+        [True, False, False],
+        ])))
+    ic50 = matrix.tocsr('IC50')
+    assert(ic50.nnz == 5)
+    assert(np.all(ic50.toarray() == np.array([
+        [2.0, 0.0, 0.0],
+        [0.0, 0.0, 0.0],
+        [0.0, 4.0, 0.0],
+        [0.0, 6.0, 9.0],
+        ])))
+    assert(np.allclose(matrix.tocsr('IC50', 'mean').toarray()[:, 2], [0.0, 0.0, 0.0, 8.5]))
+    assert(np.allclose(matrix.tocsr('IC50', 'min').toarray()[0], [1.0, 0.0, 0.0]))
+    assert(np.allclose(matrix.tocsr('IC50', 'sum').toarray()[2], [0.0, 7.0, 0.0]))
+    assert(matrix.tocsr('IC90').nnz == 0)
+    try:
+        matrix.tocsr('IC50', 'median')
+        assert(False)
+    except ValueError:
+        pass
+
+    # each column is the table of the sequences measured against it alone
+    for ab in _PANEL:
+        table = matrix.metadata(ab)
+        assert(list(table.ids) == ids)
+        assert([table.row(i) for i in range(4)] == [row.get(ab, {}) for row in _PANEL_ROWS])
+
+    # rows are taken and selected with their entries
+    matrix_ = matrix.take([3, 0])
+    assert(list(matrix_.ids) == ['d', 'a'])
+    assert(np.all(matrix_.mask() == mask[[3, 0]]))
+    assert(np.all(matrix_.tocsr('IC50').toarray() == ic50.toarray()[[3, 0]]))
+    assert(matrix_.metadata('b12').row(0) == _PANEL_ROWS[3]['b12'])
+    assert(np.all(matrix.select(['c', 'b']).mask() == mask[[2, 1]]))
+    assert(np.all(matrix[1:].mask() == mask[1:]))
@@ -0,0 +1,75 @@
+
+from __future__ import division, print_function
+
+import re
+
+import numpy as np
+
+from idepi.constants import GAPS
+from idepi.feature_extraction import EncodedMSA, MotifVectorizer
+from idepi.feature_extraction._motif import MotifScanner, _find_regex, compile_motif, find_motif
+
+from ._arraymsa import _alignment
+
+
+__all__ = ['test_motif_vectorizer', 'test_motif_scanner']
+
+
+def test_motif_vectorizer():
+    msa = _alignment()
+    labels = list(msa.labels)
+
+    for pattern, fixed in ((r'P[^P][DF]', True), (r'(?:[FK])[KH]', True), (r'I+P', False)):
+        regex = re.compile(pattern)
+        assert((compile_motif(regex) is not None) == fixed)
+
+        # every match in the ungapped sequences, at its aligned column
+        expected = set()
+        for i, record in enumerate(msa):
+            cols = [j for j, c in enumerate(str(record.seq)) if c not in GAPS]
+            seq = ''.join(str(record.seq)[j] for j in cols)
+            for m in regex.finditer(seq):
+                expected.add((i, 'M({0:s})'.format(labels[cols[m.start()]])))
+
+        extractor = MotifVectorizer(regex, name='M')
+        X = extractor.fit_transform(msa)
+        names = list(extractor.get_feature_names())
+        assert(set((i, names[j]) for i, j in zip(*X.nonzero())) == expected)
+        assert(len(names) == len(set(name for _, name in expected)))
+
+    try:
+        MotifVectorizer(re.compile(r'P[^P][DF]'), 4).fit(msa)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('a wrong regex_length must raise a ValueError')
+
+
+def test_motif_scanner():
+    msa = EncodedMSA.of(_alignment())
+    # fixed-width motifs, overlapping hits, and one left to the regex engine
+    regexes = [
+        re.compile(r'P[^P][DF]', re.I),
+        re.compile(r'[FK][KH]'),
+        re.compile(r'K'),
+        re.compile(r'I+P'),
+        re.compile(r'W')
+        ]
+
+    hits = MotifScanner(regexes).scan(msa)
+    assert(len(hits) == len(regexes))
+
+    for regex, (rows, cols) in zip(regexes, hits):
+        rows_, cols_ = _find_regex(msa, regex, -1)
+        assert(np.all(rows == rows_) and np.all(cols == cols_))
+        rows_, cols_ = find_motif(msa, regex)
+        assert(np.all(rows == rows_) and np.all(cols == cols_))
+
+    assert(len(hits[0][0]) > 0 and len(hits[-1][0]) == 0)
+
+    try:
+        MotifScanner(regexes[:1]).scan(msa, [4])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('a wrong regex_length must raise a ValueError')
@@ -0,0 +1,65 @@
+
+from __future__ import division, print_function
+
+import re
+
+import numpy as np
+
+from idepi.feature_extraction import MultiMotifVectorizer
+
+from ._arraymsa import _alignment
+
+
+__all__ = ['test_multimotif_hashing']
+
+
+_MOTIFS = [
+    ('P', re.compile(r'P[DI]'), 2),
+    ('FK', re.compile(r'[DFK][KHX]'), 2),
+    ('X', re.compile(r'[A-Z]'), 1)
+    ]
+
+
+def test_multimotif_hashing():
+    msa = _alignment()
+    nfeat = 5
+
+    full = MultiMotifVectorizer(_MOTIFS, pairwise=True).fit(msa)
+    X = full.transform(msa)
+    names = list(full.get_feature_names())
+    # the unhashed pairs include any two columns of a motif, even if no
+    # sequence has both, whereas resolve() sees only those observed
+    pairs = [i for i, n in enumerate(names) if '+' in n and X[:, i].any()]
+    singles = [i for i, n in enumerate(names) if '+' not in n]
+    assert(len(pairs) > nfeat)
+
+    hashed = MultiMotifVectorizer(_MOTIFS, pairwise=True, n_features=nfeat).fit(msa)
+    H = hashed.transform(msa)
+    assert(H.shape == (len(msa), nfeat + len(singles)))
+    # the single features follow the hashed pairs, unchanged
+    assert(np.all(H[:, nfeat:] == X[:, singles]))
+    assert(np.all(hashed.transform(msa, 3) == H[:, 3:]))
+    assert(np.all(
+        MultiMotifVectorizer(_MOTIFS, pairwise=True, n_features=nfeat, sparse=True).fit(msa).transform(msa).toarray() == H
+        ))
+
+    # every observed pair is behind exactly one hashed feature
+    hashed.resolve(msa, range(nfeat))
+    names_ = hashed.get_feature_names()
+    seen = []
+    for i in range(nfeat):
+        if names_[i] == 'P|FK|X#{0:d}'.format(i):
+            assert(not H[:, i].any())
+            continue
+        members = [names.index(n) for n in names_[i].split('|')]
+        seen.extend(members)
+        assert(np.all(H[:, i] == X[:, members].max(axis=1)))
+    assert(sorted(seen) == pairs)
+
+    # a later partial_fit keeps the hashed features in place
+    partial = MultiMotifVectorizer(_MOTIFS, pairwise=True, n_features=nfeat)
+    partial.partial_fit(msa[:2])
+    partial.partial_fit(msa[2:])
+    H_ = partial.transform(msa)
+    assert(np.all(H_[:, :nfeat] == H[:, :nfeat]))
+    assert(sorted(partial.get_feature_names()[nfeat:]) == sorted(names_[nfeat:]))
@@ -0,0 +1,99 @@
+
+from __future__ import division, print_function
+
+import re
+
+import numpy as np
+
+from idepi.encoder import AminoEncoder
+from idepi.feature_extraction import (
+    FeatureUnion,
+    PairwiseMotifVectorizer,
+    PairwiseSiteVectorizer,
+    SiteVectorizer
+)
+
+from ._arraymsa import _alignment
+
+
+__all__ = ['test_pairwise_site_vectorizer', 'test_hashed_pairs']
+
+
+def _pairs(msa, radius, min_support=1):
+    # every pair of sites within radius that co-occur often enough,
+    # in (column, code, column, code) order
+    sites = SiteVectorizer(AminoEncoder)
+    S = sites.fit_transform(msa)
+    names = list(sites.get_feature_names())
+    ids = sites.feature_ids_
+    order = np.lexsort((ids[:, 1], ids[:, 0]))
+    pairs = []
+    for i in order.tolist():
+        for j in order.tolist():
+            if 0 < ids[j, 0] - ids[i, 0] <= radius:
+                x = S[:, i] & S[:, j]
+                if x.sum() >= min_support:
+                    pairs.append((names[i] + '+' + names[j], x))
+    return [name for name, _ in pairs], np.array([x for _, x in pairs]).reshape((-1, len(msa))).T
+
+
+def test_pairwise_site_vectorizer():
+    msa = _alignment()
+
+    for radius, min_support in ((0, 1), (1, 1), (3, 1), (3, 2), (20, 1)):
+        names, X = _pairs(msa, radius, min_support)
+        extractor = PairwiseSiteVectorizer(AminoEncoder, radius=radius, min_support=min_support)
+        X_ = extractor.fit_transform(msa)
+        assert(list(extractor.get_feature_names()) == names)
+        assert(np.all(X_ == X))
+
+
+def _check_hashed(X, names, H, names_, nfeat, unresolved):
+    # every observed pair is behind exactly one hashed feature, which is
+    # present wherever any of its pairs is
+    seen = []
+    for i in range(nfeat):
+        if names_[i] == unresolved.format(i):
+            assert(not H[:, i].any())
+            continue
+        members = [names.index(name) for name in names_[i].split('|')]
+        seen.extend(members)
+        assert(np.all(H[:, i] == X[:, members].max(axis=1)))
+    assert(sorted(seen) == [i for i in range(len(names)) if X[:, i].any()])
+
+
+def test_hashed_pairs():
+    msa = _alignment()
+    nfeat = 7
+
+    full = PairwiseSiteVectorizer(AminoEncoder, radius=3)
+    X = full.fit_transform(msa)
+    hashed = PairwiseSiteVectorizer(AminoEncoder, radius=3, n_features=nfeat)
+    H = hashed.fit_transform(msa)
+    assert(H.shape == (len(msa), nfeat) and X.shape[1] > nfeat)
+    assert(np.all(hashed.transform(msa, 2) == H[:, 2:]))
+    assert(list(hashed.get_feature_names()) == ['pair#{0:d}'.format(i) for i in range(nfeat)])
+    hashed.resolve(msa, range(nfeat))
+    _check_hashed(X, list(full.get_feature_names()), H, hashed.get_feature_names(), nfeat, 'pair#{0:d}')
+
+    motif = re.compile(r'[A-Z]')
+    full = PairwiseMotifVectorizer(motif, 1, 'X')
+    X = full.fit_transform(msa)
+    hashed = PairwiseMotifVectorizer(motif, 1, 'X', n_features=nfeat)
+    H = hashed.fit_transform(msa)
+    hashed.resolve(msa, range(nfeat))
+    _check_hashed(X, list(full.get_feature_names()), H, hashed.get_feature_names(), nfeat, 'X#{0:d}')
+
+    # a union resolves every member of a deduplicated group, here
+    # hashed features that duplicate the sites they are kept as
+    union = FeatureUnion([
+        ('site', SiteVectorizer(AminoEncoder)),
+        ('pair', PairwiseSiteVectorizer(AminoEncoder, radius=3, n_features=nfeat))
+        ], deduplicate=True)
+    X = union.fit_transform(msa)
+    groups = union.get_feature_groups()
+    assert(any(name.startswith('pair#') for group in groups for name in group))
+    union.resolve(msa, range(X.shape[1]))
+    for i, group in enumerate(union.get_feature_groups()):
+        if X[:, i].any():
+            assert(not any(name.startswith('pair#') for name in group))
@@ -0,0 +1,70 @@
+
+from __future__ import division, print_function
+
+import re
+
+import numpy as np
+
+from idepi.encoder import AminoEncoder
+from idepi.feature_extraction import (
+    FeatureUnion,
+    MotifVectorizer,
+    MultiMotifVectorizer,
+    PairwiseMotifVectorizer,
+    PairwiseSiteVectorizer,
+    SiteInteractionVectorizer,
+    SiteVectorizer
+)
+
+from ._arraymsa import _alignment
+
+
+__all__ = ['test_partial_fit']
+
+
+_MOTIF = re.compile(r'[DFK][KHX]')
+
+
+def _vectorizers():
+    return [
+        SiteVectorizer(AminoEncoder),
+        PairwiseSiteVectorizer(AminoEncoder, radius=2),
+        SiteInteractionVectorizer(AminoEncoder, min_support=1),
+        MotifVectorizer(_MOTIF, 2, 'FK'),
+        PairwiseMotifVectorizer(_MOTIF, 2, 'FK'),
+        MultiMotifVectorizer([('FK', _MOTIF, 2)], pairwise=True)
+        ]
+
+
+def test_partial_fit():
+    msa = _alignment()
+
+    for full, partial in zip(_vectorizers(), _vectorizers()):
+        X = full.fit_transform(msa)
+        names = list(full.get_feature_names())
+
+        # features learned earlier keep their indices
+        partial.partial_fit(msa[:2])
+        first = list(partial.get_feature_names())
+        partial.partial_fit(msa[2:])
+        names_ = list(partial.get_feature_names())
+        assert(names_[:len(first)] == first)
+
+        # and altogether they are those fit learns from every row
+        assert(sorted(names_) == sorted(names))
+        X_ = partial.transform(msa)
+        assert(np.all(X_[:, [names_.index(name) for name in names]] == X))
+        assert(np.all(partial.transform(msa, len(first)) == X_[:, len(first):]))
+
+    # a union returns the features of every row seen so far
+    union = FeatureUnion([(str(i), v) for i, v in enumerate(_vectorizers())])
+    X = union.partial_fit_transform(msa[:2])
+    assert(X.shape[0] == 2)
+    X = union.partial_fit_transform(msa[2:])
+    assert(np.all(X == union.transform(msa)))
+
+    # and so does a bit-packed one
+    union = FeatureUnion([(str(i), v) for i, v in enumerate(_vectorizers())], packed=True)
+    union.partial_fit_transform(msa[:2])
+    X_ = union.partial_fit_transform(msa[2:])
+    assert(np.all(X_.toarray() == X))
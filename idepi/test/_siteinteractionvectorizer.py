@@ -0,0 +1,65 @@
+
+from __future__ import division, print_function
+
+from itertools import combinations
+
+import numpy as np
+
+from idepi.encoder import AminoEncoder
+from idepi.feature_extraction import SiteInteractionVectorizer, SiteVectorizer
+
+from ._arraymsa import _alignment
+
+
+__all__ = ['test_siteinteraction_vectorizer', 'test_siteinteraction_partial_fit']
+
+
+def test_siteinteraction_vectorizer():
+    msa = _alignment()
+    sites = SiteVectorizer(AminoEncoder)
+    S = sites.fit_transform(msa)
+    names = list(sites.get_feature_names())
+    cols = sites.feature_ids_[:, 0]
+    order = np.lexsort((sites.feature_ids_[:, 1], cols)).tolist()
+
+    for max_order, min_support in ((2, 1), (3, 2), (4, 0.5)):
+        count = np.ceil(min_support * len(msa)) if min_support < 1 else min_support
+        # every set of sites in distinct columns present together often enough
+        expected = {}
+        for k in range(2, max_order + 1):
+            for sites_ in combinations(order, k):
+                if len(set(cols[list(sites_)])) < k:
+                    continue
+                x = S[:, list(sites_)].all(axis=1)
+                if x.sum() >= count:
+                    expected['+'.join(names[i] for i in sites_)] = x
+
+        extractor = SiteInteractionVectorizer(AminoEncoder, max_order=max_order, min_support=min_support)
+        X = extractor.fit_transform(msa)
+        names_ = list(extractor.get_feature_names())
+        assert(sorted(names_) == sorted(expected))
+        for i, name in enumerate(names_):
+            assert(np.all(X[:, i] == expected[name]))
+
+
+def test_siteinteraction_partial_fit():
+    msa = _alignment()
+
+    fit = SiteInteractionVectorizer(AminoEncoder, max_order=3, min_support=1)
+    X = fit.fit_transform(msa)
+    names = list(fit.get_feature_names())
+
+    # the second half brings sites (e.g. 0a[]) to columns before those of
+    # the first half, so these take higher indices than sites they follow
+    partial = SiteInteractionVectorizer(AminoEncoder, max_order=3, min_support=1)
+    partial.partial_fit(msa[:2])
+    partial.partial_fit(msa[2:])
+    X_ = partial.transform(msa)
+    names_ = list(partial.get_feature_names())
+
+    assert(len(set(names)) == len(names))
+    assert(sorted(names) == sorted(names_))
+
+    idx = dict((name, i) for i, name in enumerate(names_))
+    order = [idx[name] for name in names]
+    assert(np.all(X == X_[:, order]))
@@ -0,0 +1,43 @@
+
+from __future__ import division, print_function
+
+import numpy as np
+
+from six import StringIO
+
+from Bio import AlignIO
+
+from idepi.encoder import AminoEncoder, StanfelEncoder
+from idepi.feature_extraction import SiteVectorizer
+from idepi.labeledmsa import LabeledMSA
+
+from ._arraymsa import _alignment
+from ._common import (
+    TEST_AMINO_STO,
+    TEST_AMINO_NAMES,
+    TEST_STANFEL_NAMES,
+    TEST_AMINO_X,
+    TEST_STANFEL_X
+)
+
+
+__all__ = ['test_site_vectorizer']
+
+
+def _labeled_alignment():
+    msa = AlignIO.read(StringIO(TEST_AMINO_STO), 'stockholm')
+    refidx = [record.id for record in msa].index('HXB2_env')
+    return LabeledMSA.from_msa_with_ref(msa, refidx)
+
+
+def test_site_vectorizer():
+    for encoder, TEST_NAMES, TEST_X in (
+            (AminoEncoder, TEST_AMINO_NAMES, TEST_AMINO_X),
+            (StanfelEncoder, TEST_STANFEL_NAMES, TEST_STANFEL_X)):
+        for msa in (_labeled_alignment(), _alignment()):
+            extractor = SiteVectorizer(encoder)
+            x = extractor.fit_transform(msa)
+            assert(list(extractor.get_feature_names()) == TEST_NAMES)
+            assert(np.all(x == TEST_X))
+            # each sequence is vectorized on its own
+            assert(np.all(extractor.transform(msa[:1]) == TEST_X[:1]))
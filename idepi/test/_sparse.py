@@ -0,0 +1,57 @@
+
+from __future__ import division, print_function
+
+import re
+
+import numpy as np
+
+from scipy.sparse import isspmatrix_csr
+
+from idepi.encoder import AminoEncoder
+from idepi.feature_extraction import (
+    FeatureUnion,
+    MotifVectorizer,
+    MultiMotifVectorizer,
+    PairwiseMotifVectorizer,
+    PairwiseSiteVectorizer,
+    SiteInteractionVectorizer,
+    SiteVectorizer
+)
+
+from ._arraymsa import _alignment
+
+
+__all__ = ['test_sparse_output']
+
+
+_MOTIF = re.compile(r'[DFK][KHX]')
+
+
+def _vectorizers(sparse):
+    return [
+        SiteVectorizer(AminoEncoder, sparse=sparse),
+        PairwiseSiteVectorizer(AminoEncoder, radius=2, sparse=sparse),
+        SiteInteractionVectorizer(AminoEncoder, min_support=1, sparse=sparse),
+        MotifVectorizer(_MOTIF, 2, 'FK', sparse=sparse),
+        PairwiseMotifVectorizer(_MOTIF, 2, 'FK', sparse=sparse),
+        MultiMotifVectorizer([('FK', _MOTIF, 2)], pairwise=True, sparse=sparse)
+        ]
+
+
+def test_sparse_output():
+    msa = _alignment()
+
+    for dense, sparse in zip(_vectorizers(False), _vectorizers(True)):
+        X = dense.fit_transform(msa)
+        X_ = sparse.fit_transform(msa)
+        assert(isinstance(X, np.ndarray))
+        assert(isspmatrix_csr(X_))
+        assert(X.shape == X_.shape and X.shape[1] > 0)
+        assert(np.all(X == X_.toarray()))
+        # the value of a feature is never more than 1
+        assert(X_.nnz == 0 or X_.data.max() == 1)
+
+    union = FeatureUnion([(str(i), v) for i, v in enumerate(_vectorizers(False))], sparse=True)
+    X_ = union.fit_transform(msa)
+    assert(isspmatrix_csr(X_))
+    assert(np.all(X_.toarray() == np.hstack([v.fit_transform(msa) for v in _vectorizers(False)])))
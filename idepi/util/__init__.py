@@ -24,11 +24,13 @@
 
 from __future__ import division, print_function
 
+from functools import partial
+from hashlib import sha1
 from json import dumps as json_dumps, loads as json_loads
 from logging import getLogger
 from math import copysign
-from os import close, remove
-from os.path import exists, splitext
+from os import close, environ, makedirs, remove
+from os.path import abspath, dirname, exists, expanduser, isdir, join, splitext
 from re import compile as re_compile, I as re_I
 from shutil import copyfile
 from tempfile import mkstemp
@@ -42,7 +44,7 @@ from BioExt.misc import translate
 from idepi.constants import AminoAlphabet, DNAAlphabet
 from idepi.encoder import DNAEncoder
 from idepi.hmmer import HMMER
-from idepi.labeledmsa import LabeledMSA
+from idepi.labeledmsa import ArrayMSA
 from idepi.logging import IDEPI_LOGGER
 from idepi.verifier import VerifyError, Verifier
 
@@ -59,8 +61,13 @@ __all__ = [
     'extract_feature_weights_similar',
     'extract_feature_weights',
     'generate_alignment',
+    'alignment_fingerprint',
+    'load_alignment',
+    'save_alignment',
+    'user_cache',
     'C_range',
     'load_stockholm',
+    'stockholm_rf_ranges',
     'coefs_ranks'
 ]
 
@@ -88,6 +95,10 @@ def is_refseq(seqrecord):
 
 
 def seqrecord_get_values(seqrecord, label='IC50'):
+    # records fresh from a data source carry their values parsed already
+    annotations = getattr(seqrecord, 'annotations', {})
+    if 'antibody' in annotations:
+        return annotations['antibody'].get(label)
     # cap ic50s to 25
     try:
         values = json_loads(seqrecord.description)['values'][label]
@@ -102,6 +113,9 @@ def seqrecord_get_values(seqrecord, label='IC50'):
 
 
 def seqrecord_get_subtype(seqrecord):
+    annotations = getattr(seqrecord, 'annotations', {})
+    if 'subtype' in annotations:
+        return annotations['subtype']
     try:
         subtype = json_loads(seqrecord.description)['subtype']
     except ValueError:
@@ -115,6 +129,8 @@ def seqrecord_set_values(seqrecord, label, values):
     desc = json_loads(seqrecord.description)
     desc['values'][label] = values
     seqrecord.description = json_dumps(desc)
+    if 'antibody' in seqrecord.annotations:
+        seqrecord.annotations['antibody'][label] = values
     return seqrecord
 
 
@@ -336,39 +352,133 @@ def generate_alignment_(seqrecords, hmmfile, opts, refseq=None):
     return tmpaln
 
 
-def generate_alignment(seqrecords, sto_filename, ref_id_func, opts, load=True):
+def alignment_fingerprint(seqrecords, *sources):
+    """
+    a hash of the ids, descriptions and sequences of seqrecords, and of the
+    sources (str, bytes, or files opened in binary mode, read a block at a
+    time) they are aligned with, under which a binary alignment is reused
+    rather than realigned
+    """
+    h = sha1()
+    for source in sources:
+        if hasattr(source, 'read'):
+            for block in iter(partial(source.read, 1 << 20), b''):
+                h.update(block)
+        else:
+            h.update(source if isinstance(source, bytes) else str(source).encode('utf-8'))
+        h.update(b'\0')
+    for record in seqrecords:
+        for part in (record.id, record.description, str(record.seq)):
+            h.update(part.encode('utf-8'))
+            h.update(b'\0')
+    return h.hexdigest()
+
+
+def load_alignment(filename, fingerprint):
+    """
+    the binary alignment in filename, if it was saved with fingerprint
+    """
+    try:
+        if exists(filename) and ArrayMSA.fingerprint(filename) == fingerprint:
+            return ArrayMSA.load(filename)
+    except (IOError, OSError, ValueError) as e:
+        getLogger(IDEPI_LOGGER).debug("unable to read binary alignment '{0:s}': {1:s}".format(filename, str(e)))
+    return None
+
+
+def user_cache(filename):
+    """
+    filename in the per-user cache directory, as the XDG spec places it
+    """
+    root = environ.get('XDG_CACHE_HOME') or join(expanduser('~'), '.cache')
+    return join(root, 'idepi', filename)
+
+
+def save_alignment(msa, filename, fingerprint):
+    # a binary alignment only spares parsing its source, so it need not be written
+    try:
+        if not isdir(dirname(abspath(filename))):
+            makedirs(dirname(abspath(filename)))
+        ArrayMSA.from_msa(msa).save(filename, fingerprint)
+    except (IOError, OSError) as e:
+        getLogger(IDEPI_LOGGER).debug("unable to write binary alignment '{0:s}': {1:s}".format(filename, str(e)))
+
+
+def _alignment_sources(opts):
+    # what, besides the sequences, generate_alignment() aligns them with;
+    # every amino encoding shares one alignment, only DNA differs
+    is_dna = getattr(opts, 'ENCODER', None) == DNAEncoder
+    sources = ['dna' if is_dna else 'amino']
+    refseq = getattr(opts, 'REFSEQ', None)
+    if refseq is not None:
+        sources.extend((refseq.id, str(refseq.seq)))
+    refmsa = getattr(opts, 'REFMSA', None)
+    if refmsa is not None and exists(refmsa):
+        with open(refmsa, 'rb') as fh:
+            sources.append(fh.read())
+    return sources
+
+
+def generate_alignment(seqrecords, sto_filename, ref_id_func, opts, load=True, metadata=None):
     from ..simulation import Simulation
 
     log = getLogger(IDEPI_LOGGER)
     hmm = None
+    msa = None
 
-    if hasattr(opts, 'SIM') and opts.SIM == Simulation.DUMB:
+    simulated = hasattr(opts, 'SIM') and opts.SIM == Simulation.DUMB
+
+    # the binary alignment beside sto_filename is reused while it is current,
+    # and only when it is not are the sequences aligned and parsed
+    seqrecords = list(seqrecords)
+    msa_filename = splitext(sto_filename)[0] + '.msa'
+    fingerprint = None if simulated else alignment_fingerprint(seqrecords, *_alignment_sources(opts))
+
+    if simulated:
         # we're assuming pre-aligned because they're all generated from the same refseq
         with open(sto_filename, 'w') as fh:
             SeqIO.write(seqrecords, fh, 'stockholm')
     else:
+        tmphmm, tmpaln = None, None
         try:
             tmphmm = generate_hmm_(opts)
-            tmpaln = generate_alignment_(seqrecords, tmphmm, opts, refseq=opts.REFSEQ)
-            copyfile(tmpaln, sto_filename)
-            log.debug('finished alignment, output moved to {0:s}'.format(sto_filename))
             with open(tmphmm, 'rb') as hmm_fh:
                 hmm = hmm_fh.read()
+            if load:
+                msa = load_alignment(msa_filename, fingerprint)
+            if msa is None:
+                tmpaln = generate_alignment_(seqrecords, tmphmm, opts, refseq=opts.REFSEQ)
+                copyfile(tmpaln, sto_filename)
+                log.debug('finished alignment, output moved to {0:s}'.format(sto_filename))
+            else:
+                log.debug('reusing the current alignment in {0:s}'.format(msa_filename))
         finally:
-            if exists(tmphmm):
+            if tmphmm is not None and exists(tmphmm):
                 remove(tmphmm)
-            if exists(tmpaln):
+            if tmpaln is not None and exists(tmpaln):
                 remove(tmpaln)
 
-    if load:
+    if not load:
+        return None, hmm
+
+    if msa is None:
         with open(sto_filename) as fh:
             msa = AlignIO.read(fh, 'stockholm')
         refidx = reference_index(msa, ref_id_func)
-        msa = LabeledMSA.from_msa_with_ref(msa, refidx)
+        msa = ArrayMSA.from_msa_with_ref(msa, refidx)
         ranges = stockholm_rf_ranges(sto_filename)
-        return trim_msa_to_ranges(msa, ranges), hmm
+        msa = trim_msa_to_ranges(msa, ranges)
+        if fingerprint is not None:
+            save_alignment(msa, msa_filename, fingerprint)
+
+    if metadata is not None:
+        # carry the data source's metadata, rather than parse descriptions
+        try:
+            msa.metadata = metadata.select(msa.ids)
+        except KeyError:
+            log.debug('alignment ids differ from the data source, parsing descriptions')
 
-    return None, hmm
+    return msa, hmm
 
 
 def C_range(begin, end, step):
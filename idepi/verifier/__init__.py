@@ -6,10 +6,21 @@ from re import compile as re_compile, I as re_I
 
 __all__ = [
     'VerifyError',
-    'Verifier'
+    'Verifier',
+    'rejects'
     ]
 
 
+def rejects(alphabet):
+    """
+    a predicate of the sequences that a Verifier of alphabet rejects
+    """
+    if not alphabet.letters:
+        return lambda _: False
+    regexp = re_compile(r'[^{0:s}]'.format(alphabet.letters), re_I)
+    return lambda sequence: regexp.match(str(sequence)) is not None
+
+
 def verify_alphabet(sequence, alphabet=None):
     if alphabet is None:
         alphabet = sequence.alphabet
@@ -39,7 +50,7 @@ class Verifier:
     def __catchup(self):
         for i, record in self.__records:
             record.seq.alphabet = self.__alphabet
-            if self.__regexp is not None and self.__regexp.match(str(record.seq)):
+            if self.__rejects(record.seq):
                 raise VerifyError("invalid alphabet for sequence {0:d}".format(i))
         while self.__records:
             _, record = self.__records.pop(0)
@@ -55,7 +66,4 @@ class Verifier:
 
     def set_alphabet(self, alphabet):
         self.__alphabet = alphabet
-        if alphabet.letters:
-            self.__regexp = re_compile(r'[^{0:s}]'.format(alphabet.letters), re_I)
-        else:
-            self.__regexp = None
+        self.__rejects = rejects(alphabet)